@@ -1,13 +1,45 @@
+import asyncio
+import threading
+import time
+import zlib
 from textwrap import dedent
 from agno.agent import Agent
-from agno.models.groq import Groq
+
+from utils.batch_eval import BatchEvaluator
+from utils.context_packer import ContextPacker
+from utils.llm import make_groq
+from utils.prescoring import PreScorer, format_report
+from utils.streaming import StreamEvent, answer_events, stream_run
 
 class RAGEvaluator:
     """Agent for evaluating RAG system outputs"""
     
-    def __init__(self):
-        self.evaluator = Agent(
-            model=Groq(id="llama-3.1-8b-instant"),
+    def __init__(self, context_token_budget=4000, cascade=False, embedder=None, prescore_params=None,
+                 audit_rate=0.1):
+        # Deduplicates and bounds the retrieved context placed in the judge prompt
+        self.context_packer = ContextPacker(token_budget=context_token_budget, order="page")
+        # Opt-in local first stage: cases whose embedding/lexical overlap is clearly high or low
+        # are scored without the LLM judge; prescore_params are passed to PreScorer (bands, ...)
+        self.prescorer = None
+        if cascade:
+            if embedder is None:
+                from utils.embeddings import EmbeddingModel
+                embedder = EmbeddingModel()
+            self.prescorer = PreScorer(embedder, **(prescore_params or {}))
+        # Share of confidently pre-scored cases still sent to the judge, to measure agreement
+        self.audit_rate = audit_rate
+        self.cascade_stats = {"local": 0, "escalated": 0, "audited": 0, "prescore_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        # One model (and HTTP client) shared by the per-evaluation judge agents
+        self.judge_model = make_groq(id="llama-3.1-8b-instant")
+        
+        print("✅ RAG Evaluator initialized")
+    
+    def _build_judge(self):
+        """Judge agent for one evaluation"""
+        # agno keeps the current run on the agent, so concurrent evaluations must not share one
+        return Agent(
+            model=self.judge_model,
             description=dedent("""\
                 You are an expert RAG system evaluator with deep expertise in:
                 - Information retrieval quality assessment
@@ -92,18 +124,14 @@ class RAGEvaluator:
             """),
             markdown=True,
         )
-        
-        print("✅ RAG Evaluator initialized")
-    
-    def evaluate(self, query, response, context):
-        """
-        Evaluate a RAG system's response
-        
-        Args:
-            query (str): Original user query
-            response (str): RAG system's response
-            context (list): Retrieved passages used for the response
-        """
+
+    def _build_prompt(self, query, response, context):
+        """Judge prompt with the context packed into the token budget"""
+        # Order by position in the supplied list rather than by similarity to the query
+        packed = self.context_packer.pack(query, context, pages=list(range(len(context))))
+        if packed["tokens_saved"]:
+            print(f"Context packed: {packed['tokens']} tokens ({packed['tokens_saved']} saved)")
+
         evaluation_prompt = f"""
         Please evaluate this RAG system output:
 
@@ -111,17 +139,110 @@ class RAGEvaluator:
         {query}
 
         RETRIEVED CONTEXT:
-        {' '.join(context)}
+        {' '.join(packed['chunks'])}
 
         RESPONSE:
         {response}
 
         Provide a detailed evaluation following the metrics and format specified.
         """
+        return evaluation_prompt
+
+    def _prescore(self, query, response, context):
+        """
+        Run the local stage when the cascade is on
+
+        Returns:
+            tuple: (prescore or None, whether the case can skip the judge)
+        """
+        if self.prescorer is None:
+            return None, False
+        started = time.perf_counter()
+        prescore = self.prescorer.score(query, response, context)
+        if prescore["verdict"] == "ambiguous":
+            stage = "escalated"
+        # Deterministic sample, so that re-running a regression set audits the same cases
+        elif zlib.crc32(f"{query}\x00{response}".encode("utf-8")) % 10000 < self.audit_rate * 10000:
+            stage = "audited"
+        else:
+            stage = "local"
+        with self._stats_lock:
+            self.cascade_stats[stage] += 1
+            self.cascade_stats["prescore_seconds"] += time.perf_counter() - started
+        return prescore, stage == "local"
+
+    def evaluate_detailed(self, query, response, context):
+        """
+        Evaluate a RAG system's response, reporting which stage decided it
+
+        Returns:
+            dict: "report" (markdown), "stage" ("local" or "judge") and "prescore" (the local
+                signals and verdict, or None when the cascade is off)
+        """
+        prescore, local = self._prescore(query, response, context)
+        if local:
+            return {"report": format_report(query, prescore), "stage": "local", "prescore": prescore}
+
+        evaluation_prompt = self._build_prompt(query, response, context)
+        try:
+            evaluation = self._build_judge().run(evaluation_prompt)
+            report = evaluation.content
+        except Exception as e:
+            print(f"Error evaluating response: {e}")
+            report = f"Error: {str(e)}"
+        return {"report": report, "stage": "judge", "prescore": prescore}
+
+    async def aevaluate_detailed(self, query, response, context):
+        """evaluate_detailed() without blocking the event loop; the local stage runs in a thread"""
+        prescore, local = await asyncio.to_thread(self._prescore, query, response, context)
+        if local:
+            return {"report": format_report(query, prescore), "stage": "local", "prescore": prescore}
 
+        evaluation_prompt = self._build_prompt(query, response, context)
+        try:
+            evaluation = await self._build_judge().arun(evaluation_prompt)
+            report = evaluation.content
+        except Exception as e:
+            print(f"Error evaluating response: {e}")
+            report = f"Error: {str(e)}"
+        return {"report": report, "stage": "judge", "prescore": prescore}
+
+    def evaluate(self, query, response, context):
+        """
+        Evaluate a RAG system's response
+        
+        Args:
+            query (str): Original user query
+            response (str): RAG system's response
+            context (list): Retrieved passages used for the response
+        """
+        return self.evaluate_detailed(query, response, context)["report"]
+
+    async def aevaluate(self, query, response, context):
+        """Evaluate a RAG system's response without blocking the event loop"""
+        return (await self.aevaluate_detailed(query, response, context))["report"]
+
+    def evaluate_stream(self, query, response, context):
+        """Evaluate a RAG system's response, yielding StreamEvents as the report is written"""
+        started = time.perf_counter()
+        prescore, local = self._prescore(query, response, context)
+        if local:
+            yield from answer_events(format_report(query, prescore), started)
+            return
+        evaluation_prompt = self._build_prompt(query, response, context)
         try:
-            evaluation = self.evaluator.run(evaluation_prompt)
-            return evaluation.content
+            yield from stream_run(self._build_judge(), evaluation_prompt, started)
         except Exception as e:
             print(f"Error evaluating response: {e}")
-            return f"Error: {str(e)}"
\ No newline at end of file
+            yield StreamEvent("error", f"Error: {str(e)}")
+
+    def evaluate_batch(self, cases, output_path=None, concurrency=4):
+        """
+        Evaluate many cases concurrently, returning per-case scores and per-metric aggregates
+        
+        Args:
+            cases (list): Dicts with "query", "response", "context" and optionally "id"
+            output_path (str): JSONL checkpoint; cases already scored there are skipped
+            concurrency (int): Evaluations in flight (Groq calls are also rate limited)
+        """
+        return BatchEvaluator(self, concurrency).run(cases, output_path)
\ No newline at end of file
@@ -1,59 +1,360 @@
+import asyncio
+import json
 import os
+import time
+from functools import partial
+
+import numpy as np
 from agno.agent import Agent
-from agno.models.groq import Groq
 from agno.knowledge.pdf_url import PDFUrlKnowledgeBase
 from agno.vectordb.pgvector import PgVector  # This is the correct import path
 
 from utils.embeddings import EmbeddingModel
+from utils.db_utils import get_engine, pool_metrics
+from utils.embedding_cache import EmbeddingCache
+from utils.ingestion import IngestManifest, delete_chunks, read_pdf_documents
+from utils.pdf_fetch import PDFFetcher
+from utils.ingest_pipeline import IngestPipeline
+from utils.local_vectordb import LocalVectorDb
+from utils.pg_bulk import PgVectorBulkLoader
+from utils.pg_index import VectorIndexManager
+from utils.bm25 import BM25Index
+from utils.retrieval import HybridRetriever
+from utils.semantic_cache import SemanticAnswerCache
+from utils.context_packer import ContextPacker
+from utils.llm import make_groq
+from utils.streaming import StreamEvent, answer_events, stream_run
+
+# Metadata every library chunk is tagged with, besides source_url
+DOCUMENT_FIELDS = ("doc_id", "issuer", "fiscal_year")
 
 class DocumentQA:
     """Agent for document question-answering using RAG"""
     
-    def __init__(self, db_url="postgresql+psycopg://ai:ai@localhost:5532/ai"):
-        # Initialize embedder
-        self.embedder = EmbeddingModel()
-        # Initialize Groq model
-        self.chat_model = Groq(id="llama3-8b-8192")
-        # Database URL
+    def __init__(self, db_url="postgresql+psycopg://ai:ai@localhost:5532/ai",
+                 embedding_cache_path=".cache/embeddings.sqlite", batch_embeddings=False,
+                 manifest_path=".cache/ingest_manifest.sqlite", vector_store="pgvector",
+                 local_store_dir=".cache/vector_store", retrieval="hybrid", top_k=5,
+                 dense_weight=1.0, lexical_weight=1.0, lexical_index_dir=".cache/lexical",
+                 answer_mode="context", answer_cache=True, answer_cache_threshold=0.97,
+                 answer_cache_ttl=3600, context_token_budget=3000, context_order="relevance",
+                 db_pool_size=5, db_max_overflow=10, bulk_load_threshold=1000,
+                 vector_index="hnsw", index_params=None, pdf_cache_dir=".cache/pdfs", fetch_workers=4,
+                 quantization=None, embedding_backend="torch", embedding_threads=None, embedding_workers=0):
+        # Initialize embedder, reusing vectors for chunks and questions seen before.
+        # embedding_workers > 0 spreads large ingestions over that many worker processes
+        self.embedder = EmbeddingModel(cache=EmbeddingCache(embedding_cache_path), batching=batch_embeddings,
+                                       backend=embedding_backend, threads=embedding_threads,
+                                       workers=embedding_workers)
+        # Initialize Groq model, sharing the process-wide rate limit and response cache
+        self.chat_model = make_groq(id="llama3-8b-8192")
+        # Database URL; every PgVector table shares one pooled engine per URL
         self.db_url = db_url
+        self.db_pool_size = db_pool_size
+        self.db_max_overflow = db_max_overflow
+        # Loads with at least this many new chunks go through binary COPY instead of INSERT
+        self.bulk_load_threshold = bulk_load_threshold
+        # ANN index kept on pgvector tables ("hnsw", "ivfflat" or None for sequential scans),
+        # index_params are passed to VectorIndexManager (m, ef_construction, lists, ef_search, ...),
+        # or to LocalVectorDb for the local store (ann_threshold, n_probe, rebuild_drift)
+        if vector_index not in ("hnsw", "ivfflat", None):
+            raise ValueError(f"Unknown vector index: {vector_index}")
+        self.vector_index = vector_index
+        self.index_params = index_params or {}
+        self.index_manager = None
+        # None, "int8" or "binary" codes searched first and rescored with the float vectors.
+        # pgvector has no int8 type, so "int8" maps to its halfvec index there
+        if quantization not in (None, "int8", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.quantization = quantization
+        # "pgvector" for Postgres, "local" for the in-process LocalVectorDb (no database needed)
+        if vector_store not in ("pgvector", "local"):
+            raise ValueError(f"Unknown vector store: {vector_store}")
+        self.vector_store = vector_store
+        self.local_store_dir = local_store_dir
+        # "dense" for vector search only, "hybrid" to fuse it with BM25 by reciprocal rank
+        if retrieval not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval}")
+        self.retrieval = retrieval
+        self.top_k = top_k
+        self.dense_weight = dense_weight
+        self.lexical_weight = lexical_weight
+        self.lexical_index_dir = lexical_index_dir
+        self.lexical_index = None
+        self.retriever = None
+        # "context": retrieve once and answer in a single LLM call
+        # "agentic": let the agent decide when to call its knowledge search tool
+        if answer_mode not in ("context", "agentic"):
+            raise ValueError(f"Unknown answer mode: {answer_mode}")
+        self.answer_mode = answer_mode
+        self.last_answer_stats = None
+        # Serves near-duplicate questions about the same table without retrieval or generation
+        self.answer_cache = SemanticAnswerCache(answer_cache_threshold, answer_cache_ttl) if answer_cache else None
+        self.table_name = None
+        # Keeps prompts well inside llama3-8b-8192's context window
+        self.context_packer = ContextPacker(token_budget=context_token_budget, order=context_order)
         self.current_knowledge_base = None
         self.agent = None
+        # Tracks document and chunk fingerprints for incremental loads
+        self.manifest = IngestManifest(manifest_path)
+        # Raw PDFs are cached locally and revalidated with ETag/Last-Modified instead of re-downloaded
+        self.fetcher = PDFFetcher(pdf_cache_dir, max_workers=fetch_workers)
         
         print("✅ RAG Agent initialized")
     
-    def load_pdf_url(self, url: str, table_name: str = "documents"):
-        """Load a PDF from a URL"""
+    def load_pdf_url(self, url: str, table_name: str = "documents", incremental: bool = False,
+                     streaming: bool = False, background: bool = False, doc_id: str = None,
+                     issuer: str = None, fiscal_year: int = None):
+        """
+        Load a PDF from a URL
+        
+        Args:
+            url (str): PDF URL
+            table_name (str): Vector table to load into
+            incremental (bool): Keep the table and only embed new or changed chunks,
+                deleting chunks that are no longer in the document
+            streaming (bool): Parse, chunk, embed and write page by page in overlapping stages
+                with bounded memory
+            background (bool): With streaming, return the running IngestPipeline immediately;
+                the document becomes queryable as batches are written
+            doc_id (str): Document id chunks are tagged with (defaults to the file name)
+            issuer (str): Issuer chunks are tagged with, e.g. a ticker
+            fiscal_year (int): Fiscal year chunks are tagged with
+        """
         try:
-            # Create PDF URL knowledge base
-            self.current_knowledge_base = PDFUrlKnowledgeBase(
-                urls=[url],
-                vector_db=PgVector(
-                    table_name=table_name,
-                    db_url=self.db_url,
-                    embedder=self.embedder
-                ),
-            )
-
-            # Initialize the Agent
-            self.agent = Agent(
-                knowledge=self.current_knowledge_base,
-                search_knowledge=True,
-                model=self.chat_model
-            )
+            self._open_table(table_name)
+            meta_data = {"doc_id": doc_id or _default_doc_id(url)}
+            if issuer is not None:
+                meta_data["issuer"] = issuer
+            if fiscal_year is not None:
+                meta_data["fiscal_year"] = fiscal_year
 
             # Load knowledge base
             print("Loading knowledge base...")
-            self.current_knowledge_base.load(recreate=True)
-            print("✅ Knowledge base loaded successfully!")
+            stats = self._ingest(url, table_name, incremental, streaming, background, meta_data)
+            self.manifest.save_document(table_name, meta_data["doc_id"], url, meta_data)
+            if isinstance(stats, IngestPipeline):
+                print("Ingestion running in background, the document is queryable as pages land")
+                return stats
+            print(f"✅ Knowledge base loaded successfully! "
+                  f"({stats['added']} chunks added, {stats['skipped']} skipped, {stats['removed']} removed)")
 
             # Show sample content
             self.show_sample_content()
+            return stats
 
         except Exception as e:
             print(f"❌ Error loading PDF: {e}")
             import traceback
             print(traceback.format_exc())
     
+    def add_document(self, url: str, doc_id: str = None, issuer: str = None, fiscal_year: int = None,
+                     table_name: str = "library", streaming: bool = False, background: bool = False):
+        """
+        Add a PDF to a multi-document library table, keeping every other document in it
+        
+        Re-adding a URL only re-embeds its changed chunks. Query a subset of the library
+        with ask(question, filters={"issuer": "AAPL", "fiscal_year": 2024}).
+        """
+        return self.load_pdf_url(url, table_name=table_name, incremental=True, streaming=streaming,
+                                 background=background, doc_id=doc_id, issuer=issuer, fiscal_year=fiscal_year)
+    
+    def load_pdf_urls(self, documents: list, table_name: str = "library", streaming: bool = False):
+        """
+        Add many PDFs to a library table, downloading them in parallel first
+        
+        Args:
+            documents (list): URLs, or dicts with url and optional doc_id, issuer and fiscal_year
+            table_name (str): Library table to load into
+            streaming (bool): Ingest each document with the pipelined loader
+        
+        Returns:
+            dict: url -> load stats, or None for documents that failed
+        """
+        documents = [{"url": d} if isinstance(d, str) else d for d in documents]
+        fetched = self.fetcher.fetch_many([d["url"] for d in documents])
+        for url, result in fetched.items():
+            if isinstance(result, Exception):
+                print(f"❌ Error fetching {url}: {result}")
+        print(f"✅ Fetched {len(fetched)} PDFs ({self.fetcher.stats['downloaded']} downloaded, "
+              f"{self.fetcher.stats['not_modified']} not modified, {self.fetcher.stats['fresh']} fresh)")
+
+        # Ingestion is embedding-bound, so documents are written one after another from the warm cache
+        results = {}
+        for document in documents:
+            url = document["url"]
+            if isinstance(fetched[url], Exception):
+                results[url] = None
+                continue
+            results[url] = self.add_document(url, doc_id=document.get("doc_id"), issuer=document.get("issuer"),
+                                             fiscal_year=document.get("fiscal_year"), table_name=table_name,
+                                             streaming=streaming)
+        return results
+    
+    def remove_document(self, doc_id: str, table_name: str = None):
+        """Delete one document's chunks from a library table without rebuilding it"""
+        table_name = table_name or self.table_name or "library"
+        self._open_table(table_name)
+        document = self.manifest.get_document(table_name, doc_id)
+        if document is None:
+            print(f"❌ No document {doc_id!r} in {table_name}")
+            return 0
+
+        chunk_ids = self.manifest.get_chunk_ids(table_name, document["source_url"])
+        delete_chunks(self.current_knowledge_base.vector_db, sorted(chunk_ids))
+        self.lexical_index.remove(chunk_ids)
+        self.lexical_index.save()
+        self.manifest.remove(table_name, document["source_url"])
+        self._ensure_index()
+        self._invalidate_answers(table_name)
+        print(f"✅ Removed {doc_id} ({len(chunk_ids)} chunks) from {table_name}")
+        return len(chunk_ids)
+    
+    def list_documents(self, table_name: str = None):
+        """Documents in a library table with the metadata their chunks are tagged with"""
+        return self.manifest.list_documents(table_name or self.table_name or "library")
+    
+    def _open_table(self, table_name: str):
+        """Point the knowledge base, indexes, retriever and agent at a table"""
+        if self.current_knowledge_base is not None and self.table_name == table_name:
+            return
+        # Create PDF URL knowledge base
+        self.current_knowledge_base = PDFUrlKnowledgeBase(
+            urls=[],
+            vector_db=self._make_vector_db(table_name),
+        )
+        self.table_name = table_name
+        vector_db = self.current_knowledge_base.vector_db
+        self.index_manager = None
+        if self.vector_store == "pgvector" and self.vector_index:
+            quantization = {"int8": "halfvec"}.get(self.quantization, self.quantization)
+            self.index_manager = VectorIndexManager(vector_db, kind=self.vector_index, quantization=quantization,
+                                                    **self.index_params)
+        elif self.vector_store == "local" and vector_db.exists():
+            # Tables that grew past ann_threshold in an earlier session get their IVF index on open
+            vector_db.ensure_index()
+        # Lexical index built at ingestion time alongside the vectors
+        self.lexical_index = BM25Index(os.path.join(self.lexical_index_dir, f"{table_name}.json"))
+        self.retriever = HybridRetriever(
+            self.index_manager or vector_db, self.lexical_index,
+            dense_weight=self.dense_weight, lexical_weight=self.lexical_weight,
+        )
+
+        # Initialize the Agent
+        self.agent = self._build_agent()
+    
+    def _build_agent(self, filters=None):
+        """Create the answering agent for the configured answer mode"""
+        if self.answer_mode == "agentic":
+            return Agent(
+                knowledge=self.current_knowledge_base,
+                search_knowledge=True,
+                retriever=partial(self._agent_retriever, scope_filters=filters),
+                model=self.chat_model
+            )
+        # Context is retrieved up front, so the agent gets no search tool and answers in one call
+        return Agent(model=self.chat_model)
+    
+    def _agent_retriever(self, query: str, num_documents=None, scope_filters=None, **kwargs):
+        """Knowledge search tool backend, so agentic mode uses the same retrieval as context mode"""
+        return [doc.to_dict() for doc in self._retrieve(query, scope_filters)]
+    
+    def _make_vector_db(self, table_name: str):
+        """Create the configured vector store for a table"""
+        if self.vector_store == "local":
+            return LocalVectorDb(path=os.path.join(self.local_store_dir, table_name), embedder=self.embedder,
+                                 indexed_fields=DOCUMENT_FIELDS, **self.index_params)
+        return PgVector(
+            table_name=table_name,
+            db_url=self.db_url,
+            db_engine=get_engine(self.db_url, pool_size=self.db_pool_size, max_overflow=self.db_max_overflow),
+            embedder=self.embedder
+        )
+    
+    def db_pool_metrics(self):
+        """Utilization and checkout-wait metrics of the shared connection pool"""
+        return pool_metrics(self.db_url)
+    
+    def _ingest(self, url: str, table_name: str, incremental: bool, streaming: bool = False, background: bool = False,
+                meta_data: dict = None):
+        """Fingerprint the document and its chunks, writing only what changed"""
+        vector_db = self.current_knowledge_base.vector_db
+        fetched = self.fetcher.fetch(url)
+        fingerprint = fetched.sha256
+
+        if incremental:
+            previous = self.manifest.get_chunk_ids(table_name, url)
+            if self.manifest.get_fingerprint(table_name, url) == fingerprint and vector_db.exists():
+                print("Document unchanged since last load, skipping ingestion")
+                return {"added": 0, "skipped": len(previous), "removed": 0}
+        else:
+            previous = set()
+            vector_db.drop()
+            self.manifest.clear_table(table_name)
+            self.lexical_index.clear()
+        vector_db.create()
+        # The table's contents are about to change, so cached answers are stale
+        self._invalidate_answers(table_name)
+
+        if streaming:
+            def finish(stats, current):
+                stale = previous - current
+                delete_chunks(vector_db, sorted(stale))
+                self.lexical_index.remove(stale)
+                self.lexical_index.save()
+                self.manifest.save(table_name, url, fingerprint, current)
+                stats["removed"] = len(stale)
+                self._ensure_index()
+                self._invalidate_answers(table_name)
+
+            pipeline = IngestPipeline(vector_db, self.embedder, url, skip_ids=previous, upsert=incremental,
+                                      meta_data=meta_data, on_write=self.lexical_index.add, on_complete=finish)
+            # The cached blob is read in place and kept for the next load
+            pipeline.start(fetched.path, delete_file=False)
+            return pipeline if background else pipeline.wait()
+
+        documents = read_pdf_documents(fetched.read(), url, meta_data=meta_data)
+        current = {doc.id for doc in documents}
+        new_documents = [doc for doc in documents if doc.id not in previous]
+        stale = previous - current
+
+        if new_documents:
+            # One batched encode for the whole document (sharded over the worker pool when enabled);
+            # the writers below reuse the attached vectors or hit the embedder cache
+            embedded = self.embedder.get_embedding_batch([doc.content for doc in new_documents])
+            for doc, vector, tokens in zip(new_documents, embedded.vectors, embedded.token_counts):
+                doc.embedding = vector.tolist()
+                doc.usage = {"prompt_tokens": int(tokens), "total_tokens": int(tokens)}
+            if self.vector_store == "pgvector" and len(new_documents) >= self.bulk_load_threshold:
+                PgVectorBulkLoader(vector_db).load(new_documents, upsert=incremental)
+            elif incremental:
+                vector_db.upsert(new_documents)
+            else:
+                vector_db.insert(new_documents)
+        delete_chunks(vector_db, sorted(stale))
+        self.lexical_index.add(new_documents)
+        self.lexical_index.remove(stale)
+        self.lexical_index.save()
+        self.manifest.save(table_name, url, fingerprint, current)
+        self._ensure_index()
+
+        return {"added": len(new_documents), "skipped": len(documents) - len(new_documents), "removed": len(stale)}
+    
+    def _ensure_index(self):
+        """Build the ANN index once the table is large enough, rebuild it when rows drifted"""
+        if self.index_manager is not None:
+            self.index_manager.ensure()
+        vector_db = self.current_knowledge_base.vector_db
+        if self.vector_store == "local":
+            vector_db.ensure_index()
+        if self.vector_store == "local" and self.quantization and vector_db.quantization != self.quantization:
+            # Calibrated once; later rows are encoded with the same calibration as they are written
+            vector_db.quantize(self.quantization)
+    
+    def _invalidate_answers(self, table_name: str):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(table_name)
+    
     def show_sample_content(self, num_samples: int = 5):
         """Show sample content from the knowledge base"""
         try:
@@ -73,21 +374,63 @@ class DocumentQA:
         except Exception as e:
             print(f"Error showing samples: {e}")
     
-    def ask(self, question: str):
-        """Ask a question about the loaded document"""
-        if not self.current_knowledge_base or not self.agent:
-            print("Please load a document first!")
-            return
+    def _retrieve(self, question: str, filters: dict = None, **search_params):
+        """Top-k chunks for a question using the configured retrieval mode"""
+        if self.index_manager is None:
+            search_params = {}  # ef_search/probes only apply to pgvector ANN indexes
+        if self.retrieval == "hybrid":
+            return self.retriever.search(question, limit=self.top_k, filters=filters, **search_params)
+        if self.index_manager is not None:
+            return self.index_manager.search(question, limit=self.top_k, filters=filters, **search_params)
+        return self.current_knowledge_base.vector_db.search(question, limit=self.top_k, filters=filters)
+    
+    def _pack_context(self, question: str, docs: list, question_vector=None) -> dict:
+        """Run the context packer, reusing the chunk embeddings returned by the vector store"""
+        contents = [doc.content if hasattr(doc, 'content') else doc.text for doc in docs]
+        embeddings = np.empty((len(docs), self.embedder.dimensions), dtype=np.float32)
+        missing = []
+        for i, doc in enumerate(docs):
+            if getattr(doc, 'embedding', None) is not None:
+                embeddings[i] = doc.embedding
+            else:
+                missing.append(i)  # lexical-only hits carry no vector
+        if missing:
+            embeddings[missing] = self.embedder.get_embedding_array([contents[i] for i in missing])
+        if question_vector is None:
+            question_vector = self.embedder.get_embedding_array(question)
+        pages = [(getattr(doc, 'meta_data', None) or {}).get("page") for doc in docs]
+        return self.context_packer.pack(question, contents, embeddings, question_vector, pages)
+    
+    def _prepare_answer(self, question: str, filters: dict = None, ef_search: int = None, probes: int = None) -> dict:
+        """Everything before the LLM call: answer cache lookup, retrieval and the prompt
 
-        print(f"\nQ: {question}")
-        try:
+        Returns a dict with "answer" on a cache hit, otherwise the agent, prompt and
+        bookkeeping _finish_answer needs.
+        """
+        stats = {"mode": self.answer_mode, "retrievals": 0, "llm_calls": 0, "cache_hit": False}
+        chunk_ids = []
+        question_vector = None
+        if self.answer_cache is not None:
+            question_vector = self.embedder.get_embedding_array(question)
+            cached = self.answer_cache.lookup(self._cache_scope(filters), question, question_vector)
+            if cached is not None:
+                stats.update(cache_hit=True, similarity=cached["similarity"])
+                self.last_answer_stats = stats
+                print(f"Answer served from cache (similar question: {cached['question']!r})")
+                return {"answer": cached["answer"]}
+
+        if self.answer_mode == "context":
             # Get relevant documents
-            relevant_docs = self.current_knowledge_base.search(question)
+            search_params = {k: v for k, v in (("ef_search", ef_search), ("probes", probes)) if v}
+            relevant_docs = self._retrieve(question, filters, **search_params)
+            stats["retrievals"] += 1
             print("\nRelevant documents found:", len(relevant_docs) if relevant_docs else 0)
 
-            # Build context from relevant documents
-            context = "\n".join([doc.content if hasattr(doc, 'content') else doc.text
-                              for doc in relevant_docs])
+            # Build context from relevant documents, deduplicated and within the token budget
+            packed = self._pack_context(question, relevant_docs, question_vector)
+            context = "\n".join(packed["chunks"])
+            chunk_ids = [relevant_docs[i].id for i in packed["indices"]]
+            stats.update(context_tokens=packed["tokens"], tokens_saved=packed["tokens_saved"])
 
             # Create a prompt that includes the context
             full_prompt = f"""Based on the following content:
@@ -97,13 +440,130 @@ class DocumentQA:
             Question: {question}
             
             Please provide a detailed answer based ONLY on the information provided above."""
+        else:
+            full_prompt = f"""Search the knowledge base to answer this question.
+            
+            Question: {question}
+            
+            Please provide a detailed answer based ONLY on the information found in the knowledge base."""
+
+        # A fresh agent per question: agno keeps the current run on the agent, so concurrent
+        # questions sharing one could read each other's response. Agentic searches are scoped
+        # to the filters too
+        agent = self._build_agent(filters)
+        return {"agent": agent, "prompt": full_prompt, "stats": stats, "chunk_ids": chunk_ids,
+                "question_vector": question_vector}
+
+    def _finish_answer(self, question: str, filters: dict, plan: dict, response):
+        """Record answer stats and cache the answer"""
+        stats = plan["stats"]
+        stats["retrievals"] += sum(1 for tool in (response.tools or []) if _tool_name(tool) == "search_knowledge_base")
+        stats["llm_calls"] = sum(1 for message in (response.messages or []) if message.role == "assistant")
+        self.last_answer_stats = stats
+        print(f"Retrievals: {stats['retrievals']}, LLM calls: {stats['llm_calls']}")
+        if self.answer_cache is not None and response.content:
+            self.answer_cache.store(self._cache_scope(filters), question, plan["question_vector"], response.content,
+                                    plan["chunk_ids"])
+        return response.content
+
+    def ask(self, question: str, filters: dict = None, ef_search: int = None, probes: int = None):
+        """
+        Ask a question about the loaded document
+        
+        Args:
+            question (str): The question
+            filters (dict): Metadata the chunks must match, e.g. {"issuer": "AAPL", "fiscal_year": 2024};
+                applied inside the vector and lexical searches, before ranking
+            ef_search (int): HNSW candidate list size for this question's search (recall vs latency)
+            probes (int): IVFFlat lists scanned for this question's search
+        """
+        if not self.current_knowledge_base or not self.agent:
+            print("Please load a document first!")
+            return
+
+        print(f"\nQ: {question}")
+        try:
+            plan = self._prepare_answer(question, filters, ef_search, probes)
+            if "answer" in plan:
+                return plan["answer"]
+            response = plan["agent"].run(plan["prompt"])
+            return self._finish_answer(question, filters, plan, response)
+
+        except Exception as e:
+            print(f"Error: {e}")
+            import traceback
+            print(traceback.format_exc())
+            return f"Error processing question: {str(e)}"
+
+    async def aask(self, question: str, filters: dict = None, ef_search: int = None, probes: int = None):
+        """
+        Ask a question without blocking the event loop
+
+        Embedding and retrieval run in a worker thread and the LLM call is awaited, so many
+        questions can be in flight at once; the Groq rate limiter paces the LLM calls.
+        Arguments are the same as ask().
+        """
+        if not self.current_knowledge_base or not self.agent:
+            print("Please load a document first!")
+            return
+
+        print(f"\nQ: {question}")
+        try:
+            plan = await asyncio.to_thread(self._prepare_answer, question, filters, ef_search, probes)
+            if "answer" in plan:
+                return plan["answer"]
+            response = await plan["agent"].arun(plan["prompt"])
+            return self._finish_answer(question, filters, plan, response)
+
+        except Exception as e:
+            print(f"Error: {e}")
+            import traceback
+            print(traceback.format_exc())
+            return f"Error processing question: {str(e)}"
 
-            # Get response with context
-            response = self.agent.run(full_prompt)
-            return response.content
+    def ask_stream(self, question: str, filters: dict = None, ef_search: int = None, probes: int = None):
+        """
+        Ask a question, yielding StreamEvents as the answer is generated
+
+        Arguments are the same as ask(). A cached answer arrives as a single token event. The
+        final "done" event carries this call's timings, retrieval included.
+        """
+        if not self.current_knowledge_base or not self.agent:
+            print("Please load a document first!")
+            return
+
+        print(f"\nQ: {question}")
+        started = time.perf_counter()
+        try:
+            plan = self._prepare_answer(question, filters, ef_search, probes)
+            if "answer" in plan:
+                yield from answer_events(plan["answer"], started)
+                return
+            for event in stream_run(plan["agent"], plan["prompt"], started):
+                if event.kind == "done":
+                    # The streamed run leaves the assembled response on this question's own agent
+                    self._finish_answer(question, filters, plan, plan["agent"].run_response)
+                yield event
 
         except Exception as e:
             print(f"Error: {e}")
             import traceback
             print(traceback.format_exc())
-            return f"Error processing question: {str(e)}"
\ No newline at end of file
+            yield StreamEvent("error", f"Error processing question: {str(e)}")
+
+    def _cache_scope(self, filters: dict = None) -> str:
+        """Answer cache scope: the table, narrowed by any filters (invalidated with the table)"""
+        if not filters:
+            return self.table_name
+        return f"{self.table_name}|{json.dumps(filters, sort_keys=True)}"
+
+def _default_doc_id(url: str) -> str:
+    """Document id derived from the URL's file name"""
+    name = url.rstrip("/").split("/")[-1].split("?")[0]
+    return os.path.splitext(name)[0] or url
+
+def _tool_name(tool):
+    """Tool name from a ToolExecution or a tool-call dict"""
+    if isinstance(tool, dict):
+        return tool.get("tool_name")
+    return getattr(tool, "tool_name", None)
\ No newline at end of file
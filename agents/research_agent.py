@@ -1,15 +1,17 @@
 from textwrap import dedent
 from agno.agent import Agent
-from agno.models.groq import Groq
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.newspaper4k import Newspaper4kTools
 
+from utils.llm import make_groq
+from utils.streaming import StreamEvent, stream_run
+
 class ResearchAgent:
     """Agent for web research and financial analysis"""
     
     def __init__(self):
         self.agent = Agent(
-            model=Groq(id="llama3-70b-8192"),
+            model=make_groq(id="llama3-70b-8192"),
             tools=[DuckDuckGoTools(), Newspaper4kTools()],
             description=dedent("""\
                 You are an elite research analyst in the financial services domain.
@@ -106,4 +108,21 @@ class ResearchAgent:
             return response.content
         except Exception as e:
             print(f"Error running research query: {e}")
-            return f"Error: {str(e)}"
\ No newline at end of file
+            return f"Error: {str(e)}"
+
+    async def arun(self, query):
+        """Run a research query without blocking the event loop"""
+        try:
+            response = await self.agent.arun(query)
+            return response.content
+        except Exception as e:
+            print(f"Error running research query: {e}")
+            return f"Error: {str(e)}"
+
+    def run_stream(self, query):
+        """Run a research query, yielding StreamEvents as tokens and tool calls arrive"""
+        try:
+            yield from stream_run(self.agent, query)
+        except Exception as e:
+            print(f"Error running research query: {e}")
+            yield StreamEvent("error", f"Error: {str(e)}")
\ No newline at end of file
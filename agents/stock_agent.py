@@ -1,16 +1,25 @@
 from textwrap import dedent
 from agno.agent import Agent
-from agno.models.groq import Groq
-from agno.tools.yfinance import YFinanceTools
+
+from utils.llm import make_groq
+from utils.market_data import CachedYFinanceTools, get_market_data_cache
+from utils.streaming import StreamEvent, stream_run
 
 class StockAnalysisAgent:
     """Agent for stock market analysis"""
     
-    def __init__(self):
+    def __init__(self, market_data=None):
+        """
+        Args:
+            market_data (MarketDataCache): Market data cache for the tools; by default the
+                process-wide one, so every agent and session shares quotes and fundamentals
+        """
+        self.market_data = market_data if market_data is not None else get_market_data_cache()
         self.agent = Agent(
-            model=Groq(id="llama3-70b-8192"),
+            model=make_groq(id="llama3-70b-8192"),
             tools=[
-                YFinanceTools(
+                CachedYFinanceTools(
+                    cache=self.market_data,
                     stock_price=True,
                     analyst_recommendations=True,
                     stock_fundamentals=True,
@@ -62,4 +71,25 @@ class StockAnalysisAgent:
             return response.content
         except Exception as e:
             print(f"Error analyzing stocks: {e}")
-            return f"Error: {str(e)}"
\ No newline at end of file
+            return f"Error: {str(e)}"
+
+    async def aanalyze(self, query):
+        """Analyze stocks based on query without blocking the event loop"""
+        try:
+            response = await self.agent.arun(query)
+            return response.content
+        except Exception as e:
+            print(f"Error analyzing stocks: {e}")
+            return f"Error: {str(e)}"
+
+    def analyze_stream(self, query):
+        """Analyze stocks, yielding StreamEvents as tokens and tool calls arrive"""
+        try:
+            yield from stream_run(self.agent, query)
+        except Exception as e:
+            print(f"Error analyzing stocks: {e}")
+            yield StreamEvent("error", f"Error: {str(e)}")
+
+    def market_data_metrics(self):
+        """Hit rates, coalesced fetches and upstream latency of the market data cache"""
+        return self.market_data.metrics()
\ No newline at end of file
@@ -14,6 +14,8 @@ from agents.research_agent import ResearchAgent
 from agents.rag_agent import DocumentQA
 from agents.stock_agent import StockAnalysisAgent
 from agents.eval_agent import RAGEvaluator
+from utils.llm import llm_cache_stats
+from utils.rate_limit import limiter_metrics
 
 # Load environment variables
 def load_environment():
@@ -128,6 +130,41 @@ def extract_references(response):
     
     return unique_urls
 
+# Render a streamed agent response
+def render_stream(events, waiting="Working..."):
+    """Show tokens as they arrive and tool calls while they run; returns the full text
+
+    waiting is shown only until the first token (retrieval, tool calls, queueing for the
+    model), so it never hides an answer that is already being written.
+    """
+    status = st.empty()
+    placeholder = st.empty()
+    status.info(f"⏳ {waiting}")
+    text = ""
+    stats = None
+    for event in events:
+        if event.kind == "token":
+            if not text:
+                status.empty()
+            text += event.content
+            placeholder.markdown(text + "▌")
+        elif event.kind == "tool_started":
+            status.info(f"🔧 Running {event.tool_name}...")
+        elif event.kind == "tool_completed":
+            if text:
+                status.empty()
+            else:
+                status.info(f"⏳ {waiting}")
+        elif event.kind == "error":
+            text += f"\n\n{event.content}"
+        elif event.kind == "done":
+            stats = event.stats
+    status.empty()
+    placeholder.markdown(text)
+    if stats is not None and stats["ttft_ms"] is not None:
+        st.caption(f"Time to first token: {stats['ttft_ms']:.0f} ms · Total: {stats['total_ms']:.0f} ms")
+    return text
+
 # Initialize agents
 def initialize_agents():
     with st.sidebar:
@@ -168,6 +205,16 @@ def initialize_agents():
                     st.success("✅ Evaluation Agent initialized")
                 except Exception as e:
                     st.error(f"Error initializing Evaluation Agent: {str(e)}")
+        
+        # Shared Groq quota usage (requests, tokens, 429s, time queued per model) and response cache hits
+        with st.expander("Groq rate limits"):
+            st.json(limiter_metrics())
+            st.json(llm_cache_stats())
+        
+        # Shared yfinance cache: hit rates per endpoint and fetches coalesced across sessions
+        if st.session_state.stock_agent is not None:
+            with st.expander("Market data cache"):
+                st.json(st.session_state.stock_agent.market_data_metrics())
 
 # Stock analysis tab
 def stock_analysis_tab():
@@ -180,38 +227,37 @@ def stock_analysis_tab():
     query = st.text_area("Enter a stock query (e.g., 'AAPL' or 'Compare MSFT and GOOGL')", height=100)
     
     if st.button("Analyze Stock") and query:
-        with st.spinner("Analyzing stock data..."):
-            try:
-                response = st.session_state.stock_agent.analyze(query)
-                
-                # Extract references with improved function
-                urls = extract_references(response)
-                
-                # If no URLs found, try to extract stock symbols
-                if not urls:
-                    # Extract potential stock symbols from the query and response
-                    stock_symbols = set(re.findall(r'\b[A-Z]{1,5}\b', query.upper() + " " + str(response)))
-                    # Filter common words that might be captured as symbols
-                    common_words = {"A", "I", "THE", "AND", "FOR", "TO", "IN", "OF", "ON"}
-                    stock_symbols = [s for s in stock_symbols if s not in common_words and len(s) <= 5]
-                    
-                    for symbol in stock_symbols:
-                        urls.append(f"https://finance.yahoo.com/quote/{symbol}")
-                
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                for url in urls:
-                    st.session_state.references.append((query, "Stock Analysis", url, timestamp))
-                
-                st.session_state.chat_history.append(("Stock Query", query))
-                st.session_state.chat_history.append(("Stock Analysis", response))
-                st.markdown(response)
+        try:
+            agent = st.session_state.stock_agent
+            response = render_stream(agent.analyze_stream(query), "Analyzing stock data...")
+            
+            # Extract references with improved function
+            urls = extract_references(response)
+            
+            # If no URLs found, try to extract stock symbols
+            if not urls:
+                # Extract potential stock symbols from the query and response
+                stock_symbols = set(re.findall(r'\b[A-Z]{1,5}\b', query.upper() + " " + str(response)))
+                # Filter common words that might be captured as symbols
+                common_words = {"A", "I", "THE", "AND", "FOR", "TO", "IN", "OF", "ON"}
+                stock_symbols = [s for s in stock_symbols if s not in common_words and len(s) <= 5]
                 
-                # Show reference count
-                if urls:
-                    st.success(f"Found {len(urls)} references. View them in the References tab.")
-            except Exception as e:
-                st.error(f"Error analyzing stock: {str(e)}")
-                st.code(traceback.format_exc())
+                for symbol in stock_symbols:
+                    urls.append(f"https://finance.yahoo.com/quote/{symbol}")
+            
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+            for url in urls:
+                st.session_state.references.append((query, "Stock Analysis", url, timestamp))
+            
+            st.session_state.chat_history.append(("Stock Query", query))
+            st.session_state.chat_history.append(("Stock Analysis", response))
+            
+            # Show reference count
+            if urls:
+                st.success(f"Found {len(urls)} references. View them in the References tab.")
+        except Exception as e:
+            st.error(f"Error analyzing stock: {str(e)}")
+            st.code(traceback.format_exc())
 
 # Research tab
 def research_tab():
@@ -224,25 +270,24 @@ def research_tab():
     query = st.text_area("Enter a research topic", height=100)
     
     if st.button("Research") and query:
-        with st.spinner("Conducting research..."):
-            try:
-                response = st.session_state.research_agent.run(query)
-                
-                # Extract references
-                urls = extract_references(response)
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                for url in urls:
-                    st.session_state.references.append((query, "Research", url, timestamp))
-                
-                st.session_state.chat_history.append(("Research Query", query))
-                st.session_state.chat_history.append(("Research Results", response))
-                st.markdown(response)
-                
-                # Show reference count
-                if urls:
-                    st.success(f"Found {len(urls)} references. View them in the References tab.")
-            except Exception as e:
-                st.error(f"Error conducting research: {str(e)}")
+        try:
+            agent = st.session_state.research_agent
+            response = render_stream(agent.run_stream(query), "Conducting research...")
+            
+            # Extract references
+            urls = extract_references(response)
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+            for url in urls:
+                st.session_state.references.append((query, "Research", url, timestamp))
+            
+            st.session_state.chat_history.append(("Research Query", query))
+            st.session_state.chat_history.append(("Research Results", response))
+            
+            # Show reference count
+            if urls:
+                st.success(f"Found {len(urls)} references. View them in the References tab.")
+        except Exception as e:
+            st.error(f"Error conducting research: {str(e)}")
 
 # Document QA tab
 def document_qa_tab():
@@ -254,11 +299,13 @@ def document_qa_tab():
     
     # PDF URL input
     pdf_url = st.text_input("Enter a PDF URL to analyze")
+    incremental = st.checkbox("Incremental load (only re-embed changed chunks)", value=True)
+    streaming = st.checkbox("Streaming load (page-wise pipeline, bounded memory)", value=False)
     
     if st.button("Load PDF") and pdf_url:
         with st.spinner("Loading PDF..."):
             try:
-                st.session_state.rag_agent.load_pdf_url(pdf_url)
+                st.session_state.rag_agent.load_pdf_url(pdf_url, incremental=incremental, streaming=streaming)
                 st.session_state.pdf_loaded = True
                 st.success("PDF loaded successfully!")
                 
@@ -273,20 +320,18 @@ def document_qa_tab():
         question = st.text_input("Ask a question about the document")
         
         if st.button("Ask") and question:
-            with st.spinner("Finding answer..."):
-                try:
-                    # Direct call to your existing ask method
-                    response = st.session_state.rag_agent.ask(question)
-                    st.session_state.chat_history.append(("Document Question", question))
-                    st.session_state.chat_history.append(("Document Answer", response))
-                    st.markdown(response)
-                except Exception as e:
-                    st.error(f"Error processing question: {str(e)}")
-                    # Message to user on what to try instead
-                    st.info("If you're encountering errors with the RAG agent, try:")
-                    st.info("1. Using a simpler question")
-                    st.info("2. Using a different PDF document")
-                    st.info("3. Checking the console logs for detailed error information")
+            try:
+                agent = st.session_state.rag_agent
+                response = render_stream(agent.ask_stream(question), "Finding answer...")
+                st.session_state.chat_history.append(("Document Question", question))
+                st.session_state.chat_history.append(("Document Answer", response))
+            except Exception as e:
+                st.error(f"Error processing question: {str(e)}")
+                # Message to user on what to try instead
+                st.info("If you're encountering errors with the RAG agent, try:")
+                st.info("1. Using a simpler question")
+                st.info("2. Using a different PDF document")
+                st.info("3. Checking the console logs for detailed error information")
     else:
         st.info("Please load a PDF document first.")
 
@@ -303,15 +348,15 @@ def evaluation_tab():
     context = st.text_area("Context (separate multiple contexts with commas)", height=150)
     
     if st.button("Evaluate") and query and response:
-        with st.spinner("Evaluating response..."):
-            try:
-                context_list = [c.strip() for c in context.split(",")]
-                evaluation = st.session_state.eval_agent.evaluate(query, response, context_list)
-                st.session_state.chat_history.append(("Evaluation Request", f"Query: {query}"))
-                st.session_state.chat_history.append(("Evaluation Results", evaluation))
-                st.markdown(evaluation)
-            except Exception as e:
-                st.error(f"Error during evaluation: {str(e)}")
+        try:
+            context_list = [c.strip() for c in context.split(",")]
+            agent = st.session_state.eval_agent
+            evaluation = render_stream(agent.evaluate_stream(query, response, context_list),
+                                       "Evaluating response...")
+            st.session_state.chat_history.append(("Evaluation Request", f"Query: {query}"))
+            st.session_state.chat_history.append(("Evaluation Results", evaluation))
+        except Exception as e:
+            st.error(f"Error during evaluation: {str(e)}")
 
 # Chat history tab
 def chat_history_tab():
@@ -0,0 +1,35 @@
+"""Embedding throughput and cosine agreement of the torch, ONNX and ONNX int8 backends
+
+Usage: python -m benchmarks.bench_embedding_backends [--texts 2000] [--threads 4] [--backends torch onnx onnx-int8]
+"""
+import argparse
+
+from utils.embedding_backends import BACKENDS, compare_backends
+
+SENTENCES = [
+    "Revenue grew {n}% year over year, driven by services and wearables.",
+    "Operating expenses for fiscal {n} included research and development costs.",
+    "The company reduced scope 1 and 2 emissions by {n} percent since 2015.",
+    "Net cash provided by operating activities was ${n} billion.",
+    "Risk factors include supply chain disruption and foreign exchange exposure in year {n}.",
+]
+
+
+def make_texts(n):
+    return [SENTENCES[i % len(SENTENCES)].format(n=i) for i in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    report = compare_backends(make_texts(args.texts), backends=args.backends, threads=args.threads,
+                              batch_size=args.batch_size)
+    print(f"{'backend':>10} {'texts/s':>10} {'mean cos':>9} {'min cos':>8} {'nn agree':>9} {'ok':>4}")
+    for row in report:
+        print(f"{row['backend']:>10} {row['texts_per_second']:>10.1f} {row['mean_cosine']:>9.4f} "
+              f"{row['min_cosine']:>8.4f} {row['neighbour_agreement']:>9.2%} {'yes' if row['passed'] else 'no':>4}")
@@ -0,0 +1,30 @@
+"""Embedding throughput of the multi-process ParallelEmbedder as the worker count grows
+
+Usage: python -m benchmarks.bench_parallel_embeddings [--texts 8000] [--workers 1 2 4 8] [--backend torch]
+"""
+import argparse
+import os
+
+from benchmarks.bench_embedding_backends import make_texts
+from utils.embedding_backends import BACKENDS
+from utils.parallel_embeddings import measure_throughput
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=8000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({w for w in (1, 2, 4, 8, cores) if w <= cores}))
+    parser.add_argument("--shard-size", type=int, default=256)
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    report = measure_throughput(make_texts(args.texts), args.workers, model_name=args.model,
+                                backend=args.backend, shard_size=args.shard_size)
+    print(f"{'workers':>8} {'threads':>8} {'texts/s':>10} {'speedup':>8} {'max diff':>10}")
+    for row in report:
+        workers = row["workers"] or "inline"
+        print(f"{workers:>8} {row['threads_per_worker']:>8} {row['texts_per_second']:>10.1f} "
+              f"{row['speedup']:>7.2f}x {row['max_abs_diff']:>10.2e}")
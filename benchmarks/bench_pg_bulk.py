@@ -0,0 +1,70 @@
+"""Compare PgVector.insert with the binary COPY bulk loader on a local Postgres
+
+Usage: python -m benchmarks.bench_pg_bulk [--rows 20000] [--db-url URL]
+"""
+import argparse
+import time
+
+import numpy as np
+from agno.document import Document
+from agno.vectordb.pgvector import PgVector
+
+from utils.db_utils import DEFAULT_DB_URL, get_engine
+from utils.pg_bulk import PgVectorBulkLoader
+
+
+class RandomEmbedder:
+    """Cheap deterministic embedder so the benchmark measures the write path only"""
+
+    dimensions = 384
+
+    def __init__(self):
+        self._rng = np.random.default_rng(0)
+
+    def get_embedding(self, text):
+        return self._rng.standard_normal(self.dimensions, dtype=np.float32).tolist()
+
+    def get_embedding_and_usage(self, text):
+        return self.get_embedding(text), None
+
+
+def make_documents(n):
+    return [
+        Document(id=f"bench-{i}", name="bench", content=f"chunk {i} " + "lorem ipsum " * 80, meta_data={"page": i // 10})
+        for i in range(n)
+    ]
+
+
+def run(rows, db_url):
+    engine = get_engine(db_url)
+    embedder = RandomEmbedder()
+
+    orm_db = PgVector(table_name="bench_orm_insert", db_engine=engine, embedder=embedder)
+    orm_db.drop()
+    orm_db.create()
+    started = time.perf_counter()
+    orm_db.insert(make_documents(rows))
+    orm_seconds = time.perf_counter() - started
+
+    bulk_db = PgVector(table_name="bench_bulk_copy", db_engine=engine, embedder=embedder)
+    bulk_db.drop()
+    bulk_db.create()
+    loader = PgVectorBulkLoader(bulk_db)
+    insert_stats = loader.load(make_documents(rows), upsert=False)
+    upsert_stats = loader.load(make_documents(rows), upsert=True)
+
+    print(f"rows: {rows}")
+    print(f"PgVector.insert:        {orm_seconds:8.2f} s  ({rows / orm_seconds:10.0f} rows/s)")
+    print(f"COPY insert:            {insert_stats['seconds']:8.2f} s  ({rows / insert_stats['seconds']:10.0f} rows/s)")
+    print(f"COPY upsert (staged):   {upsert_stats['seconds']:8.2f} s  ({rows / upsert_stats['seconds']:10.0f} rows/s)")
+
+    orm_db.drop()
+    bulk_db.drop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+    run(args.rows, args.db_url)
@@ -0,0 +1,48 @@
+"""Recall vs latency sweep of the ANN index on a loaded pgvector table
+
+Queries are sampled from the table's own chunks, so no labelled query set is needed.
+
+Usage: python -m benchmarks.bench_pg_index [--table documents] [--kind hnsw] [--queries 50] [--limit 10] [--db-url URL]
+"""
+import argparse
+
+from agno.vectordb.pgvector import PgVector
+from sqlalchemy import text
+
+from utils.db_utils import DEFAULT_DB_URL, get_engine
+from utils.embeddings import EmbeddingModel
+from utils.pg_index import VectorIndexManager
+
+
+def sample_queries(vector_db, n):
+    """First sentence of n random chunks"""
+    with vector_db.Session() as sess:
+        rows = sess.execute(text(
+            f'SELECT content FROM "{vector_db.schema}"."{vector_db.table_name}" ORDER BY random() LIMIT :n'
+        ), {"n": n}).fetchall()
+    return [row[0].split(".")[0][:300] for row in rows]
+
+
+def run(table, kind, n_queries, limit, db_url):
+    vector_db = PgVector(table_name=table, db_engine=get_engine(db_url), embedder=EmbeddingModel())
+    manager = VectorIndexManager(vector_db, kind=kind, min_rows=0)
+    manager.ensure()
+    status = manager.status()
+    print(f"{status['index']}: {status['rows']} rows, {status['size_bytes'] / 1e6:.1f} MB")
+
+    report = manager.measure_recall(sample_queries(vector_db, n_queries), limit=limit)
+    knob = "ef_search" if kind == "hnsw" else "probes"
+    print(f"{knob:>10} {'recall@' + str(limit):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in report:
+        print(f"{row[knob]!s:>10} {row['recall']:>10.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--table", default="documents")
+    parser.add_argument("--kind", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--db-url", default=DEFAULT_DB_URL)
+    args = parser.parse_args()
+    run(args.table, args.kind, args.queries, args.limit, args.db_url)
@@ -1,9 +1,32 @@
+from utils.profiling import profiler
+
+import importlib
 import os
 from dotenv import load_dotenv
-from agents.research_agent import ResearchAgent
-from agents.rag_agent import DocumentQA
-from agents.stock_agent import StockAnalysisAgent
-from agents.eval_agent import RAGEvaluator
+
+def import_agent(module_name, class_name):
+    """Import an agent class on first use, so each command only pays for its own dependencies"""
+    with profiler.section(f"import {module_name}"):
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+def print_stream(events):
+    """Print tokens as they arrive and tool calls on their own lines, then the timings"""
+    stats = None
+    for event in events:
+        if event.kind == "token":
+            print(event.content, end="", flush=True)
+        elif event.kind == "tool_started":
+            print(f"\n🔧 {event.tool_name}...", flush=True)
+        elif event.kind == "error":
+            print(f"\n❌ {event.content}")
+        elif event.kind == "done":
+            stats = event.stats
+    if stats is None:
+        return  # the stream failed before the agent finished
+    ttft = f"{stats['ttft_ms']:.0f} ms" if stats["ttft_ms"] is not None else "n/a"
+    total = f"{stats['total_ms']:.0f} ms" if stats["total_ms"] is not None else "n/a"
+    print(f"\n\nTime to first token: {ttft}, total: {total}, tool calls: {stats['tool_calls']}")
 
 def load_environment():
     """Load environment variables"""
@@ -27,6 +50,7 @@ def load_environment():
 def demo_rag_agent():
     """Demonstrate RAG agent capabilities"""
     print("\n=== RAG Agent Demo ===")
+    DocumentQA = import_agent("agents.rag_agent", "DocumentQA")
     rag_qa = DocumentQA()
     rag_qa.load_pdf_url("https://www.apple.com/environment/pdf/Apple_Environmental_Progress_Report_2024.pdf")
     
@@ -44,6 +68,7 @@ def demo_rag_agent():
 def demo_research_agent():
     """Demonstrate research agent capabilities"""
     print("\n=== Research Agent Demo ===")
+    ResearchAgent = import_agent("agents.research_agent", "ResearchAgent")
     research_agent = ResearchAgent()
     
     query = "Analyze the current state and future implications of artificial intelligence in Finance"
@@ -54,6 +79,7 @@ def demo_research_agent():
 def demo_stock_agent():
     """Demonstrate stock analysis agent capabilities"""
     print("\n=== Stock Analysis Agent Demo ===")
+    StockAnalysisAgent = import_agent("agents.stock_agent", "StockAnalysisAgent")
     stock_agent = StockAnalysisAgent()
     
     query = "What's the latest news and financial performance of Apple (AAPL)?"
@@ -64,6 +90,7 @@ def demo_stock_agent():
 def demo_eval_agent():
     """Demonstrate evaluation agent capabilities"""
     print("\n=== Evaluation Agent Demo ===")
+    RAGEvaluator = import_agent("agents.eval_agent", "RAGEvaluator")
     evaluator = RAGEvaluator()
     
     query = "What are the key features of transformer models?"
@@ -98,24 +125,77 @@ def main():
 if __name__ == "__main__":
     import sys
     
+    # --profile-startup prints import and model-load times when the command finishes
+    profile_startup = "--profile-startup" in sys.argv
+    if profile_startup:
+        sys.argv.remove("--profile-startup")
+        import atexit
+        
+        def print_startup_profile():
+            from utils.model_registry import loaded_models
+            for model_name, seconds in loaded_models().items():
+                profiler.record(f"load model {model_name}", seconds)
+            print(profiler.report())
+        
+        atexit.register(print_startup_profile)
+    
+    # --llm-cache MODE caches Groq responses on disk: read_write, record, or replay (offline, fails on a miss)
+    if "--llm-cache" in sys.argv:
+        position = sys.argv.index("--llm-cache")
+        if position + 1 >= len(sys.argv):
+            print("Usage: --llm-cache [read_write|record|replay|off]")
+            sys.exit(1)
+        import atexit
+        from utils.llm import configure_llm_cache, llm_cache_stats
+        configure_llm_cache(mode=sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+        atexit.register(lambda: print(f"LLM cache: {llm_cache_stats()}"))
+    
+    # --stream-tokens prints the answer as it is generated, with time to first token and total time
+    stream_tokens = "--stream-tokens" in sys.argv
+    if stream_tokens:
+        sys.argv.remove("--stream-tokens")
+    
     if len(sys.argv) < 2:
-        print("Usage: python main.py [rag|research|stock|evaluate] [args...]")
+        print("Usage: python main.py [--profile-startup] [--llm-cache MODE] [--stream-tokens] "
+              "[rag|research|stock|evaluate|evaluate-batch|demo] [args...]")
         sys.exit(1)
     
     command = sys.argv[1]
     
     if command == "rag":
+        # --incremental only re-embeds chunks that changed since the last load of this URL
+        incremental = "--incremental" in sys.argv
+        if incremental:
+            sys.argv.remove("--incremental")
+        # --stream runs the page-wise pipelined ingestion with bounded memory
+        streaming = "--stream" in sys.argv
+        if streaming:
+            sys.argv.remove("--stream")
+        # --local uses the embedded vector store instead of Postgres
+        vector_store = "local" if "--local" in sys.argv else "pgvector"
+        if vector_store == "local":
+            sys.argv.remove("--local")
         if len(sys.argv) < 4:
-            print("Usage: python main.py rag [pdf_url] [question]")
+            print("Usage: python main.py rag [--incremental] [--stream] [--local] [pdf_url] [question]")
             sys.exit(1)
         
         pdf_url = sys.argv[2]
         question = sys.argv[3]
         
-        rag_qa = DocumentQA()
-        rag_qa.load_pdf_url(pdf_url)
-        answer = rag_qa.ask(question)
-        print(answer)
+        DocumentQA = import_agent("agents.rag_agent", "DocumentQA")
+        with profiler.section("init DocumentQA"):
+            rag_qa = DocumentQA(vector_store=vector_store)
+        rag_qa.load_pdf_url(pdf_url, incremental=incremental, streaming=streaming)
+        if stream_tokens:
+            print_stream(rag_qa.ask_stream(question))
+        else:
+            answer = rag_qa.ask(question)
+            print(answer)
+    
+    elif command == "demo":
+        # The fixed demo queries; with --llm-cache repeated runs are served from disk
+        main()
     
     elif command == "research":
         if len(sys.argv) < 3:
@@ -123,9 +203,14 @@ if __name__ == "__main__":
             sys.exit(1)
         
         topic = sys.argv[2]
-        research_agent = ResearchAgent()
-        result = research_agent.run(topic)
-        print(result)
+        ResearchAgent = import_agent("agents.research_agent", "ResearchAgent")
+        with profiler.section("init ResearchAgent"):
+            research_agent = ResearchAgent()
+        if stream_tokens:
+            print_stream(research_agent.run_stream(topic))
+        else:
+            result = research_agent.run(topic)
+            print(result)
     
     elif command == "stock":
         if len(sys.argv) < 3:
@@ -133,9 +218,14 @@ if __name__ == "__main__":
             sys.exit(1)
         
         query = sys.argv[2]
-        stock_agent = StockAnalysisAgent()
-        result = stock_agent.analyze(query)
-        print(result)
+        StockAnalysisAgent = import_agent("agents.stock_agent", "StockAnalysisAgent")
+        with profiler.section("init StockAnalysisAgent"):
+            stock_agent = StockAnalysisAgent()
+        if stream_tokens:
+            print_stream(stock_agent.analyze_stream(query))
+        else:
+            result = stock_agent.analyze(query)
+            print(result)
     
     elif command == "evaluate":
         if len(sys.argv) < 5:
@@ -147,11 +237,53 @@ if __name__ == "__main__":
         context_csv = sys.argv[4]
         context_list = context_csv.split(",")
         
-        evaluator = RAGEvaluator()
-        result = evaluator.evaluate(query, response, context_list)
-        print(result)
+        RAGEvaluator = import_agent("agents.eval_agent", "RAGEvaluator")
+        with profiler.section("init RAGEvaluator"):
+            evaluator = RAGEvaluator()
+        if stream_tokens:
+            print_stream(evaluator.evaluate_stream(query, response, context_list))
+        else:
+            result = evaluator.evaluate(query, response, context_list)
+            print(result)
+    
+    elif command == "evaluate-batch":
+        # --concurrency N sets how many evaluations are in flight
+        usage = "Usage: python main.py evaluate-batch [--concurrency N] [--cascade] [cases.jsonl] [results.jsonl]"
+        concurrency = 4
+        if "--concurrency" in sys.argv:
+            position = sys.argv.index("--concurrency")
+            value = sys.argv[position + 1] if position + 1 < len(sys.argv) else ""
+            if not value.isdigit() or int(value) < 1:
+                print("❌ --concurrency needs a positive integer")
+                print(usage)
+                sys.exit(1)
+            concurrency = int(value)
+            del sys.argv[position:position + 2]
+        # --cascade scores clear-cut cases locally from embedding/lexical overlap, judging only the rest
+        cascade = "--cascade" in sys.argv
+        if cascade:
+            sys.argv.remove("--cascade")
+        if len(sys.argv) < 4:
+            print(usage)
+            sys.exit(1)
+        
+        import json
+        from utils.batch_eval import read_jsonl
+        cases = read_jsonl(sys.argv[2])
+        output_path = sys.argv[3]
+        
+        RAGEvaluator = import_agent("agents.eval_agent", "RAGEvaluator")
+        with profiler.section("init RAGEvaluator"):
+            evaluator = RAGEvaluator(cascade=cascade)
+        # Re-running with the same results file resumes after the last completed case
+        result = evaluator.evaluate_batch(cases, output_path, concurrency=concurrency)
+        summary_path = os.path.splitext(output_path)[0] + ".summary.json"
+        with open(summary_path, "w") as f:
+            json.dump(result["summary"], f, indent=2)
+        print(json.dumps(result["summary"], indent=2))
+        print(f"✅ Summary written to {summary_path}")
     
     else:
         print(f"Unknown command: {command}")
-        print("Available commands: rag, research, stock, evaluate")
+        print("Available commands: rag, research, stock, evaluate, evaluate-batch, demo")
         sys.exit(1)
\ No newline at end of file
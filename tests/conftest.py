@@ -0,0 +1,49 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Tests import the application modules the same way app.py and main.py do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import model_registry
+
+DEFAULT_MODEL = "sentence-transformers/paraphrase-MiniLM-L6-v2"
+
+
+class HashingModel:
+    """Deterministic stand-in for a SentenceTransformer: bag of hashed words, no download"""
+
+    def __init__(self, dimensions: int = 32):
+        self.dimensions = dimensions
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimensions
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.md5(word.encode("utf-8")).digest()
+                vectors[i, digest[0] % self.dimensions] += 1.0 if digest[1] % 2 else -1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1.0, norms)
+        return vectors
+
+
+@pytest.fixture
+def hashing_model():
+    """Register HashingModel as the default embedding model for the duration of a test"""
+    model = HashingModel()
+    with model_registry._registry_lock:
+        previous = model_registry._models.get(DEFAULT_MODEL)
+        model_registry._models[DEFAULT_MODEL] = model
+    yield model
+    with model_registry._registry_lock:
+        if previous is None:
+            model_registry._models.pop(DEFAULT_MODEL, None)
+        else:
+            model_registry._models[DEFAULT_MODEL] = previous
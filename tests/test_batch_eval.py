@@ -0,0 +1,64 @@
+import json
+
+from utils.batch_eval import BatchEvaluator, case_id, read_jsonl
+
+REPORT = """# RAG Evaluation Report
+### Faithfulness: 4/5
+### Context Relevance: 5/5
+### Answer Completeness: 3/5
+### Source Attribution: 4/5
+### Response Coherence: 5/5
+"""
+
+
+class FakeEvaluator:
+    """Scores every case with REPORT, except queries listed in fail, whose local stage raises"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    async def aevaluate_detailed(self, query, response, context):
+        self.calls.append(query)
+        if query in self.fail:
+            raise RuntimeError("pre-scoring failed")
+        return {"report": REPORT, "stage": "judge", "prescore": None}
+
+
+CASES = [
+    {"id": "ok-1", "query": "What was revenue?", "response": "Revenue was $10M.", "context": ["Revenue: $10M"]},
+    {"id": "no-response", "query": "What was debt?", "context": "Debt: $2M"},
+    {"id": "prescore-fails", "query": "What is the outlook?", "response": "Stable.", "context": []},
+    {"id": "ok-2", "query": "What was EBITDA?", "response": "EBITDA was $3M.", "context": ["EBITDA: $3M"]},
+]
+
+
+def test_failing_cases_are_recorded_without_aborting_the_batch(tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    result = BatchEvaluator(FakeEvaluator(fail={"What is the outlook?"}), concurrency=2).run(
+        CASES, output, progress=False)
+
+    assert [r["id"] for r in result["records"]] == ["ok-1", "ok-2"]
+    assert result["records"][0]["total"] == 21
+    assert result["summary"]["failed"] == 2
+    assert result["summary"]["metrics"]["faithfulness"]["mean"] == 4
+
+    errors = {r["id"]: r["error"] for r in read_jsonl(output) if r.get("error")}
+    assert set(errors) == {"no-response", "prescore-fails"}
+    assert "KeyError" in errors["no-response"]
+    assert "pre-scoring failed" in errors["prescore-fails"]
+
+
+def test_failed_cases_are_retried_on_the_next_run(tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    BatchEvaluator(FakeEvaluator(fail={"What is the outlook?"})).run(CASES, output, progress=False)
+
+    fixed = [dict(case, response="Debt was $2M.") if case["id"] == "no-response" else case for case in CASES]
+    evaluator = FakeEvaluator()
+    result = BatchEvaluator(evaluator).run(fixed, output, progress=False)
+
+    assert sorted(evaluator.calls) == ["What is the outlook?", "What was debt?"]
+    assert [r["id"] for r in result["records"]] == [case_id(case) for case in fixed]
+    assert result["summary"]["failed"] == 0
+    with open(output) as f:
+        assert len([json.loads(line) for line in f]) == 6
@@ -0,0 +1,100 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+import pytest
+from agno.document import Document
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+
+from agents.eval_agent import RAGEvaluator
+from agents.rag_agent import DocumentQA
+
+QUESTIONS = ["What was revenue growth?", "How much debt is outstanding?", "What is the dividend policy?",
+             "Which segment grew fastest?", "What are the main risks?", "How strong is liquidity?"]
+
+
+def _last_line(messages, pattern):
+    prompt = [m for m in messages if m.role == "user"][-1].content
+    return re.search(pattern, prompt).group(1).strip()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every prompt with its own question after a random delay, so concurrent runs interleave"""
+    async def aresponse(self, messages, **kwargs):
+        await asyncio.sleep(random.random() * 0.05)
+        return ModelResponse(role="assistant", content="Answer to " + _last_line(messages, r"(?:Question|QUERY):\s*(.+)"))
+
+    def response_stream(self, messages, **kwargs):
+        content = "Answer to " + _last_line(messages, r"Question:\s*(.+)")
+        for word in content.split(" "):
+            time.sleep(random.random() * 0.01)
+            yield ModelResponse(role="assistant", content=word + " ")
+
+    monkeypatch.setattr(Model, "aresponse", aresponse)
+    monkeypatch.setattr(Model, "response_stream", response_stream)
+
+
+@pytest.fixture
+def document_qa(tmp_path, hashing_model):
+    qa = DocumentQA(vector_store="local", local_store_dir=str(tmp_path / "store"),
+                    embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                    manifest_path=str(tmp_path / "manifest.sqlite"), lexical_index_dir=str(tmp_path / "lexical"),
+                    pdf_cache_dir=str(tmp_path / "pdfs"), retrieval="dense", answer_cache_threshold=0.999)
+    qa._open_table("library")
+    qa.current_knowledge_base.vector_db.insert(
+        [Document(id=f"chunk-{i}", name="report", content=f"Section {i}: revenue, debt, dividends and risks")
+         for i in range(20)])
+    return qa
+
+
+def _cached_answer(qa, question):
+    cached = qa.answer_cache.lookup(qa.table_name, question, qa.embedder.get_embedding_array(question))
+    return cached["answer"] if cached else None
+
+
+def test_concurrent_aask_answers_and_caches_each_question(document_qa, fake_llm):
+    async def ask_all():
+        return await asyncio.gather(*[document_qa.aask(q) for q in QUESTIONS])
+
+    answers = asyncio.run(ask_all())
+    assert answers == [f"Answer to {q}" for q in QUESTIONS]
+    for question in QUESTIONS:
+        assert _cached_answer(document_qa, question) == f"Answer to {question}"
+
+
+def test_concurrent_ask_stream_caches_each_question_and_keeps_its_stats(document_qa, fake_llm):
+    streamed = {}
+
+    stats = {}
+
+    def consume(question):
+        events = list(document_qa.ask_stream(question))
+        streamed[question] = "".join(e.content for e in events if e.kind == "token")
+        stats[question] = events[-1].stats
+
+    threads = [threading.Thread(target=consume, args=(q,)) for q in QUESTIONS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for question in QUESTIONS:
+        assert streamed[question].strip() == f"Answer to {question}"
+        assert _cached_answer(document_qa, question).strip() == f"Answer to {question}"
+        # Each call reports its own stream, not whichever finished last
+        assert stats[question]["characters"] == len(streamed[question])
+        assert stats[question]["chunks"] == len(streamed[question].split())
+
+
+def test_concurrent_evaluations_get_their_own_reports(fake_llm):
+    evaluator = RAGEvaluator()
+
+    async def evaluate_all():
+        return await asyncio.gather(*[evaluator.aevaluate_detailed(q, "response", ["context"]) for q in QUESTIONS])
+
+    reports = [detail["report"] for detail in asyncio.run(evaluate_all())]
+    assert reports == [f"Answer to {q}" for q in QUESTIONS]
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from utils.context_packer import ContextPacker
+from utils.llm import estimate_request_tokens, estimate_tokens
+from utils.quantization import normalize_rows
+
+QUERY = "How did revenue and margins develop?"
+CHUNKS = [
+    "Revenue grew 8% to $12.4 billion, driven by services. " * 4,
+    "Operating margin expanded to 31% as cost of revenue fell. " * 4,
+    "Revenue grew 8% to $12.4 billion, driven by services. " * 4 + "See note 3.",
+    "The board approved a dividend of $0.24 per share. " * 4,
+]
+
+
+def test_estimators_share_one_token_rule():
+    assert estimate_tokens("a" * 400) == 100
+    assert estimate_tokens("") == 1
+    messages = [type("Message", (), {"content": "a" * 200})(), type("Message", (), {"content": None})()]
+    assert estimate_request_tokens(messages, completion_tokens=10) == 50 + 10
+
+
+def test_normalize_rows_leaves_zero_rows_alone():
+    rows = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert rows.dtype == np.float32
+    assert np.allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_near_duplicates_are_dropped():
+    packed = ContextPacker(token_budget=10_000).pack(QUERY, CHUNKS)
+    assert packed["duplicates"] == 1
+    assert len([i for i in packed["indices"] if i in (0, 2)]) == 1
+    assert {1, 3} <= set(packed["indices"])
+
+
+def test_selection_stays_within_the_token_budget():
+    budget = estimate_tokens(CHUNKS[0]) + estimate_tokens(CHUNKS[1])
+    packed = ContextPacker(token_budget=budget, dedup_threshold=1.01).pack(QUERY, CHUNKS)
+    assert packed["tokens"] <= budget
+    assert packed["tokens"] == sum(estimate_tokens(c) for c in packed["chunks"])
+    assert packed["tokens_in"] == sum(estimate_tokens(c) for c in CHUNKS)
+    assert packed["tokens_saved"] == packed["tokens_in"] - packed["tokens"]
+    assert len(packed["chunks"]) < len(CHUNKS)
+
+
+def test_oversized_best_chunk_is_truncated_to_the_budget():
+    packed = ContextPacker(token_budget=20).pack(QUERY, ["revenue " * 200])
+    assert packed["indices"] == [0]
+    assert 0 < packed["tokens"] <= 20
+    assert "revenue " * 200 != packed["chunks"][0]
+
+
+def test_given_embeddings_drive_relevance_and_page_order():
+    embeddings = np.array([[0.2, 1.0], [1.0, 0.0], [0.9, 0.1]], dtype=np.float32)
+    packer = ContextPacker(token_budget=10_000, mmr_lambda=1.0, dedup_threshold=1.01)
+    packed = packer.pack(QUERY, ["a", "b", "c"], embeddings, np.array([1.0, 0.0]))
+    assert packed["indices"] == [1, 2, 0]
+
+    by_page = ContextPacker(token_budget=10_000, mmr_lambda=1.0, dedup_threshold=1.01, order="page")
+    packed = by_page.pack(QUERY, ["a", "b", "c"], embeddings, np.array([1.0, 0.0]), pages=[2, None, 1])
+    assert packed["chunks"] == ["c", "a", "b"]
+
+
+def test_unknown_order_is_rejected():
+    with pytest.raises(ValueError):
+        ContextPacker(order="random")
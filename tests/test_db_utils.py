@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+
+from utils import db_utils
+from utils.db_utils import dispose_engines, get_engine, pool_metrics
+
+
+@pytest.fixture
+def bootstraps(monkeypatch):
+    """Engines for file-backed SQLite URLs; the Postgres bootstrap is only counted"""
+    calls = []
+    monkeypatch.setattr(db_utils, "_bootstrap", lambda engine: calls.append(str(engine.url)))
+    monkeypatch.setattr(db_utils, "_engines", {})
+    yield calls
+    dispose_engines()
+
+
+def test_engine_is_created_once_per_url(tmp_path, bootstraps):
+    first_url = f"sqlite:///{tmp_path / 'first.db'}"
+    start = threading.Barrier(8)
+
+    def engine_for(url):
+        start.wait()
+        return get_engine(url)
+
+    with ThreadPoolExecutor(8) as pool:
+        engines = list(pool.map(engine_for, [first_url] * 8))
+    assert all(engine is engines[0] for engine in engines)
+    assert bootstraps == [first_url]
+
+    # Later settings do not replace the pooled engine; another URL gets its own
+    assert get_engine(first_url, pool_size=20) is engines[0]
+    other = get_engine(f"sqlite:///{tmp_path / 'second.db'}")
+    assert other is not engines[0]
+    assert len(bootstraps) == 2
+
+
+def test_pool_metrics_track_checked_out_connections(tmp_path, bootstraps):
+    url = f"sqlite:///{tmp_path / 'metrics.db'}"
+    assert pool_metrics(url) is None
+    engine = get_engine(url, pool_size=2, max_overflow=2)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        metrics = pool_metrics(url)
+        assert (metrics["pool_size"], metrics["checked_out"]) == (2, 1)
+        assert metrics["utilization"] == 0.25
+    metrics = pool_metrics(url)
+    assert metrics["checked_out"] == 0
+    assert metrics["checkout_wait_ms"]["count"] == 1
+
+
+def test_failed_bootstrap_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "_engines", {})
+    attempts = []
+
+    def flaky_bootstrap(engine):
+        attempts.append(engine)
+        if len(attempts) == 1:
+            raise ConnectionError("database is starting up")
+
+    monkeypatch.setattr(db_utils, "_bootstrap", flaky_bootstrap)
+    url = f"sqlite:///{tmp_path / 'flaky.db'}"
+    with pytest.raises(ConnectionError):
+        get_engine(url)
+    assert get_engine(url) is attempts[1]
+    dispose_engines()
+    assert pool_metrics(url) is None
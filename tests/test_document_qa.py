@@ -0,0 +1,83 @@
+import pytest
+from agno.document import Document
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+
+from agents.rag_agent import DocumentQA
+
+CHUNKS = {
+    "revenue": "Revenue grew 8% to $12.4 billion, driven by services.",
+    "margin": "Operating margin expanded to 31% as cost of revenue fell.",
+    "dividend": "The board approved a quarterly dividend of $0.24 per share.",
+}
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Every prompt sent to the LLM; the answer echoes the number of the call"""
+    sent = []
+
+    def response(self, messages, **kwargs):
+        sent.append([m for m in messages if m.role == "user"][-1].content)
+        # Like Model.response, the reply is appended to the run's messages
+        messages.append(Message(role="assistant", content=f"Answer {len(sent)}"))
+        return ModelResponse(role="assistant", content=f"Answer {len(sent)}")
+
+    monkeypatch.setattr(Model, "response", response)
+    return sent
+
+
+@pytest.fixture
+def document_qa(tmp_path, hashing_model, monkeypatch):
+    qa = DocumentQA(vector_store="local", local_store_dir=str(tmp_path / "store"),
+                    embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                    manifest_path=str(tmp_path / "manifest.sqlite"), lexical_index_dir=str(tmp_path / "lexical"),
+                    pdf_cache_dir=str(tmp_path / "pdfs"), retrieval="hybrid", top_k=2)
+    qa._open_table("library")
+    documents = [Document(id=doc_id, name="10-k", content=content) for doc_id, content in CHUNKS.items()]
+    qa.current_knowledge_base.vector_db.insert(documents)
+    qa.lexical_index.add(documents)
+
+    calls = []
+    retrieve = qa._retrieve
+
+    def counting_retrieve(question, filters=None, **search_params):
+        calls.append(question)
+        return retrieve(question, filters, **search_params)
+
+    monkeypatch.setattr(qa, "_retrieve", counting_retrieve)
+    qa.retrievals = calls
+    return qa
+
+
+def test_context_mode_retrieves_once_and_calls_the_llm_once(document_qa, prompts):
+    answer = document_qa.ask("How much did revenue grow?")
+    assert answer == "Answer 1"
+    assert document_qa.retrievals == ["How much did revenue grow?"]
+    assert len(prompts) == 1
+    assert CHUNKS["revenue"] in prompts[0]
+    stats = document_qa.last_answer_stats
+    assert (stats["mode"], stats["retrievals"], stats["llm_calls"], stats["cache_hit"]) == ("context", 1, 1, False)
+    assert stats["context_tokens"] > 0
+
+
+def test_repeated_question_is_answered_from_the_cache(document_qa, prompts):
+    document_qa.ask("How much did revenue grow?")
+    assert document_qa.ask("How much did revenue grow?") == "Answer 1"
+    assert len(document_qa.retrievals) == 1
+    assert len(prompts) == 1
+    assert document_qa.last_answer_stats["cache_hit"] is True
+
+
+def test_agentic_search_tool_uses_the_same_retrieval(document_qa):
+    results = document_qa._agent_retriever("dividend per share", scope_filters=None)
+    assert document_qa.retrievals == ["dividend per share"]
+    assert results[0]["content"] == CHUNKS["dividend"]
+
+
+def test_unknown_answer_mode_is_rejected(tmp_path, hashing_model):
+    with pytest.raises(ValueError):
+        DocumentQA(vector_store="local", answer_mode="both", local_store_dir=str(tmp_path / "store"),
+                   embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                   manifest_path=str(tmp_path / "manifest.sqlite"), pdf_cache_dir=str(tmp_path / "pdfs"))
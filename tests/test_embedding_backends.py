@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from utils.embedding_backends import check_consistency, make_backend
+
+TEXTS = ["revenue grew", "revenue rose", "carbon emissions"]
+VECTORS = np.array([[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.1, 0.0, 1.0]], dtype=np.float32)
+
+
+class FixedBackend:
+    """Returns preset vectors for TEXTS, standing in for a real model"""
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def encode(self, texts, normalize=False):
+        return self.vectors[[TEXTS.index(text) for text in texts]]
+
+
+def test_identical_backends_agree():
+    result = check_consistency(FixedBackend(VECTORS), FixedBackend(VECTORS * 3.0), TEXTS)
+
+    assert result["mean_cosine"] == pytest.approx(1.0)
+    assert result["min_cosine"] == pytest.approx(1.0)
+    assert result["neighbour_agreement"] == 1.0
+    assert result["passed"] is True
+
+
+def test_drifted_backend_fails_and_loses_a_neighbour():
+    drifted = VECTORS.copy()
+    drifted[2] = [0.0, 0.5, 1.0]  # now nearest to "revenue rose" instead of "revenue grew"
+
+    result = check_consistency(FixedBackend(VECTORS), FixedBackend(drifted), TEXTS)
+
+    assert result["min_cosine"] < 0.99
+    assert result["passed"] is False
+    assert result["neighbour_agreement"] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_min_cosine_threshold_is_configurable():
+    drifted = VECTORS.copy()
+    drifted[2] = [0.0, 0.5, 1.0]
+
+    result = check_consistency(FixedBackend(VECTORS), FixedBackend(drifted), TEXTS, min_cosine=0.5)
+
+    assert result["passed"] is True
+
+
+def test_make_backend_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        make_backend("bogus", "any-model")
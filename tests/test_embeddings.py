@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from utils import parallel_embeddings
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_cache import EmbeddingCache
+from utils.embeddings import EmbeddingModel
+from utils.parallel_embeddings import ParallelEmbedder
+
+
+def test_aget_embedding_does_not_block_the_event_loop(hashing_model, monkeypatch):
+    encode = hashing_model.encode
+
+    def slow_encode(texts, **kwargs):
+        time.sleep(0.3)
+        return encode(texts, **kwargs)
+
+    monkeypatch.setattr(hashing_model, "encode", slow_encode)
+    model = EmbeddingModel()
+
+    async def embed_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        vector = await model.aget_embedding("operating margin")
+        ticker.cancel()
+        return vector, ticks
+
+    vector, ticks = asyncio.run(embed_while_ticking())
+    assert ticks >= 10  # the loop kept running during the 300 ms encode
+    assert np.allclose(vector, model.get_embedding_array("operating margin"))
+
+
+def test_parallel_encode_of_nothing_does_not_start_the_pool():
+    embedder = ParallelEmbedder("sentence-transformers/paraphrase-MiniLM-L6-v2", workers=2, dimensions=32)
+    result = embedder.encode([])
+    assert result.shape == (0, 32)
+    assert result.dtype == np.float32
+    assert embedder._pool is None
+
+
+class FakePool:
+    """Records how many pools were started; reports a 32-dimensional model"""
+
+    created = 0
+
+    def __init__(self, workers, initializer=None, initargs=()):
+        time.sleep(0.05)  # starting workers takes a while, widening the race window
+        FakePool.created += 1
+
+    def apply(self, fn):
+        return 32
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def test_concurrent_first_calls_start_one_pool(monkeypatch):
+    FakePool.created = 0
+    monkeypatch.setattr(parallel_embeddings.multiprocessing, "get_context",
+                        lambda method: type("Context", (), {"Pool": FakePool}))
+    embedder = ParallelEmbedder("sentence-transformers/paraphrase-MiniLM-L6-v2", workers=2)
+    start = threading.Barrier(8)
+
+    def ensure_pool():
+        start.wait()
+        return embedder._ensure_pool()
+
+    with ThreadPoolExecutor(8) as pool:
+        pools = list(pool.map(lambda _: ensure_pool(), range(8)))
+    assert FakePool.created == 1
+    assert all(p is pools[0] for p in pools)
+    assert embedder.dimensions == 32
+    embedder.close()
+    assert embedder._pool is None
+
+
+def test_array_api_returns_contiguous_float32(hashing_model):
+    model = EmbeddingModel()
+    single = model.get_embedding_array("revenue grew")
+    assert single.shape == (model.dimensions,)
+    assert single.dtype == np.float32
+    matrix = model.get_embedding_array(["revenue grew", "margins fell"])
+    assert matrix.shape == (2, model.dimensions)
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert model.get_embedding_array([]).shape == (0, model.dimensions)
+    assert model.get_embedding_array(["revenue grew"], dtype=np.float16).dtype == np.float16
+
+    # The list API used by agno returns the same numbers
+    assert np.allclose(model.get_embedding("revenue grew"), single)
+    assert np.allclose(model.get_embedding(["revenue grew", "margins fell"]), matrix)
+
+
+def test_embedding_batch_is_compact_and_reports_usage(hashing_model):
+    batch = EmbeddingModel().get_embedding_batch(["revenue grew 8%", "margins fell"], dtype=np.float16)
+    assert len(batch) == 2
+    assert batch.vectors.dtype == np.float16
+    assert batch.nbytes == 2 * batch.dimensions * 2 + 2 * 4
+    assert batch.usage() == {"prompt_tokens": 5, "total_tokens": 5}
+    assert np.array_equal(batch[1], batch.vectors[1])
+    embeddings, usage = EmbeddingModel().get_embedding_and_usage("revenue grew 8%")
+    assert len(embeddings) == batch.dimensions
+    assert usage == {"prompt_tokens": 3, "total_tokens": 3}
+
+
+def _record_encodes(hashing_model, monkeypatch):
+    encoded = []
+    encode = hashing_model.encode
+
+    def recording_encode(texts, **kwargs):
+        encoded.append(list(texts))
+        return encode(texts, **kwargs)
+
+    monkeypatch.setattr(hashing_model, "encode", recording_encode)
+    return encoded
+
+
+def test_cache_only_encodes_missing_texts(hashing_model, monkeypatch, tmp_path):
+    encoded = _record_encodes(hashing_model, monkeypatch)
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    model = EmbeddingModel(cache=cache)
+
+    first = model.get_embedding_array(["revenue grew", "margins fell", "revenue grew"])
+    assert encoded == [["revenue grew", "margins fell"]]  # a repeat within the batch is encoded once
+    assert np.array_equal(first[0], first[2])
+
+    second = model.get_embedding_array(["margins fell", "debt was refinanced"])
+    assert encoded[-1] == ["debt was refinanced"]
+    assert np.array_equal(second[0], first[1])
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 0, 4)
+
+
+def test_cache_persists_across_instances(hashing_model, monkeypatch, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    expected = EmbeddingModel(cache=EmbeddingCache(path)).get_embedding_array(["revenue grew", "margins fell"])
+
+    encoded = _record_encodes(hashing_model, monkeypatch)
+    cache = EmbeddingCache(path)
+    vectors = EmbeddingModel(cache=cache).get_embedding_array(["revenue grew", "margins fell"])
+    assert encoded == []
+    assert np.array_equal(vectors, expected)
+    assert cache.stats()["disk_hits"] == 2
+
+    # Normalized vectors differ, so they live under their own keys
+    EmbeddingModel(cache=cache, normalize=True).get_embedding_array(["revenue grew"])
+    assert encoded == [["revenue grew"]]
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(max_items=2)
+    cache.put_many({"a": np.ones(4), "b": np.zeros(4)})
+    cache.get_many(["a"])
+    cache.put_many({"c": np.ones(4)})
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["memory_items"] == 2
+
+
+def _numbered_encode(batches):
+    """encode_fn whose row for "text-7" is [7, 7, 7], recording each batch"""
+
+    def encode(texts):
+        batches.append(list(texts))
+        return np.array([[float(t.split("-")[1])] * 3 for t in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_batcher_returns_each_concurrent_caller_its_own_row():
+    batches = []
+    batcher = EmbeddingBatcher(_numbered_encode(batches), max_batch_size=8, max_wait_ms=50)
+    start = threading.Barrier(16)
+
+    def embed(i):
+        start.wait()
+        return batcher.embed(f"text-{i}")
+
+    with ThreadPoolExecutor(16) as pool:
+        vectors = list(pool.map(embed, range(16)))
+    batcher.close()
+
+    for i, vector in enumerate(vectors):
+        assert vector.tolist() == [float(i)] * 3
+    assert sorted(t for batch in batches for t in batch) == sorted(f"text-{i}" for i in range(16))
+    assert len(batches) < 16
+    assert max(len(batch) for batch in batches) <= 8
+    assert batcher.stats()["batch_size"]["count"] == len(batches)
+
+
+def test_batcher_serves_asyncio_callers():
+    batches = []
+    batcher = EmbeddingBatcher(_numbered_encode(batches), max_wait_ms=20)
+
+    async def embed_all():
+        return await asyncio.gather(*(batcher.aembed(f"text-{i}") for i in range(10)))
+
+    vectors = asyncio.run(embed_all())
+    batcher.close()
+    assert [vector[0] for vector in vectors] == list(range(10))
+    assert len(batches) < 10
+
+
+def test_batcher_fails_every_caller_of_a_failed_batch():
+    def failing_encode(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = EmbeddingBatcher(failing_encode, max_wait_ms=20)
+    futures = [batcher.submit(f"text-{i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_batched_model_matches_direct_encoding(hashing_model):
+    direct = EmbeddingModel().get_embedding_array("free cash flow")
+    batched = EmbeddingModel(batching=True)
+    assert np.array_equal(batched.get_embedding_array("free cash flow"), direct)
+    batched.batcher.close()
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+from agno.document import Document
+
+from utils.embeddings import EmbeddingModel
+from utils.ingest_pipeline import _DONE, IngestPipeline
+
+SOURCE = "https://example.com/reports/annual-2023.pdf"
+
+
+class PageReader:
+    """Reader that keeps each page as a single chunk"""
+
+    chunk = False
+
+
+class RecordingDb:
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    def insert(self, documents, filters=None):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("database went away")
+        self.batches.append(list(documents))
+
+    upsert = insert
+
+
+def _pipeline(db, pages, **kwargs):
+    pipeline = IngestPipeline(db, EmbeddingModel(), SOURCE, reader=PageReader(), queue_size=2,
+                              embed_batch_size=4, **kwargs)
+
+    def parse(pdf_path, out, busy):
+        # Stands in for pypdf: one page of text after another, as the queue drains
+        try:
+            for number, text in enumerate(pages, start=1):
+                pipeline.stats["pages"] += 1
+                if not pipeline._put(out, Document(name="annual-2023", content=text, meta_data={"page": number})):
+                    return
+        finally:
+            pipeline._put(out, _DONE)
+
+    pipeline._parse = parse
+    return pipeline
+
+
+def test_pages_flow_through_every_stage(tmp_path, hashing_model):
+    db = RecordingDb()
+    completed = []
+    pages = [f"Page {i}: revenue, margins and cash flow" for i in range(10)] + ["Page 0: revenue, margins and cash flow"]
+    pipeline = _pipeline(db, pages, meta_data={"doc_id": "annual-2023"},
+                         on_complete=lambda stats, seen: completed.append(set(seen)))
+    path = tmp_path / "annual-2023.pdf"
+    path.write_bytes(b"%PDF")
+
+    stats = pipeline.run(str(path))
+    assert (stats["pages"], stats["chunks"], stats["added"], stats["skipped"]) == (11, 10, 10, 0)
+    assert [len(batch) for batch in db.batches] == [4, 4, 2]
+    written = [doc for batch in db.batches for doc in batch]
+    assert all(doc.embedding is not None for doc in written)
+    assert written[0].meta_data == {"page": 1, "doc_id": "annual-2023", "source_url": SOURCE}
+    assert completed == [{doc.id for doc in written}]
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("failing_stage", ["embed", "write"])
+def test_stage_error_stops_the_pipeline(tmp_path, hashing_model, monkeypatch, failing_stage):
+    db = RecordingDb(fail_after=1 if failing_stage == "write" else None)
+    completed = []
+    # Far more pages than the queues hold, so upstream stages are blocked on full queues
+    pipeline = _pipeline(db, [f"Page {i}: revenue" for i in range(200)],
+                         on_complete=lambda stats, seen: completed.append(stats))
+    if failing_stage == "embed":
+        def broken_batch(texts, *args, **kwargs):
+            raise RuntimeError("model crashed")
+
+        monkeypatch.setattr(pipeline.embedder, "get_embedding_batch", broken_batch)
+    path = tmp_path / "annual-2023.pdf"
+    path.write_bytes(b"%PDF")
+
+    with pytest.raises(RuntimeError):
+        pipeline.run(str(path))
+    assert pipeline.finished
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    assert completed == []  # the manifest is not updated for a partial load
+    assert pipeline.stats["pages"] < 200
+    assert set(pipeline.stats["stage_seconds"]) == {"parse", "chunk", "embed", "write"}
+    assert not any(t.name.startswith("ingest-") for t in threading.enumerate() if t.is_alive())
+
+
+def test_skipped_chunks_are_not_embedded_again(tmp_path, hashing_model):
+    db = RecordingDb()
+    first = _pipeline(db, ["Revenue grew.", "Margins fell."])
+    path = tmp_path / "annual-2023.pdf"
+    path.write_bytes(b"%PDF")
+    first.run(str(path), delete_file=False)
+
+    second = _pipeline(db, ["Revenue grew.", "Margins fell.", "Debt was refinanced."], skip_ids=first.seen_ids,
+                       upsert=True)
+    stats = second.run(str(path), delete_file=False)
+    assert (stats["chunks"], stats["added"], stats["skipped"]) == (3, 1, 2)
+    assert [doc.content for doc in db.batches[-1]] == ["Debt was refinanced."]
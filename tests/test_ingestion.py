@@ -0,0 +1,150 @@
+import hashlib
+
+import pytest
+from agno.document import Document
+
+from agents import rag_agent
+from agents.rag_agent import DocumentQA
+from utils.ingestion import chunk_id, read_pdf_documents
+from utils.pdf_fetch import FetchResult
+
+URL = "https://example.com/reports/annual-2023.pdf"
+PAGES = [
+    "Revenue grew 8% to $12.4 billion, driven by the services segment.",
+    "Operating margin expanded to 31% as cost of revenue fell.",
+    "The board approved a quarterly dividend of $0.24 per share.",
+]
+
+
+class ParagraphReader:
+    """Stands in for PDFReader: one chunk per blank-line separated paragraph"""
+
+    def read(self, buffer):
+        text = buffer.read().decode("utf-8")
+        return [Document(name=buffer.name, content=part, meta_data={"page": i + 1})
+                for i, part in enumerate(text.split("\n\n"))]
+
+
+class FakeFetcher:
+    """Serves documents from memory through the blob cache's FetchResult"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.documents = {}
+        self.stats = {"downloaded": 0, "not_modified": 0, "fresh": 0}
+
+    def fetch(self, url):
+        data = "\n\n".join(self.documents[url]).encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.directory / f"{sha256}.pdf"
+        path.write_bytes(data)
+        return FetchResult(url, str(path), sha256, len(data), "fresh")
+
+
+@pytest.fixture
+def document_qa(tmp_path, hashing_model, monkeypatch):
+    monkeypatch.setattr(rag_agent, "read_pdf_documents",
+                        lambda data, source, meta_data=None: read_pdf_documents(data, source, ParagraphReader(),
+                                                                               meta_data))
+    qa = DocumentQA(vector_store="local", local_store_dir=str(tmp_path / "store"),
+                    embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                    manifest_path=str(tmp_path / "manifest.sqlite"), lexical_index_dir=str(tmp_path / "lexical"),
+                    pdf_cache_dir=str(tmp_path / "pdfs"), retrieval="hybrid", answer_cache=False)
+    qa.fetcher = FakeFetcher(tmp_path)
+
+    embedded = []
+    get_embedding_batch = qa.embedder.get_embedding_batch
+
+    def recording_batch(texts, *args, **kwargs):
+        embedded.extend(texts)
+        return get_embedding_batch(texts, *args, **kwargs)
+
+    monkeypatch.setattr(qa.embedder, "get_embedding_batch", recording_batch)
+    qa.embedded = embedded
+    return qa
+
+
+def _stored_ids(qa):
+    vector_db = qa.current_knowledge_base.vector_db
+    return {doc.id for doc in vector_db.search("revenue margin dividend segment", limit=100)}
+
+
+def test_chunk_ids_are_stable_and_duplicates_dropped():
+    data = "\n\n".join(PAGES + [PAGES[0]]).encode("utf-8")
+    documents = read_pdf_documents(data, URL, ParagraphReader(), {"doc_id": "annual-2023"})
+    assert [doc.id for doc in documents] == [chunk_id(URL, page) for page in PAGES]
+    assert documents[0].meta_data == {"page": 1, "doc_id": "annual-2023", "source_url": URL}
+    assert chunk_id("https://example.com/other.pdf", PAGES[0]) != documents[0].id
+
+
+def test_reload_embeds_only_new_chunks_and_deletes_removed_ones(document_qa):
+    qa = document_qa
+    qa.fetcher.documents[URL] = PAGES
+    assert qa.load_pdf_url(URL, incremental=True) == {"added": 3, "skipped": 0, "removed": 0}
+    assert qa.embedded == PAGES
+
+    # Unchanged file: nothing is parsed or embedded
+    assert qa.load_pdf_url(URL, incremental=True) == {"added": 0, "skipped": 3, "removed": 0}
+    assert len(qa.embedded) == 3
+
+    # Revised file: one paragraph replaced, one kept, one dropped
+    revised = [PAGES[0], "Free cash flow reached $3.1 billion."]
+    qa.fetcher.documents[URL] = revised
+    assert qa.load_pdf_url(URL, incremental=True) == {"added": 1, "skipped": 1, "removed": 2}
+    assert qa.embedded[3:] == ["Free cash flow reached $3.1 billion."]
+
+    current = {chunk_id(URL, text) for text in revised}
+    assert qa.manifest.get_chunk_ids("documents", URL) == current
+    assert _stored_ids(qa) == current
+    assert qa.lexical_index.search("dividend") == []
+    assert qa.lexical_index.search("cash flow")[0][0] == chunk_id(URL, revised[1])
+
+
+def test_full_reload_rebuilds_the_table(document_qa):
+    qa = document_qa
+    qa.fetcher.documents[URL] = PAGES
+    qa.load_pdf_url(URL, incremental=True)
+    assert qa.load_pdf_url(URL) == {"added": 3, "skipped": 0, "removed": 0}
+    assert _stored_ids(qa) == {chunk_id(URL, page) for page in PAGES}
+
+
+LIBRARY = {
+    "https://example.com/aapl-2023.pdf": ("AAPL", 2023, ["Apple revenue grew on services.", "Apple margin rose."]),
+    "https://example.com/aapl-2024.pdf": ("AAPL", 2024, ["Apple revenue was flat.", "Apple margin held."]),
+    "https://example.com/msft-2024.pdf": ("MSFT", 2024, ["Microsoft revenue grew on cloud.", "Microsoft margin rose."]),
+}
+
+
+def _load_library(qa):
+    for url, (issuer, year, pages) in LIBRARY.items():
+        qa.fetcher.documents[url] = pages
+        qa.add_document(url, doc_id=f"{issuer.lower()}-{year}", issuer=issuer, fiscal_year=year)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"issuer": "AAPL"}, {"aapl-2023", "aapl-2024"}),
+    ({"fiscal_year": 2024}, {"aapl-2024", "msft-2024"}),
+    ({"issuer": "AAPL", "fiscal_year": 2024}, {"aapl-2024"}),
+    ({"doc_id": "msft-2024"}, {"msft-2024"}),
+    ({"issuer": "NVDA"}, set()),
+])
+def test_filtered_retrieval_only_returns_matching_documents(document_qa, filters, expected):
+    qa = document_qa
+    _load_library(qa)
+    results = qa._retrieve("revenue margin growth", filters=filters)
+    assert {doc.meta_data["doc_id"] for doc in results} == expected
+    dense = qa.current_knowledge_base.vector_db.search("revenue margin growth", limit=10, filters=filters)
+    assert {doc.meta_data["doc_id"] for doc in dense} == expected
+
+
+def test_removing_a_document_keeps_the_rest_of_the_library(document_qa):
+    qa = document_qa
+    _load_library(qa)
+    assert [d["doc_id"] for d in qa.list_documents()] == ["aapl-2023", "aapl-2024", "msft-2024"]
+    assert qa.list_documents()[0]["issuer"] == "AAPL"
+
+    assert qa.remove_document("aapl-2023") == 2
+    assert [d["doc_id"] for d in qa.list_documents()] == ["aapl-2024", "msft-2024"]
+    assert qa._retrieve("revenue", filters={"doc_id": "aapl-2023"}) == []
+    assert {doc.meta_data["doc_id"] for doc in qa._retrieve("revenue", filters={"issuer": "AAPL"})} == {"aapl-2024"}
+    assert qa.remove_document("aapl-2023") == 0
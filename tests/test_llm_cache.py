@@ -0,0 +1,108 @@
+import pytest
+from agno.models.groq import Groq
+from agno.models.message import Message
+from groq.types.chat import ChatCompletion, ChatCompletionChunk
+
+from utils import llm
+from utils.llm import CachedGroq, configure_llm_cache, llm_cache_stats
+from utils.llm_cache import CacheMissError
+
+MODEL_ID = "llama3-8b-8192"
+
+
+@pytest.fixture
+def llm_cache(tmp_path, monkeypatch):
+    """A fresh cache file for the test; the process-wide settings are restored afterwards"""
+    monkeypatch.setattr(llm, "_cache_settings", dict(llm._cache_settings))
+    monkeypatch.setattr(llm, "_caches", {})
+    configure_llm_cache(path=str(tmp_path / "responses.sqlite"), ttl_seconds=3600)
+    yield
+    for cache in llm._caches.values():
+        cache.close()
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    """Stands in for the Groq API below the rate limiter and the cache, counting calls"""
+    calls = []
+
+    def invoke(self, messages, response_format=None, tools=None, tool_choice=None):
+        calls.append(self.get_request_params())
+        return ChatCompletion.model_validate({
+            "id": f"completion-{len(calls)}", "object": "chat.completion", "created": 0, "model": self.id,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"answer {len(calls)}"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        })
+
+    def invoke_stream(self, messages, response_format=None, tools=None, tool_choice=None):
+        calls.append(self.get_request_params())
+        for i, piece in enumerate(["Revenue ", "grew ", "8%."]):
+            yield ChatCompletionChunk.model_validate({
+                "id": "stream", "object": "chat.completion.chunk", "created": 0, "model": self.id,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if i == 2 else None}],
+            })
+
+    monkeypatch.setattr(Groq, "invoke", invoke)
+    monkeypatch.setattr(Groq, "invoke_stream", invoke_stream)
+    return calls
+
+
+def _messages(now="2024-05-02 10:15:07"):
+    return [Message(role="system", content=f"You are a financial analyst. The current time is {now}."),
+            Message(role="user", content="How did revenue develop?")]
+
+
+def test_record_then_replay_without_calling_the_model(llm_cache, fake_groq):
+    configure_llm_cache(mode="record")
+    recorded = CachedGroq(id=MODEL_ID, temperature=0.2).invoke(_messages())
+    assert len(fake_groq) == 1
+
+    configure_llm_cache(mode="replay")
+    # A later run: a new model instance and a different time in the system prompt
+    replayed = CachedGroq(id=MODEL_ID, temperature=0.2).invoke(_messages(now="2024-06-11T08:01:59.123"))
+    assert len(fake_groq) == 1
+    assert replayed.choices[0].message.content == recorded.choices[0].message.content == "answer 1"
+    stats = llm_cache_stats()
+    assert (stats["mode"], stats["hits"], stats["entries"]) == ("replay", 1, 1)
+
+
+def test_replay_misses_when_a_sampling_parameter_changes(llm_cache, fake_groq):
+    configure_llm_cache(mode="record")
+    CachedGroq(id=MODEL_ID, temperature=0.2).invoke(_messages())
+
+    configure_llm_cache(mode="replay")
+    with pytest.raises(CacheMissError):
+        CachedGroq(id=MODEL_ID, temperature=0.7).invoke(_messages())
+    with pytest.raises(CacheMissError):
+        CachedGroq(id=MODEL_ID, temperature=0.2, max_tokens=64).invoke(_messages())
+    assert len(fake_groq) == 1
+
+
+def test_cache_key_is_stable_and_covers_the_request(llm_cache):
+    model = CachedGroq(id=MODEL_ID, temperature=0.2)
+    key = model._cache_key(_messages(), None, None, None)
+    assert key == CachedGroq(id=MODEL_ID, temperature=0.2)._cache_key(
+        _messages(now="2025-01-01 00:00"), None, None, None)
+    changed = [Message(role="system", content=_messages()[0].content),
+               Message(role="user", content="How did margins develop?")]
+    assert model._cache_key(changed, None, None, None) != key
+    assert CachedGroq(id="llama3-70b-8192", temperature=0.2)._cache_key(_messages(), None, None, None) != key
+
+
+def test_streams_are_recorded_and_replayed_chunk_by_chunk(llm_cache, fake_groq):
+    configure_llm_cache(mode="read_write")
+    model = CachedGroq(id=MODEL_ID)
+    first = [chunk.choices[0].delta.content for chunk in model.invoke_stream(_messages())]
+    second = [chunk.choices[0].delta.content for chunk in model.invoke_stream(_messages())]
+    assert first == second == ["Revenue ", "grew ", "8%."]
+    assert len(fake_groq) == 1
+
+
+def test_off_mode_always_calls_the_model(llm_cache, fake_groq):
+    configure_llm_cache(mode="off")
+    model = CachedGroq(id=MODEL_ID)
+    model.invoke(_messages())
+    model.invoke(_messages())
+    assert len(fake_groq) == 2
+    assert llm_cache_stats() == {"mode": "off"}
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from agno.document import Document
+
+from agents.rag_agent import DocumentQA
+from utils.local_vectordb import LocalVectorDb
+from utils.quantization import normalize_rows
+
+WORDS = ["revenue", "margin", "debt", "cash", "growth", "risk", "dividend", "equity", "capex", "guidance",
+         "inventory", "tax", "lease", "credit", "rating", "liquidity", "segment", "outlook", "cost", "pension"]
+
+
+def _documents(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Document(id=f"chunk-{i}", name="report", content=" ".join(rng.choice(WORDS, 6)),
+                     meta_data={"doc_id": "report"}) for i in range(n)]
+
+
+def _document_qa(tmp_path, **index_params):
+    return DocumentQA(vector_store="local", local_store_dir=str(tmp_path / "store"),
+                      embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                      manifest_path=str(tmp_path / "manifest.sqlite"), lexical_index_dir=str(tmp_path / "lexical"),
+                      pdf_cache_dir=str(tmp_path / "pdfs"), retrieval="dense", answer_cache=False,
+                      index_params=index_params)
+
+
+def test_document_qa_serves_large_local_table_through_ivf_lists(tmp_path, hashing_model):
+    qa = _document_qa(tmp_path, ann_threshold=200, n_probe=2)
+    qa._open_table("library")
+    vector_db = qa.current_knowledge_base.vector_db
+
+    vector_db.insert(_documents(100))
+    qa._ensure_index()
+    assert vector_db._centroids is None  # below the threshold a brute-force scan is exact and cheap
+
+    vector_db.insert(_documents(300, seed=1)[100:])
+    qa._ensure_index()
+    assert vector_db._centroids is not None
+    assert vector_db._built_rows == 300
+
+    query = "revenue margin growth"
+    query_vector = vector_db._embed([Document(content=query)])[0]
+    candidates = vector_db._candidate_rows(query_vector)
+    assert 0 < len(candidates) < 300
+    results = qa._retrieve(query)
+    assert results
+    candidate_ids = {f"chunk-{row}" for row in candidates}  # rows follow insertion order here
+    assert {doc.id for doc in results} <= candidate_ids
+
+
+def test_index_is_rebuilt_on_drift_and_reopened(tmp_path, hashing_model):
+    qa = _document_qa(tmp_path, ann_threshold=100, rebuild_drift=0.2)
+    qa._open_table("library")
+    vector_db = qa.current_knowledge_base.vector_db
+    vector_db.insert(_documents(100))
+    qa._ensure_index()
+    assert vector_db._built_rows == 100
+
+    vector_db.insert(_documents(110, seed=1)[100:])
+    qa._ensure_index()
+    assert vector_db._built_rows == 100  # 10% drift is within tolerance
+
+    vector_db.insert(_documents(150, seed=2)[110:])
+    qa._ensure_index()
+    assert vector_db._built_rows == 150
+
+    vector_db.delete_ids([f"chunk-{i}" for i in range(50)])
+    vector_db.optimize()
+    assert vector_db._built_rows == 100
+
+    # A new session opening the table picks the index up from disk
+    reopened = _document_qa(tmp_path, ann_threshold=100)
+    reopened._open_table("library")
+    assert reopened.current_knowledge_base.vector_db._built_rows == 100
+
+
+def _clustered_vectors(n, dimensions, seed=0):
+    """Unit vectors around a few topics, like chunk embeddings of a handful of reports"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dimensions))
+    return normalize_rows(centers[rng.integers(0, 20, n)] + rng.normal(0, 0.6, (n, dimensions))), rng
+
+
+@pytest.mark.parametrize("kind, recall_floor, bytes_per_vector", [("int8", 0.95, 64), ("binary", 0.6, 8)])
+def test_quantized_search_keeps_recall_after_rescoring(tmp_path, kind, recall_floor, bytes_per_vector):
+    n, dimensions, k = 2000, 64, 10
+    vectors, rng = _clustered_vectors(n, dimensions)
+    vector_db = LocalVectorDb(str(tmp_path / "store"), SimpleNamespace(dimensions=dimensions))
+    vector_db.insert([Document(id=f"chunk-{i}", content=f"chunk {i}", embedding=vector.tolist())
+                      for i, vector in enumerate(vectors)])
+    queries = normalize_rows(vectors[rng.choice(n, 50, replace=False)] + rng.normal(0, 0.05, (50, dimensions)))
+    exact = [{doc.id for doc in vector_db.search_vector(q, k)} for q in queries]
+
+    vector_db.quantize(kind)
+    recall = np.mean([len({doc.id for doc in vector_db.search_vector(q, k)} & expected) / k
+                      for q, expected in zip(queries, exact)])
+    assert recall >= recall_floor
+    assert vector_db._codes.shape[1] == bytes_per_vector
+
+    row = {r["method"]: r for r in vector_db.quantization_report(n_queries=50, k=k)}[kind]
+    assert row["rescored_recall"] >= recall_floor
+    assert row["rescored_recall"] >= row["recall"]
+    assert row["bytes_per_vector"] == bytes_per_vector
+    assert row["compression"] == dimensions * 4 / bytes_per_vector
+    assert row["memory_saved_bytes"] == n * (dimensions * 4 - bytes_per_vector)
+
+    # The codes are reused by a new session on the same directory
+    reopened = LocalVectorDb(str(tmp_path / "store"), SimpleNamespace(dimensions=dimensions))
+    assert reopened.quantization == kind
@@ -0,0 +1,201 @@
+import json
+import threading
+import types
+
+import pytest
+
+from utils import market_data
+from utils.market_data import CachedYFinanceTools, MarketDataCache, StaticMarketData
+
+DATA = {
+    "AAPL": {
+        "info": {"symbol": "AAPL", "shortName": "Apple", "longName": "Apple Inc.", "regularMarketPrice": 190.5,
+                 "sector": "Technology", "trailingEps": 6.1},
+        "history": '{"1700000000000":{"Close":190.5}}',
+        "recommendations": '{"0":{"strongBuy":10}}',
+        "news": [{"title": f"Story {i}"} for i in range(5)],
+    },
+}
+
+
+class FakeClock:
+    """Stands in for the time module inside utils.market_data; only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(market_data, "time", types.SimpleNamespace(
+        monotonic=fake.monotonic, perf_counter=fake.perf_counter, sleep=fake.sleep))
+    return fake
+
+
+def test_each_endpoint_expires_after_its_own_ttl(clock):
+    source = StaticMarketData(DATA)
+    cache = MarketDataCache(source)
+    tools = CachedYFinanceTools(cache=cache, stock_price=True, company_info=True, company_news=True)
+
+    assert tools.get_current_stock_price("AAPL") == "190.5000"
+    assert json.loads(tools.get_company_info("AAPL"))["Name"] == "Apple"
+    assert source.calls == {"info": 1}  # quote and profile share the fetch
+
+    clock.now += 10
+    tools.get_current_stock_price("aapl")
+    tools.get_company_info("AAPL")
+    assert source.calls == {"info": 1}
+
+    clock.now += 10  # 20s: the 15s quote TTL has passed, the 6h info TTL has not
+    tools.get_current_stock_price("AAPL")
+    tools.get_company_info("AAPL")
+    assert source.calls == {"info": 2}
+
+    clock.now += 6 * 3600
+    tools.get_company_info("AAPL")
+    assert source.calls == {"info": 3}
+
+
+def test_ttl_overrides_and_news_is_cached_per_symbol(clock):
+    source = StaticMarketData(DATA)
+    cache = MarketDataCache(source, ttls={"news": 60})
+    tools = CachedYFinanceTools(cache=cache, company_news=True)
+
+    assert len(json.loads(tools.get_company_news("AAPL", 2))) == 2
+    assert len(json.loads(tools.get_company_news("AAPL", 4))) == 4
+    assert source.calls == {"news": 1}
+    clock.now += 61
+    tools.get_company_news("AAPL")
+    assert source.calls == {"news": 2}
+
+
+def test_concurrent_misses_make_one_upstream_call():
+    source = StaticMarketData(DATA, latency=0.2)
+    cache = MarketDataCache(source)
+    results = []
+    barrier = threading.Barrier(16)
+
+    def fetch():
+        barrier.wait()
+        results.append(cache.history("AAPL", "1mo", "1d"))
+
+    threads = [threading.Thread(target=fetch) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [DATA["AAPL"]["history"]] * 16
+    assert source.calls == {"history": 1}
+    counts = cache.metrics()["endpoints"]["history"]
+    assert counts["misses"] == 1
+    assert counts["coalesced"] == 15
+
+
+def test_failed_fetches_are_not_cached_and_reach_every_waiter():
+    source = StaticMarketData({}, latency=0.1)
+    cache = MarketDataCache(source)
+    errors = []
+
+    def fetch():
+        try:
+            cache.info("MSFT")
+        except KeyError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 5
+    assert source.calls == {"info": 1}
+
+    # Nothing was stored: the next call goes upstream again and sees the data once it exists
+    source.data["MSFT"] = {"info": {"regularMarketPrice": 410.0}}
+    assert cache.info("MSFT") == {"regularMarketPrice": 410.0}
+    assert source.calls == {"info": 2}
+    assert cache.metrics()["endpoints"]["info"]["errors"] == 1
+
+
+def test_tools_report_fetch_errors_as_strings():
+    tools = CachedYFinanceTools(cache=MarketDataCache(StaticMarketData({})), stock_price=True)
+    assert tools.get_current_stock_price("NOPE").startswith("Error fetching current price for NOPE")
+
+
+def test_metrics_counters(clock):
+    source = StaticMarketData(DATA)
+    cache = MarketDataCache(source, ttls={"price": 15})
+    cache.info("AAPL", endpoint="price")
+    cache.info("AAPL", endpoint="price")
+    cache.info("AAPL", endpoint="price")
+    cache.recommendations("AAPL")
+    with pytest.raises(KeyError):
+        cache.news("TSLA")
+    clock.now += 16
+    cache.info("AAPL", endpoint="price")
+
+    metrics = cache.metrics()
+    price = metrics["endpoints"]["price"]
+    assert (price["hits"], price["misses"], price["coalesced"], price["errors"]) == (2, 2, 0, 0)
+    assert price["hit_rate"] == 0.5
+    assert metrics["endpoints"]["recommendations"]["misses"] == 1
+    assert metrics["endpoints"]["news"]["errors"] == 1
+    assert metrics["upstream_calls"] == 4  # two quotes, the recommendations and the failed news fetch
+    assert metrics["hit_rate"] == pytest.approx(2 / 6)
+    assert metrics["entries"] == 2
+    assert metrics["upstream_ms"]["count"] == 3  # failed fetches are not timed
+
+    cache.invalidate("aapl")
+    assert cache.metrics()["entries"] == 0
+
+
+
+def test_price_is_served_from_a_fresh_info_entry(clock):
+    source = StaticMarketData(DATA)
+    cache = MarketDataCache(source)
+    tools = CachedYFinanceTools(cache=cache, stock_price=True, stock_fundamentals=True)
+
+    tools.get_stock_fundamentals("AAPL")
+    clock.now += 10
+    assert tools.get_current_stock_price("AAPL") == "190.5000"
+    assert source.calls == {"info": 1}
+
+    clock.now += 10  # the info entry is still valid as a profile, but too old for a quote
+    tools.get_current_stock_price("AAPL")
+    assert source.calls == {"info": 2}
+    clock.now += 10  # the quote refreshed the shared entry
+    tools.get_stock_fundamentals("AAPL")
+    tools.get_current_stock_price("AAPL")
+    assert source.calls == {"info": 2}
+    endpoints = cache.metrics()["endpoints"]
+    assert (endpoints["price"]["hits"], endpoints["price"]["misses"]) == (2, 1)
+    assert (endpoints["info"]["hits"], endpoints["info"]["misses"]) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    data = {symbol: {"info": {"symbol": symbol}} for symbol in ("AAPL", "MSFT", "NVDA")}
+    source = StaticMarketData(data)
+    cache = MarketDataCache(source, max_entries=2)
+    cache.info("AAPL")
+    cache.info("MSFT")
+    cache.info("AAPL")  # MSFT is now the least recently used
+    cache.info("NVDA")
+    assert cache.metrics()["entries"] == 2
+    assert source.calls == {"info": 3}
+
+    cache.info("AAPL")
+    cache.info("NVDA")
+    assert source.calls == {"info": 3}
+    cache.info("MSFT")
+    assert source.calls == {"info": 4}
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+import urllib.error
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.pdf_fetch import PDFFetcher
+
+
+class PDFServer:
+    """Local HTTP server with ETag / Last-Modified validators and request accounting"""
+
+    def __init__(self):
+        self.documents = {}  # path -> (body, validator): "etag", "last_modified" or None
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((self.path, dict(self.headers)))
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    time.sleep(server.delay)
+                    self._respond()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _respond(self):
+                if self.path not in server.documents:
+                    self.send_error(404)
+                    return
+                body, validator, modified = server.documents[self.path]
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                last_modified = formatdate(modified, usegmt=True)
+                if validator == "etag" and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                if validator == "last_modified" and self.headers.get("If-Modified-Since") == last_modified:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(body)))
+                if validator == "etag":
+                    self.send_header("ETag", etag)
+                elif validator == "last_modified":
+                    self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def publish(self, path, body, validator="etag", modified=1700000000):
+        self.documents[path] = (body, validator, modified)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    pdf_server = PDFServer()
+    yield pdf_server
+    pdf_server.close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    pdf_fetcher = PDFFetcher(str(tmp_path / "pdfs"), max_workers=2, max_age=0, timeout=5)
+    yield pdf_fetcher
+    pdf_fetcher.close()
+
+
+def test_first_fetch_downloads_into_the_blob_cache(server, fetcher):
+    body = b"%PDF-1.4 annual report"
+    server.publish("/report.pdf", body)
+    result = fetcher.fetch(server.url("/report.pdf"))
+    assert result.status == "downloaded"
+    assert result.read() == body
+    assert result.sha256 == hashlib.sha256(body).hexdigest()
+    assert result.size == len(body)
+    assert fetcher.stats["bytes_downloaded"] == len(body)
+
+
+@pytest.mark.parametrize("validator,header", [("etag", "If-None-Match"), ("last_modified", "If-Modified-Since")])
+def test_unchanged_document_is_revalidated_with_a_304(server, fetcher, validator, header):
+    server.publish("/report.pdf", b"%PDF-1.4 annual report", validator)
+    first = fetcher.fetch(server.url("/report.pdf"))
+    second = fetcher.fetch(server.url("/report.pdf"))
+    assert second.status == "not_modified"
+    assert second.sha256 == first.sha256
+    assert second.read() == b"%PDF-1.4 annual report"
+    assert header in server.requests[-1][1]
+    assert fetcher.stats["downloaded"] == 1
+    assert fetcher.stats["not_modified"] == 1
+
+
+def test_changed_document_is_downloaded_again(server, fetcher):
+    server.publish("/report.pdf", b"%PDF-1.4 draft")
+    first = fetcher.fetch(server.url("/report.pdf"))
+    server.publish("/report.pdf", b"%PDF-1.4 final")
+    second = fetcher.fetch(server.url("/report.pdf"))
+    assert second.status == "downloaded"
+    assert second.sha256 != first.sha256
+    assert second.read() == b"%PDF-1.4 final"
+    assert first.read() == b"%PDF-1.4 draft"  # blobs are content-addressed, the old one stays
+
+
+def test_recently_checked_urls_are_served_without_a_request(server, tmp_path):
+    fetcher = PDFFetcher(str(tmp_path / "pdfs"), max_age=60, timeout=5)
+    server.publish("/report.pdf", b"%PDF-1.4 annual report")
+    fetcher.fetch(server.url("/report.pdf"))
+    requests = len(server.requests)
+
+    assert fetcher.fetch(server.url("/report.pdf")).status == "fresh"
+    assert len(server.requests) == requests
+    assert fetcher.fetch(server.url("/report.pdf"), force=True).status == "not_modified"
+    assert len(server.requests) == requests + 1
+    fetcher.close()
+
+
+def test_fetch_many_maps_errors_per_url_and_bounds_concurrency(server, fetcher):
+    for i in range(6):
+        server.publish(f"/report-{i}.pdf", f"%PDF-1.4 report {i}".encode())
+    server.delay = 0.1
+    urls = [server.url(f"/report-{i}.pdf") for i in range(6)] + [server.url("/missing.pdf")]
+
+    results = fetcher.fetch_many(urls + urls[:2])  # duplicates are fetched once
+
+    assert set(results) == set(urls)
+    assert all(results[url].status == "downloaded" for url in urls[:6])
+    assert isinstance(results[urls[-1]], urllib.error.HTTPError)
+    assert results[urls[-1]].code == 404
+    assert fetcher.stats["errors"] == 1
+    assert len(server.requests) == 7
+    assert server.max_in_flight == fetcher.max_workers  # parallel, but never above the limit
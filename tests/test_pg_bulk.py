@@ -0,0 +1,111 @@
+import struct
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+from agno.document import Document
+from pgvector.psycopg.vector import VectorBinaryDumper
+from psycopg.types.json import JsonbBinaryDumper
+
+from utils.embeddings import EmbeddingModel
+from utils.pg_bulk import COLUMNS, COPY_TYPES, PgVectorBulkLoader, safe_content_hash
+
+
+class RecordingCopy:
+    def __init__(self):
+        self.types = None
+        self.rows = []
+
+    def set_types(self, types):
+        self.types = types
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class RecordingConnection:
+    """Just enough of a psycopg connection to capture COPY statements and rows"""
+
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement.as_string(None) if hasattr(statement, "as_string") else statement)
+
+    @contextmanager
+    def copy(self, statement):
+        self.statements.append(statement.as_string(None))
+        copy = RecordingCopy()
+        self.copies.append(copy)
+        yield copy
+
+
+def _loader(hashing_model):
+    vector_db = SimpleNamespace(schema="ai", table_name="filings", embedder=EmbeddingModel())
+    return PgVectorBulkLoader(vector_db)
+
+
+def test_rows_follow_the_copy_column_layout(hashing_model):
+    loader = _loader(hashing_model)
+    stored = np.arange(32, dtype=np.float32)
+    documents = [
+        Document(id="chunk-1", name="10-k", content="Revenue grew 8%.", meta_data={"page": 1}),
+        Document(name="10-k", content="Margins\x00 improved.", embedding=stored,
+                 usage={"prompt_tokens": 2, "total_tokens": 2}),
+    ]
+    rows = loader._rows(documents, {"issuer": "AAPL"})
+    assert len(COLUMNS) == len(COPY_TYPES) == len(rows[0])
+    row = dict(zip(COLUMNS, rows[0]))
+    assert row["id"] == "chunk-1"
+    assert row["meta_data"].obj == {"page": 1, "issuer": "AAPL"}
+    assert row["filters"].obj == {"issuer": "AAPL"}
+    assert row["content_hash"] == safe_content_hash("Revenue grew 8%.")
+    # Embedded in one batch as float32 rows, with token usage attached
+    assert row["embedding"].dtype == np.float32
+    assert np.array_equal(row["embedding"], loader.vector_db.embedder.get_embedding_array("Revenue grew 8%."))
+    assert row["usage"].obj == {"prompt_tokens": 3, "total_tokens": 3}
+
+    second = dict(zip(COLUMNS, rows[1]))
+    assert second["id"] == second["content_hash"]  # no id: fall back to the content hash
+    assert second["content"] == "Margins� improved."  # Postgres text cannot hold NUL bytes
+    assert second["embedding"] is stored
+    assert loader._rows(documents[:1], None)[0][COLUMNS.index("filters")] is None
+
+
+def test_embedding_and_json_binary_encoding(hashing_model):
+    loader = _loader(hashing_model)
+    row = dict(zip(COLUMNS, loader._rows([Document(id="chunk-1", content="Revenue grew 8%.")], None)[0]))
+    vector = row["embedding"]
+    # pgvector's binary format: dimension and an unused flag (int16 each), then big-endian float32s
+    encoded = bytes(VectorBinaryDumper(np.ndarray).dump(vector))
+    assert encoded == struct.pack(">HH", len(vector), 0) + vector.astype(">f4").tobytes()
+    assert bytes(JsonbBinaryDumper(type(row["meta_data"])).dump(row["meta_data"])) == b"\x01{}"
+
+
+def test_copy_writes_binary_rows_to_the_target_columns(hashing_model):
+    loader = _loader(hashing_model)
+    rows = loader._rows([Document(id=f"chunk-{i}", content=f"Line {i}") for i in range(3)], None)
+    conn = RecordingConnection()
+    loader._copy(conn, loader._target, rows)
+    assert conn.statements == ['COPY "ai"."filings" ("id", "name", "meta_data", "filters", "content", "embedding", '
+                               '"usage", "content_hash") FROM STDIN (FORMAT BINARY)']
+    assert conn.copies[0].types == COPY_TYPES
+    assert conn.copies[0].rows == rows
+
+
+def test_upsert_stages_rows_and_merges_on_id(hashing_model):
+    loader = _loader(hashing_model)
+    conn = RecordingConnection()
+    loader._copy_and_merge(conn, loader._rows([Document(id="chunk-1", content="Revenue grew.")], None))
+    create, truncate, copy, merge = conn.statements
+    assert create == 'CREATE TEMP TABLE IF NOT EXISTS "_stage_filings" (LIKE "ai"."filings" INCLUDING DEFAULTS)'
+    assert truncate == 'TRUNCATE "_stage_filings"'
+    assert copy.startswith('COPY "_stage_filings"')
+    assert 'SELECT DISTINCT ON (id)' in merge
+    assert 'ON CONFLICT (id) DO UPDATE SET "name" = EXCLUDED."name"' in merge
+    assert '"id" = EXCLUDED' not in merge
@@ -0,0 +1,112 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from agno.vectordb.distance import Distance
+
+from utils.pg_index import VectorIndexManager, _default_lists
+
+
+class FakeSession:
+    """Records SQL text and answers the row-count and index-status queries"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.db.statements.append(sql)
+        if "count(*)" in sql:
+            return SimpleNamespace(scalar=lambda: self.db.rows)
+        if "obj_description" in sql:
+            return SimpleNamespace(fetchone=lambda: self.db.index_row)
+        return None
+
+
+def _vector_db(rows=5000, distance=Distance.cosine, index_row=(None, None)):
+    db = SimpleNamespace(schema="ai", table_name="filings", distance=distance, dimensions=384, rows=rows,
+                         index_row=index_row, statements=[])
+    db.Session = lambda: FakeSession(db)
+    return db
+
+
+def _ddl(db):
+    return [s for s in db.statements if s.startswith(("CREATE INDEX \"filings_", "DROP INDEX", "COMMENT ON"))]
+
+
+def test_hnsw_ddl_uses_the_configured_parameters():
+    db = _vector_db()
+    stats = VectorIndexManager(db, kind="hnsw", m=24, ef_construction=100).build()
+    assert _ddl(db) == [
+        'DROP INDEX IF EXISTS "ai"."filings_hnsw_index"',
+        'CREATE INDEX "filings_hnsw_index" ON "ai"."filings" USING hnsw (embedding vector_cosine_ops) '
+        'WITH (m = 24, ef_construction = 100)',
+        'COMMENT ON INDEX "ai"."filings_hnsw_index" IS \'{"rows": 5000, "params": {"m": 24, "ef_construction": 100}}\'',
+    ]
+    assert any("maintenance_work_mem" in s for s in db.statements)
+    assert stats["params"] == {"m": 24, "ef_construction": 100}
+    assert db.vector_index.ef_search == 40
+
+
+@pytest.mark.parametrize("rows, lists, expected_lists", [(5000, None, 5), (500, None, 1), (5000, 64, 64)])
+def test_ivfflat_lists_follow_the_row_count_unless_given(rows, lists, expected_lists):
+    db = _vector_db(rows=rows, distance=Distance.l2)
+    VectorIndexManager(db, kind="ivfflat", lists=lists).build()
+    create = [s for s in _ddl(db) if s.startswith("CREATE")][0]
+    assert create == (f'CREATE INDEX "filings_ivfflat_index" ON "ai"."filings" USING ivfflat '
+                      f'(embedding vector_l2_ops) WITH (lists = {expected_lists})')
+    assert db.vector_index.lists == expected_lists
+
+
+@pytest.mark.parametrize("quantization, expression", [
+    ("halfvec", "((embedding::halfvec(384)) halfvec_cosine_ops)"),
+    ("binary", "((binary_quantize(embedding)::bit(384)) bit_hamming_ops)"),
+])
+def test_quantized_indexes_cover_the_compact_expression(quantization, expression):
+    db = _vector_db()
+    manager = VectorIndexManager(db, quantization=quantization, maintenance_work_mem=None)
+    manager.build()
+    assert manager.index_name == f"filings_hnsw_{quantization}_index"
+    create = [s for s in _ddl(db) if s.startswith("CREATE")][0]
+    assert f"USING hnsw {expression} WITH" in create
+    assert not any("maintenance_work_mem" in s for s in db.statements)
+
+
+def test_unknown_kinds_are_rejected():
+    with pytest.raises(ValueError):
+        VectorIndexManager(_vector_db(), kind="diskann")
+    with pytest.raises(ValueError):
+        VectorIndexManager(_vector_db(), quantization="pq")
+
+
+def test_default_lists_switch_to_sqrt_above_a_million_rows():
+    assert _default_lists(999_999) == 999
+    assert _default_lists(4_000_000) == 2000
+
+
+def test_ensure_builds_only_when_large_enough_and_rebuilds_on_drift():
+    small = _vector_db(rows=500)
+    assert VectorIndexManager(small, min_rows=1000).ensure() is None
+    assert not any(s.startswith('CREATE INDEX "filings_hnsw') for s in small.statements)
+    assert any("USING gin (meta_data jsonb_path_ops)" in s for s in small.statements)
+
+    comment = json.dumps({"rows": 4500, "params": {"m": 16, "ef_construction": 64}})
+    within = _vector_db(rows=5000, index_row=(comment, 8192))
+    assert VectorIndexManager(within, rebuild_drift=0.2).ensure() is None
+
+    drifted = _vector_db(rows=6000, index_row=(comment, 8192))
+    assert VectorIndexManager(drifted, rebuild_drift=0.2).ensure()["rows"] == 6000
+
+    # An index recreated from its definition (e.g. after a bulk load) is stamped, not rebuilt
+    unstamped = _vector_db(rows=6000, index_row=(None, 8192))
+    assert VectorIndexManager(unstamped).ensure() is None
+    assert unstamped.statements[-1].startswith('COMMENT ON INDEX "ai"."filings_hnsw_index" IS \'{"rows": 6000')
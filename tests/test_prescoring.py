@@ -0,0 +1,118 @@
+import pytest
+
+from utils.batch_eval import aggregate, parse_scores
+from utils.embeddings import EmbeddingModel
+from utils.prescoring import PreScorer, agreement_report, format_report, judge_verdict, split_sentences
+
+CONTEXT = [
+    "Revenue grew 8% to $12.4 billion in fiscal 2023, driven by the services segment.",
+    "Operating margin expanded to 31% as cost of revenue fell.",
+]
+QUERY = "How much did revenue grow in fiscal 2023?"
+
+
+@pytest.fixture
+def prescorer(hashing_model):
+    return PreScorer(EmbeddingModel())
+
+
+def test_supported_answer_passes_locally(prescorer):
+    prescore = prescorer.score(CONTEXT[0], CONTEXT[0], CONTEXT)
+    assert prescore["verdict"] == "pass"
+    assert prescore["relevance"] > prescorer.relevance_band[1]
+    assert prescore["lexical_coverage"] == 1.0
+    assert prescore["numbers_found"] == prescore["numbers_total"]
+    assert prescore["scores"]["faithfulness"] >= 4
+
+
+def test_unsupported_answer_fails_locally(prescorer):
+    response = "The weather in Lisbon was sunny with pleasant afternoons and quiet beaches."
+    prescore = prescorer.score(QUERY, response, CONTEXT)
+    assert prescore["verdict"] == "fail"
+    assert prescore["lexical_coverage"] == 0.0
+    assert prescore["faithfulness"] <= prescorer.faithfulness_band[0]
+    assert prescore["scores"]["faithfulness"] <= 2
+
+
+def test_unsupported_figure_goes_to_the_judge(prescorer):
+    # Same wording as the context, but the figure is not in it
+    response = CONTEXT[0].replace("$12.4", "$14.9")
+    prescore = prescorer.score(CONTEXT[0], response, CONTEXT)
+    assert prescore["numbers_found"] < prescore["numbers_total"]
+    assert prescore["verdict"] == "ambiguous"
+
+
+def test_band_edges_decide_the_verdict(prescorer):
+    prescore = prescorer.score(QUERY, CONTEXT[0], CONTEXT)
+    relevance, faithfulness = prescore["relevance"], prescore["faithfulness"]
+    strict = PreScorer(prescorer.embedder, relevance_band=(relevance - 0.05, relevance + 0.05),
+                       faithfulness_band=(0.0, 0.01))
+    assert strict.score(QUERY, CONTEXT[0], CONTEXT)["verdict"] == "ambiguous"
+    lenient = PreScorer(prescorer.embedder, relevance_band=(0.0, relevance - 0.01),
+                        faithfulness_band=(0.0, faithfulness - 0.01))
+    assert lenient.score(QUERY, CONTEXT[0], CONTEXT)["verdict"] == "pass"
+    harsh = PreScorer(prescorer.embedder, relevance_band=(relevance + 0.01, 0.99))
+    assert harsh.score(QUERY, CONTEXT[0], CONTEXT)["verdict"] == "fail"
+
+
+def test_empty_inputs_are_left_to_the_judge(prescorer):
+    assert prescorer.score(QUERY, "Revenue grew.", [])["verdict"] == "ambiguous"
+    assert prescorer.score(QUERY, "  ", CONTEXT)["verdict"] == "ambiguous"
+
+
+def test_split_sentences_drops_fragments():
+    assert split_sentences("Revenue grew 8%. OK. Margins improved to 31%!\n- Debt fell sharply") == [
+        "Revenue grew 8%.", "Margins improved to 31%!", "Debt fell sharply"]
+
+
+def test_local_report_parses_like_a_judge_report(prescorer):
+    prescore = prescorer.score(CONTEXT[0], CONTEXT[0], CONTEXT)
+    report = format_report(CONTEXT[0], prescore)
+    scores = parse_scores(report)
+    assert scores["faithfulness"] == prescore["scores"]["faithfulness"]
+    assert scores["context_relevance"] == prescore["scores"]["context_relevance"]
+    assert scores["answer_completeness"] is None  # only the judge scores the other metrics
+
+
+def test_agreement_report_compares_audited_verdicts():
+    judge_scores = {"faithfulness": 4.0, "context_relevance": 5.0}
+    records = [
+        # audited pass the judge agrees with
+        {"stage": "judge", "scores": judge_scores,
+         "prescore": {"verdict": "pass", "scores": {"faithfulness": 4.5, "context_relevance": 4.0}}},
+        # audited fail the judge disagrees with
+        {"stage": "judge", "scores": judge_scores,
+         "prescore": {"verdict": "fail", "scores": {"faithfulness": 2.0, "context_relevance": 5.0}}},
+        # escalated: counts towards the score gap, not the verdict agreement
+        {"stage": "judge", "scores": {"faithfulness": 2.0, "context_relevance": 3.0},
+         "prescore": {"verdict": "ambiguous", "scores": {"faithfulness": 3.0, "context_relevance": 3.0}}},
+        # decided locally: nothing to compare against
+        {"stage": "local", "scores": {"faithfulness": 5.0},
+         "prescore": {"verdict": "pass", "scores": {"faithfulness": 5.0, "context_relevance": 5.0}}},
+    ]
+    report = agreement_report(records)
+    assert report["audited"] == 2
+    assert report["verdict_agreement"] == 0.5
+    assert report["mean_abs_score_gap"] == {"faithfulness": 1.167, "context_relevance": 0.333}
+    assert judge_verdict({"faithfulness": 3.0, "context_relevance": 2.5}) == "fail"
+    assert judge_verdict({"faithfulness": None, "context_relevance": 4.0}) is None
+
+
+def test_aggregate_keeps_local_proxy_scores_out_of_judge_metrics():
+    judged = {"faithfulness": 2.0, "context_relevance": 3.0, "answer_completeness": 4.0,
+              "source_attribution": 3.0, "response_coherence": 4.0}
+    records = [
+        {"id": "a", "query": "q", "stage": "judge", "scores": judged, "total": 16.0, "seconds": 1.0},
+        {"id": "b", "query": "q", "stage": "local", "seconds": 0.01,
+         "scores": {"faithfulness": 5.0, "context_relevance": 4.6}},
+        {"id": "c", "query": "q", "stage": "local", "seconds": 0.01,
+         "scores": {"faithfulness": 4.0, "context_relevance": 4.4}},
+    ]
+    summary = aggregate(records)
+    assert summary["stages"] == {"judge": 1, "local": 2}
+    assert summary["metrics"]["faithfulness"]["count"] == 1
+    assert summary["metrics"]["faithfulness"]["mean"] == 2.0
+    assert summary["total"]["count"] == 1
+    assert summary["unparsed"] == 0
+    assert summary["local_metrics"]["faithfulness"]["mean"] == 4.5
+    assert summary["local_metrics"]["context_relevance"]["count"] == 2
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import ConcurrencySlots, RateLimiter
+
+
+def _interrupt(seconds):
+    raise KeyboardInterrupt
+
+
+def test_interrupted_acquire_releases_its_slot(monkeypatch):
+    limiter = RateLimiter("test-model", requests_per_minute=1, tokens_per_minute=100000, max_concurrency=1)
+    limiter.acquire(10)
+    limiter.release(10)
+
+    # The second request has to wait for the requests bucket; interrupt it while it sleeps
+    monkeypatch.setattr(rate_limit.time, "sleep", _interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        limiter.acquire(10)
+
+    stats = limiter.metrics()
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+    assert limiter._slots.try_acquire()  # the only slot is free again
+    limiter._slots.release()
+
+
+def test_cancelled_aacquire_releases_its_slot():
+    limiter = RateLimiter("test-model", requests_per_minute=1, tokens_per_minute=100000, max_concurrency=1)
+    limiter.acquire(10)
+    limiter.release(10)
+
+    async def cancel_while_waiting():
+        task = asyncio.ensure_future(limiter.aacquire(10))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_waiting())
+    assert limiter.metrics()["waiting"] == 0
+    assert limiter._slots.try_acquire()
+    limiter._slots.release()
+
+
+def test_concurrency_slots_are_bounded():
+    limiter = RateLimiter("test-model", requests_per_minute=1000, tokens_per_minute=1000000, max_concurrency=2)
+    limiter.acquire(1)
+    limiter.acquire(1)
+    assert limiter.metrics()["in_flight"] == 2
+    assert not limiter._slots.try_acquire()
+    limiter.release(1, actual_tokens=3)
+    limiter.release(1)
+    stats = limiter.metrics()
+    assert stats["in_flight"] == 0
+    assert stats["requests"] == 2
+    assert stats["tokens"] == 4
+
+
+def test_async_waiters_get_slots_in_arrival_order():
+    slots = ConcurrencySlots(1)
+    order = []
+
+    async def worker(name):
+        await slots.aacquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        slots.release()
+
+    async def run_all():
+        slots.acquire()  # hold the slot until everyone is queued
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.ensure_future(worker(name)))
+            await asyncio.sleep(0)
+        assert slots.waiting() == 5
+        slots.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run_all())
+    assert order == [0, 1, 2, 3, 4]
+    assert slots.try_acquire()
+
+
+def test_queued_waiters_sleep_until_a_slot_is_released(monkeypatch):
+    slots = ConcurrencySlots(1)
+    slots.acquire()
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def counting_sleep(delay, *args):
+        sleeps.append(delay)
+        return await real_sleep(delay, *args)
+
+    async def wait_for_release():
+        monkeypatch.setattr(asyncio, "sleep", counting_sleep)
+        # A release from another thread wakes the waiting task through its event loop
+        threading.Timer(0.2, slots.release).start()
+        started = time.monotonic()
+        await slots.aacquire()
+        return time.monotonic() - started
+
+    waited = asyncio.run(wait_for_release())
+    assert waited >= 0.15
+    assert sleeps == []
+    assert not slots.try_acquire()
+    slots.release()
+
+
+def test_new_arrivals_do_not_overtake_queued_threads():
+    slots = ConcurrencySlots(1)
+    slots.acquire()
+    admitted = []
+
+    def worker(name):
+        slots.acquire()
+        admitted.append(name)
+        slots.release()
+
+    first = threading.Thread(target=worker, args=("queued",))
+    first.start()
+    while slots.waiting() == 0:
+        time.sleep(0.001)
+    slots.release()
+    assert not slots.try_acquire()  # the freed slot already belongs to the queued thread
+    first.join()
+    assert admitted == ["queued"]
+    assert slots.try_acquire()
+
+
+def test_cancelled_waiter_passes_on_a_slot_it_was_handed():
+    slots = ConcurrencySlots(1)
+
+    async def cancel_after_grant():
+        slots.acquire()
+        first = asyncio.ensure_future(slots.aacquire())
+        second = asyncio.ensure_future(slots.aacquire())
+        await asyncio.sleep(0)
+        slots.release()  # handed to first, which is cancelled before it runs
+        first.cancel()
+        await second
+        assert first.cancelled()
+
+    asyncio.run(cancel_after_grant())
+    assert slots.waiting() == 0
+    assert not slots.try_acquire()  # held by the second waiter
+    slots.release()
+    assert slots.try_acquire()
+    with pytest.raises(ValueError):
+        slots.release()
+        slots.release()
@@ -0,0 +1,113 @@
+import pytest
+from agno.document import Document
+
+from agents.rag_agent import DocumentQA
+from utils.bm25 import BM25Index, tokenize
+from utils.retrieval import HybridRetriever, reciprocal_rank_fusion
+
+CORPUS = {
+    "overview": "Revenue and margins improved across all segments during the year.",
+    "outlook": "Management expects revenue growth and margin expansion next year.",
+    "segments": "Segment revenue grew in services while hardware margins declined.",
+    "risks": "Key risks include competition, currency and supply chain disruption.",
+    "ticker": "The shares trade on Nasdaq under the ticker AAPL.",
+    "capex": "Purchases of property, plant and equipment were 10,959 million in fy2023.",
+}
+
+
+def _documents():
+    return [Document(id=doc_id, name="10-k", content=content, meta_data={"section": doc_id})
+            for doc_id, content in CORPUS.items()]
+
+
+class RankedDb:
+    """Dense side stub returning the corpus in a fixed order"""
+
+    def __init__(self, order):
+        self.order = order
+
+    def search(self, query, limit=5, filters=None):
+        documents = {doc.id: doc for doc in _documents()}
+        return [documents[doc_id] for doc_id in self.order][:limit]
+
+
+def test_tokenize_keeps_figures_and_codes_whole():
+    assert tokenize("Capex of 10,959.5 in FY2023 (see 10-K).") == ["capex", "of", "10,959.5", "in", "fy2023",
+                                                                  "see", "10-k"]
+
+
+def test_bm25_prefers_rare_terms_and_short_documents():
+    index = BM25Index()
+    index.add(_documents())
+    results = index.search("revenue AAPL")
+    assert results[0][0] == "ticker"  # "aapl" is in one document, "revenue" in three
+    assert {doc_id for doc_id, _ in results} == {"ticker", "overview", "outlook", "segments"}
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert index.search("dividend") == []
+    assert index.search("revenue", filters={"section": "outlook"})[0][0] == "outlook"
+
+
+def test_bm25_replaces_and_removes_documents():
+    index = BM25Index()
+    index.add(_documents())
+    index.add([Document(id="ticker", name="10-k", content="Listed on the New York Stock Exchange.")])
+    assert index.search("AAPL") == []
+    assert index.search("exchange")[0][0] == "ticker"
+    index.remove(["ticker", "missing"])
+    assert len(index) == len(CORPUS) - 1
+    assert index.search("exchange") == []
+
+
+def test_bm25_index_persists_and_reloads(tmp_path):
+    path = str(tmp_path / "lexical" / "report.json")
+    index = BM25Index(path)
+    index.add(_documents())
+    index.save()
+
+    reloaded = BM25Index(path)
+    assert len(reloaded) == len(CORPUS)
+    assert reloaded.search("10,959 capex") == index.search("10,959 capex")
+    assert reloaded.get("ticker")["meta_data"] == {"section": "ticker"}
+
+
+def test_reciprocal_rank_fusion_weights_rankings():
+    fused = dict(reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60))
+    assert fused["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert max(fused, key=fused.get) == "b"
+    weighted = reciprocal_rank_fusion([["a", "b"], ["c", "d"]], weights=[1.0, 2.0], k=60)
+    assert [doc_id for doc_id, _ in weighted] == ["c", "d", "a", "b"]
+
+
+@pytest.mark.parametrize("query, expected", [("AAPL", "ticker"), ("capex 10,959", "capex")])
+def test_exact_term_match_ranks_first_after_fusion(query, expected):
+    index = BM25Index()
+    index.add(_documents())
+    # The dense side ranks the exact match last, as embeddings do for tickers and figures
+    dense_order = [doc_id for doc_id in CORPUS if doc_id != expected] + [expected]
+    retriever = HybridRetriever(RankedDb(dense_order), index)
+    results = retriever.search(query, limit=3)
+    assert results[0].id == expected
+    assert results[0].meta_data["rrf_score"] > results[1].meta_data["rrf_score"]
+
+
+def test_lexical_only_hits_are_rebuilt_from_the_index():
+    index = BM25Index()
+    index.add(_documents())
+    retriever = HybridRetriever(RankedDb(["overview", "outlook"]), index)
+    results = {doc.id: doc for doc in retriever.search("AAPL", limit=3)}
+    assert set(results) == {"overview", "outlook", "ticker"}
+    assert results["ticker"].content == CORPUS["ticker"]
+    assert results["ticker"].meta_data["section"] == "ticker"
+    assert results["ticker"].meta_data["rrf_score"] == pytest.approx(1 / 61)
+
+
+def test_document_qa_hybrid_retrieval_finds_exact_terms(tmp_path, hashing_model):
+    qa = DocumentQA(vector_store="local", local_store_dir=str(tmp_path / "store"),
+                    embedding_cache_path=str(tmp_path / "embeddings.sqlite"),
+                    manifest_path=str(tmp_path / "manifest.sqlite"), lexical_index_dir=str(tmp_path / "lexical"),
+                    pdf_cache_dir=str(tmp_path / "pdfs"), retrieval="hybrid", answer_cache=False, top_k=3)
+    qa._open_table("library")
+    qa.current_knowledge_base.vector_db.insert(_documents())
+    qa.lexical_index.add(_documents())
+    assert qa._retrieve("AAPL")[0].id == "ticker"
+    assert qa._retrieve("property plant equipment 10,959")[0].id == "capex"
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from utils import semantic_cache
+from utils.semantic_cache import SemanticAnswerCache
+
+QUESTION = "What was total revenue in fiscal 2023?"
+
+
+def _vector(*components):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(components)] = components
+    return vector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_similar_question_hits_and_different_one_misses():
+    cache = SemanticAnswerCache()
+    cache.store("report", QUESTION, _vector(1.0, 0.1), "Revenue was $12.4 billion.", ["chunk-1"])
+
+    hit = cache.lookup("report", "What was the total revenue in fiscal 2023?", _vector(1.0, 0.12))
+    assert hit["answer"] == "Revenue was $12.4 billion."
+    assert hit["chunk_ids"] == ["chunk-1"]
+    assert hit["similarity"] >= cache.threshold
+
+    assert cache.lookup("report", "How much debt is outstanding?", _vector(0.5, 1.0)) is None
+    assert cache.lookup("other-report", QUESTION, _vector(1.0, 0.1)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_default_threshold_rejects_merely_related_questions():
+    cache = SemanticAnswerCache()
+    cache.store("report", QUESTION, _vector(1.0, 0.0), "Revenue was $12.4 billion.", [])
+    # cosine 0.95: close, but below the default threshold
+    assert cache.lookup("report", "What was total operating revenue in fiscal 2023?",
+                        _vector(0.95, np.sqrt(1 - 0.95 ** 2))) is None
+
+
+def test_different_numbers_never_hit():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.store("report", QUESTION, _vector(1.0), "Revenue was $12.4 billion.", [])
+    cache.store("report", "What was total revenue in fiscal 2022?", _vector(0.9, 0.3), "Revenue was $11.5 billion.", [])
+
+    # The identical vector belongs to the 2023 question, so the 2022 entry must win
+    hit = cache.lookup("report", "What was total revenue in fiscal 2022?", _vector(1.0))
+    assert hit["answer"] == "Revenue was $11.5 billion."
+    assert cache.lookup("report", "What was total revenue in fiscal 2021?", _vector(1.0)) is None
+    assert cache.lookup("report", "What was total revenue?", _vector(1.0)) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store("report", QUESTION, _vector(1.0), "Revenue was $12.4 billion.", [])
+    clock[0] += 59
+    assert cache.lookup("report", QUESTION, _vector(1.0)) is not None
+    clock[0] += 2
+    assert cache.lookup("report", QUESTION, _vector(1.0)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("report", "Question one?", _vector(1.0), "one", [])
+    cache.store("report", "Question two?", _vector(0.0, 1.0), "two", [])
+    # Touch the first entry so the second becomes the least recently used
+    assert cache.lookup("report", "Question one?", _vector(1.0))["answer"] == "one"
+    cache.store("report", "Question three?", _vector(0.0, 0.0, 1.0), "three", [])
+
+    assert cache.lookup("report", "Question two?", _vector(0.0, 1.0)) is None
+    assert cache.lookup("report", "Question one?", _vector(1.0))["answer"] == "one"
+    assert cache.lookup("report", "Question three?", _vector(0.0, 0.0, 1.0))["answer"] == "three"
+
+
+def test_invalidate_drops_scope_and_its_filtered_sub_scopes():
+    cache = SemanticAnswerCache()
+    for scope in ("report", 'report|{"page": 3}', "report_2024", "other"):
+        cache.store(scope, QUESTION, _vector(1.0), scope, [])
+
+    cache.invalidate("report")
+    assert cache.lookup("report", QUESTION, _vector(1.0)) is None
+    assert cache.lookup('report|{"page": 3}', QUESTION, _vector(1.0)) is None
+    # A table that merely shares the prefix is a different scope
+    assert cache.lookup("report_2024", QUESTION, _vector(1.0))["answer"] == "report_2024"
+
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
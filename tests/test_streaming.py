@@ -0,0 +1,43 @@
+import time
+import types
+
+from agno.run.response import RunEvent
+
+from utils.streaming import answer_events, stream_run
+
+
+class FakeAgent:
+    """Yields agno-style run events: a tool call, then the answer in pieces"""
+
+    def __init__(self, pieces, delay=0.0):
+        self.pieces = pieces
+        self.delay = delay
+
+    def run(self, prompt, stream=False, stream_intermediate_steps=False):
+        tool = types.SimpleNamespace(tool_name="get_current_stock_price")
+        yield types.SimpleNamespace(event=RunEvent.tool_call_started.value, tool=tool)
+        yield types.SimpleNamespace(event=RunEvent.tool_call_completed.value, tool=tool)
+        for piece in self.pieces:
+            time.sleep(self.delay)
+            yield types.SimpleNamespace(event=RunEvent.run_response_content.value, content=piece)
+        yield types.SimpleNamespace(event=RunEvent.run_response_content.value, content="")
+
+
+def test_stream_run_ends_with_its_stats():
+    events = list(stream_run(FakeAgent(["AAPL ", "is ", "up."]), "AAPL?"))
+    assert [e.kind for e in events] == ["tool_started", "tool_completed", "token", "token", "token", "done"]
+    assert events[0].tool_name == "get_current_stock_price"
+    stats = events[-1].stats
+    assert stats["chunks"] == 3  # content chunks, however many tokens each one holds
+    assert stats["characters"] == len("AAPL is up.")
+    assert stats["tool_calls"] == 1
+    assert 0 <= stats["ttft_ms"] <= stats["total_ms"]
+
+
+def test_answer_events_deliver_a_cached_answer_in_one_chunk():
+    started = time.perf_counter()
+    token, done = list(answer_events("Revenue grew 8%.", started))
+    assert token.kind == "token" and token.content == "Revenue grew 8%."
+    assert done.kind == "done"
+    assert done.stats["chunks"] == 1
+    assert done.stats["ttft_ms"] == done.stats["total_ms"]
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from utils.prescoring import agreement_report
+
+# The five metrics of RAGEvaluator's report, in report order
+METRICS = ("faithfulness", "context_relevance", "answer_completeness", "source_attribution", "response_coherence")
+
+
+def parse_scores(report: str) -> Dict[str, Optional[float]]:
+    """
+    Pull the 1-5 metric scores out of an evaluation report
+
+    Matches headings such as "### Faithfulness: 4/5", "**Context Relevance** - 3 / 5" or
+    "Answer Completeness (1-5): 4 out of 5".
+    Metrics that cannot be found, or fall outside 1-5, are None.
+    """
+    scores = {}
+    for metric in METRICS:
+        words = r"[\s_]+".join(metric.split("_"))
+        match = re.search(rf"{words}(?:\s*\(1\s*-\s*5\))?\W*?(?:score)?\W*?(\d(?:\.\d+)?)\s*(?:/|out of)\s*5\b", report or "",
+                          re.IGNORECASE)
+        value = float(match.group(1)) if match else None
+        scores[metric] = value if value is not None and 1 <= value <= 5 else None
+    return scores
+
+
+def case_id(case: dict) -> str:
+    """Stable id of a case, so that reordered or extended input files still resume correctly"""
+    if case.get("id") is not None:
+        return str(case["id"])
+    payload = json.dumps([case.get("query"), case.get("response"), case.get("context")], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def read_jsonl(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_checkpoint(path: str) -> Dict[str, dict]:
+    """Completed records of an earlier run, by case id (failed cases are retried)"""
+    if not path or not os.path.exists(path):
+        return {}
+    done = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short when the run was interrupted
+            if not record.get("error"):
+                done[record["id"]] = record
+    return done
+
+
+def aggregate(records: Iterable[dict]) -> dict:
+    """
+    Per-metric statistics over the successfully scored records
+
+    "metrics" and "total" only cover cases the LLM judge scored. Cases the cascade decided
+    locally carry proxy scores on a different footing, so they are summarized on their own
+    under "local_metrics" (faithfulness and context relevance only).
+    """
+    records = list(records)
+    scored = [r for r in records if not r.get("error")]
+    judged = [r for r in scored if r.get("stage", "judge") == "judge"]
+    local = [r for r in scored if r.get("stage") == "local"]
+    summary = {
+        "cases": len(records),
+        "errors": len(records) - len(scored),
+        "unparsed": sum(1 for r in judged if r.get("total") is None),
+        "stages": dict(Counter(r.get("stage", "judge") for r in scored)),
+        "metrics": _metric_stats(judged, METRICS),
+    }
+    totals = [r["total"] for r in judged if r.get("total") is not None]
+    summary["total"] = _describe(totals) if totals else {"count": 0}
+    if local:
+        summary["local_metrics"] = _metric_stats(local, ("faithfulness", "context_relevance"))
+    latencies = [r["seconds"] for r in records if r.get("seconds") is not None]
+    if latencies:
+        summary["seconds_per_case"] = _describe(latencies)
+    if any(r.get("prescore") for r in records):
+        summary["cascade"] = agreement_report(records)
+    return summary
+
+
+def _metric_stats(records: List[dict], metrics: Iterable[str]) -> dict:
+    stats = {}
+    for metric in metrics:
+        values = [r["scores"][metric] for r in records if (r.get("scores") or {}).get(metric) is not None]
+        stats[metric] = _describe(values) if values else {"count": 0}
+        if values:
+            stats[metric]["distribution"] = {str(s): sum(1 for v in values if round(v) == s) for s in range(1, 6)}
+    return stats
+
+
+def _describe(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 3),
+        "stdev": round(statistics.pstdev(values), 3),
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+class BatchEvaluator:
+    """Runs RAGEvaluator over many cases concurrently, with checkpointing and aggregates
+
+    Cases are dicts with "query", "response" and "context" (a list of passages or one
+    string), plus an optional "id". Up to concurrency evaluations are in flight at once;
+    the Groq calls themselves are paced by the shared per-model rate limiter. Every
+    finished case is appended to the output JSONL immediately, so an interrupted run
+    picks up where it stopped when started again with the same output path.
+    """
+
+    def __init__(self, evaluator, concurrency: int = 4):
+        """
+        Args:
+            evaluator (RAGEvaluator): Evaluator whose aevaluate() scores each case
+            concurrency (int): Maximum evaluations in flight
+        """
+        self.evaluator = evaluator
+        self.concurrency = concurrency
+
+    async def _evaluate(self, case: dict, semaphore: asyncio.Semaphore) -> dict:
+        try:
+            return await self._score(case, semaphore)
+        except Exception as e:
+            # A malformed case or a failing local stage is recorded (and retried on the next run)
+            # instead of aborting the batch
+            return {"id": case_id(case), "query": str(case.get("query", "")), "error": f"Error: {e!r}"}
+
+    async def _score(self, case: dict, semaphore: asyncio.Semaphore) -> dict:
+        context = case.get("context") or []
+        if isinstance(context, str):
+            context = [context]
+        async with semaphore:
+            started = time.perf_counter()
+            if hasattr(self.evaluator, "aevaluate_detailed"):
+                detail = await self.evaluator.aevaluate_detailed(case["query"], case["response"], context)
+            else:
+                detail = {"report": await self.evaluator.aevaluate(case["query"], case["response"], context)}
+            seconds = time.perf_counter() - started
+        report = detail["report"]
+        record = {"id": case_id(case), "query": case["query"], "seconds": round(seconds, 3),
+                  "stage": detail.get("stage", "judge")}
+        if detail.get("prescore") is not None:
+            record["prescore"] = detail["prescore"]
+        if report is None or report.startswith("Error:"):
+            record["error"] = report or "No evaluation returned"
+            return record
+        scores = parse_scores(report)
+        record["scores"] = scores
+        record["total"] = sum(scores.values()) if all(v is not None for v in scores.values()) else None
+        record["report"] = report
+        return record
+
+    async def arun(self, cases: List[dict], output_path: Optional[str] = None, progress: bool = True) -> dict:
+        """
+        Evaluate cases, skipping those already completed in output_path
+
+        Returns:
+            dict: {"records": completed records in input order, "summary": aggregate() of them
+                plus "failed", the number of cases without a score (retried on the next run)}
+        """
+        done = load_checkpoint(output_path)
+        pending = [case for case in cases if case_id(case) not in done]
+        if progress and done:
+            print(f"Resuming: {len(done)} cases already evaluated, {len(pending)} to go")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        records = dict(done)
+        output = open(output_path, "a") if output_path else None
+        tasks = [asyncio.ensure_future(self._evaluate(case, semaphore)) for case in pending]
+        try:
+            for finished, task in enumerate(asyncio.as_completed(tasks), start=1):
+                record = await task
+                if output is not None:
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                if not record.get("error"):
+                    records[record["id"]] = record
+                if progress:
+                    status = "❌" if record.get("error") else "✅"
+                    print(f"{status} [{finished}/{len(pending)}] {record['query'][:60]}")
+        finally:
+            # Interrupted: stop the remaining evaluations; everything written so far is kept
+            for task in tasks:
+                task.cancel()
+            if output is not None:
+                output.close()
+
+        ordered = [records[case_id(case)] for case in cases if case_id(case) in records]
+        summary = aggregate(ordered)
+        summary["failed"] = len(cases) - len(ordered)
+        return {"records": ordered, "summary": summary}
+
+    def run(self, cases: List[dict], output_path: Optional[str] = None, progress: bool = True) -> dict:
+        """Blocking wrapper around arun()"""
+        return asyncio.run(self.arun(cases, output_path, progress))
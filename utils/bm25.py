@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Keeps figures such as "1,234.5", "fy2024" and "10-k" as single tokens so exact
+# line items, tickers and years match literally
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,\-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path (str): JSON file the index is loaded from and saved to, or None for memory only
+            k1 (float): Term-frequency saturation
+            b (float): Document-length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, documents: List[Any]):
+        """Index agno Documents by id, replacing any previous version of the same id"""
+        with self._lock:
+            for doc in documents:
+                if doc.id in self._docs:
+                    self._remove_one(doc.id)
+                terms = Counter(tokenize(doc.content))
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[doc.id] = tf
+                length = sum(terms.values())
+                self._docs[doc.id] = {
+                    "length": length,
+                    "name": doc.name,
+                    "content": doc.content,
+                    "meta_data": doc.meta_data or {},
+                }
+                self._total_length += length
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove_one(doc_id)
+
+    def _remove_one(self, doc_id: str):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc["length"]
+        for term in set(tokenize(doc["content"])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._total_length = 0
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Return (doc id, BM25 score) pairs, best first"""
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    length = self._docs[doc_id]["length"]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            if filters:
+                scores = {
+                    doc_id: score for doc_id, score in scores.items()
+                    if all(self._docs[doc_id]["meta_data"].get(k) == v for k, v in filters.items())
+                }
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Stored name, content and metadata of an indexed document"""
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"docs": self._docs}, f)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        """Rebuild postings from the stored documents"""
+        with open(self.path, encoding="utf-8") as f:
+            docs = json.load(f)["docs"]
+        for doc_id, doc in docs.items():
+            terms = Counter(tokenize(doc["content"]))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._docs[doc_id] = doc
+            self._total_length += doc["length"]
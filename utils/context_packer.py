@@ -0,0 +1,119 @@
+import zlib
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.bm25 import tokenize
+from utils.llm import estimate_tokens
+from utils.quantization import normalize_rows
+
+
+class ContextPacker:
+    """Packs retrieved chunks into a prompt under a token budget
+
+    Chunks are picked by maximal marginal relevance (relevance to the query minus
+    similarity to chunks already picked), near-duplicates are dropped outright, and
+    selection stops when the budget is spent.
+    """
+
+    def __init__(self, token_budget: int = 3000, mmr_lambda: float = 0.7, dedup_threshold: float = 0.95,
+                 order: str = "relevance", token_counter: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            token_budget (int): Maximum context tokens
+            mmr_lambda (float): 1.0 ranks purely by relevance, lower values favour diversity
+            dedup_threshold (float): Cosine similarity above which a chunk counts as a duplicate
+            order (str): "relevance" keeps selection order, "page" restores document order
+            token_counter: Function estimating the tokens of a text
+        """
+        if order not in ("relevance", "page"):
+            raise ValueError(f"Unknown order: {order}")
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.dedup_threshold = dedup_threshold
+        self.order = order
+        self.token_counter = token_counter
+
+    def pack(self, query: str, chunks: Sequence[str], embeddings: Optional[np.ndarray] = None,
+             query_vector: Optional[np.ndarray] = None, pages: Optional[Sequence] = None) -> dict:
+        """
+        Select chunks for a prompt
+
+        Args:
+            query (str): The question the context is for
+            chunks (list): Candidate chunk texts, best first
+            embeddings (ndarray): Chunk embeddings; hashed bag-of-words vectors are used if omitted
+            query_vector (ndarray): Query embedding, required together with embeddings
+            pages (list): Page number per chunk, used by order="page"
+
+        Returns:
+            dict: chunks, indices, tokens used, tokens_in, tokens_saved and duplicates dropped
+        """
+        chunks = list(chunks)
+        token_counts = [self.token_counter(c) for c in chunks]
+        result = {"chunks": [], "indices": [], "tokens": 0, "tokens_in": sum(token_counts),
+                  "tokens_saved": 0, "duplicates": 0}
+        if not chunks:
+            return result
+
+        if embeddings is None or query_vector is None:
+            matrix = _hashed_bow(chunks + [query])
+            embeddings, query_vector = matrix[:-1], matrix[-1]
+        embeddings = normalize_rows(embeddings)
+        query_vector = normalize_rows(np.reshape(query_vector, (1, -1)))[0]
+
+        relevance = embeddings @ query_vector
+        max_similarity = np.full(len(chunks), -1.0, dtype=np.float32)
+        remaining = set(range(len(chunks)))
+        selected = []
+        used = 0
+        while remaining:
+            candidates = np.array(sorted(remaining))
+            scores = self.mmr_lambda * relevance[candidates] - (1 - self.mmr_lambda) * np.maximum(max_similarity[candidates], 0)
+            best = int(candidates[np.argmax(scores)])
+            remaining.discard(best)
+
+            if selected and max_similarity[best] >= self.dedup_threshold:
+                result["duplicates"] += 1
+                continue
+            if used + token_counts[best] > self.token_budget:
+                if not selected:
+                    # Nothing fits yet: keep the most relevant chunk, truncated to the budget
+                    chunks[best] = _truncate(chunks[best], self.token_budget, self.token_counter)
+                    token_counts[best] = self.token_counter(chunks[best])
+                else:
+                    continue
+            selected.append(best)
+            used += token_counts[best]
+            max_similarity = np.maximum(max_similarity, embeddings @ embeddings[best])
+
+        if self.order == "page" and pages is not None:
+            selected.sort(key=lambda i: (pages[i] is None, pages[i] or 0, i))
+
+        result.update(
+            chunks=[chunks[i] for i in selected],
+            indices=selected,
+            tokens=used,
+            tokens_saved=result["tokens_in"] - used,
+        )
+        return result
+
+
+def _truncate(text: str, budget: int, token_counter: Callable[[str], int]) -> str:
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if token_counter(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def _hashed_bow(texts: List[str], dimensions: int = 2048) -> np.ndarray:
+    """Hashed term-frequency vectors, a stand-in when no embeddings are available"""
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            matrix[row, zlib.crc32(token.encode("utf-8")) % dimensions] += 1.0
+    return matrix
@@ -1,20 +1,102 @@
+import threading
+import time
+
 from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
 
-def get_db_connection(db_url="postgresql+psycopg://ai:ai@localhost:5532/ai"):
-    """Create a database connection and ensure vector extension is enabled"""
+from utils.metrics import Histogram
+
+DEFAULT_DB_URL = "postgresql+psycopg://ai:ai@localhost:5532/ai"
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait_ms = Histogram([0.1, 1, 5, 10, 50, 100, 500, 1000, 5000])
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait_ms.observe((time.perf_counter() - started) * 1000.0)
+
+
+def get_engine(db_url=DEFAULT_DB_URL, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800):
+    """
+    Return the process-wide engine for db_url, creating it on first use
+
+    The first call for a URL creates a pooled engine with pre-ping, checks the server
+    version and enables the vector extension once. Later calls return the same engine,
+    so pool settings only take effect on the first call for each URL.
+    """
+    engine = _engines.get(db_url)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            engine = create_engine(
+                db_url,
+                poolclass=MeteredQueuePool,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=True,
+            )
+            _bootstrap(engine)
+            _engines[db_url] = engine
+    return engine
+
+
+def _bootstrap(engine):
+    """Check the connection and ensure the vector extension is enabled"""
     try:
-        engine = create_engine(db_url)
-        
-        with engine.connect() as connection:
+        with engine.begin() as connection:
             # Test connection
             result = connection.execute(text("SELECT version();"))
             version = result.fetchone()[0]
             print(f"Connected to PostgreSQL: {version}")
-            
+
             # Enable vector extension
             connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
-            
-        return engine
     except Exception as e:
         print(f"Database connection error: {e}")
-        raise
\ No newline at end of file
+        engine.dispose()
+        raise
+
+
+def pool_metrics(db_url=DEFAULT_DB_URL):
+    """Pool utilization and checkout-wait histogram for a registered engine"""
+    engine = _engines.get(db_url)
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "utilization": pool.checkedout() / (pool.size() + max(pool._max_overflow, 0)),
+        "checkout_wait_ms": pool.checkout_wait_ms.snapshot(),
+    }
+
+
+def dispose_engines():
+    """Close every pooled connection, e.g. before forking worker processes"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def get_db_connection(db_url=DEFAULT_DB_URL):
+    """Create a database connection and ensure vector extension is enabled"""
+    return get_engine(db_url)
@@ -0,0 +1,169 @@
+import os
+import platform
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.model_registry import get_model, get_sentence_transformer
+from utils.quantization import normalize_rows
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class TorchBackend:
+    """sentence-transformers on PyTorch, the reference implementation"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None):
+        """
+        Args:
+            model_name (str): Hugging Face model id
+            threads (int): Intra-op threads; torch.set_num_threads is process-wide
+        """
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = get_sentence_transformer(model_name)
+        self.dimensions = _dimensions(self.model)
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+
+
+class OnnxBackend:
+    """sentence-transformers on ONNX Runtime, optionally with dynamic int8 quantization
+
+    The model is exported to ONNX once and saved under export_dir. The quantized variant
+    stores int8 weights for the MatMul/Gemm layers (activations are quantized on the
+    fly), picked for the CPU's instruction set. Each backend gets its own
+    InferenceSession with an explicit intra-op thread count, so the thread count does
+    not leak into other models in the process.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = False, threads: Optional[int] = None,
+                 export_dir: str = ".cache/onnx", quantization_config: Optional[str] = None):
+        """
+        Args:
+            model_name (str): Hugging Face model id
+            quantized (bool): Use the dynamically quantized int8 export
+            threads (int): ONNX Runtime intra-op threads (None lets ONNX Runtime pick)
+            export_dir (str): Where exported models are kept between runs
+            quantization_config (str): "arm64", "avx2", "avx512" or "avx512_vnni"; detected if None
+        """
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.model_name = model_name
+        self.threads = threads
+        self.local_dir = os.path.join(export_dir, model_name.replace("/", "__"))
+        self.quantization_config = quantization_config or _detect_quantization_config()
+        file_name = f"onnx/model_qint8_{self.quantization_config}.onnx" if quantized else "onnx/model.onnx"
+        key = f"{model_name}|{self.name}|{self.quantization_config if quantized else ''}|{threads or ''}"
+        self.model = get_model(key, lambda: self._load(file_name, quantized))
+        self.dimensions = _dimensions(self.model)
+
+    def _load(self, file_name: str, quantized: bool):
+        try:
+            # Imported here so that the torch backend does not need onnxruntime or optimum installed
+            import onnxruntime
+            from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        except ImportError as e:
+            raise ImportError("The ONNX backends need `pip install sentence-transformers[onnx]`") from e
+
+        if not os.path.exists(os.path.join(self.local_dir, "onnx", "model.onnx")):
+            print(f"Exporting {self.model_name} to ONNX in {self.local_dir}...")
+            SentenceTransformer(self.model_name, backend="onnx").save_pretrained(self.local_dir)
+        if quantized and not os.path.exists(os.path.join(self.local_dir, file_name)):
+            exported = SentenceTransformer(self.local_dir, backend="onnx")
+            export_dynamic_quantized_onnx_model(exported, self.quantization_config, self.local_dir)
+
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+            session_options.inter_op_num_threads = 1
+        return SentenceTransformer(
+            self.local_dir,
+            backend="onnx",
+            model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider",
+                          "session_options": session_options},
+        )
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+
+
+def make_backend(name: str, model_name: str, threads: Optional[int] = None, **kwargs):
+    """Create an embedding backend: "torch", "onnx" or "onnx-int8" """
+    if name == "torch":
+        return TorchBackend(model_name, threads)
+    if name in ("onnx", "onnx-int8"):
+        return OnnxBackend(model_name, quantized=name == "onnx-int8", threads=threads, **kwargs)
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def _detect_quantization_config() -> str:
+    """Best int8 kernel set the CPU supports"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return "avx2"
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def check_consistency(reference, candidate, texts: Sequence[str], min_cosine: float = 0.99) -> dict:
+    """
+    Cosine agreement between two backends on the same texts
+
+    Returns:
+        dict: mean and minimum cosine, the share of texts whose nearest neighbour among
+            the others is the same under both backends, and whether min_cosine was met
+    """
+    texts = list(texts)
+    expected = normalize_rows(reference.encode(texts))
+    actual = normalize_rows(candidate.encode(texts))
+    cosines = np.sum(expected * actual, axis=1)
+
+    def neighbours(vectors):
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        return np.argmax(similarity, axis=1)
+
+    return {
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_cosine": round(float(cosines.min()), 5),
+        "neighbour_agreement": round(float(np.mean(neighbours(expected) == neighbours(actual))), 4) if len(texts) > 1 else 1.0,
+        "passed": bool(cosines.min() >= min_cosine),
+    }
+
+
+def compare_backends(texts: Sequence[str], model_name: str = "sentence-transformers/paraphrase-MiniLM-L6-v2",
+                     backends: Sequence[str] = BACKENDS, threads: Optional[int] = None,
+                     batch_size: int = 64) -> List[Dict]:
+    """Throughput of each backend on texts, with cosine agreement against the torch backend"""
+    texts = list(texts)
+    reference = make_backend("torch", model_name, threads)
+    report = []
+    for name in backends:
+        backend = reference if name == "torch" else make_backend(name, model_name, threads)
+        backend.encode(texts[:batch_size])  # warm up
+        started = time.perf_counter()
+        for start in range(0, len(texts), batch_size):
+            backend.encode(texts[start:start + batch_size])
+        seconds = time.perf_counter() - started
+        row = {"backend": name, "texts_per_second": round(len(texts) / seconds, 1), "dimensions": backend.dimensions}
+        row.update(check_consistency(reference, backend, texts[:256]))
+        report.append(row)
+    return report
+
+
+def _dimensions(model) -> int:
+    """Embedding size reported by the model (the accessor was renamed in sentence-transformers 5)"""
+    getter = getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension
+    return getter()
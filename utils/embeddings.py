@@ -1,29 +1,143 @@
-from typing import Union, List, Tuple
-from sentence_transformers import SentenceTransformer
+import asyncio
+from typing import Union, List, Tuple, Optional
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_batcher import EmbeddingBatcher
+from utils.embedding_backends import make_backend
+from utils.parallel_embeddings import ParallelEmbedder
+
+class EmbeddingBatch:
+    """Compact container for a batch of embeddings stored as one contiguous matrix"""
+
+    def __init__(self, vectors: np.ndarray, token_counts: np.ndarray):
+        self.vectors = vectors
+        self.token_counts = token_counts
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def __getitem__(self, index) -> np.ndarray:
+        return self.vectors[index]
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.token_counts.nbytes
+
+    def usage(self) -> dict:
+        """Usage information in the format agno expects"""
+        total_tokens = int(self.token_counts.sum())
+        return {"prompt_tokens": total_tokens, "total_tokens": total_tokens}
+
+    def tolist(self) -> List[List[float]]:
+        """Convert to nested lists; only needed at the agno/PgVector boundary"""
+        return self.vectors.tolist()
 
 class EmbeddingModel:
     """Wrapper for sentence-transformers embedding model"""
-    
-    def __init__(self, model_name='sentence-transformers/paraphrase-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
-        self.dimensions = 384  # Dimension for the chosen model
-    
+
+    def __init__(self, model_name='sentence-transformers/paraphrase-MiniLM-L6-v2', cache: Optional[EmbeddingCache] = None,
+                 batching: bool = False, max_batch_size: int = 32, max_wait_ms: float = 5.0, normalize: bool = False,
+                 backend: str = "torch", threads: Optional[int] = None, workers: int = 0,
+                 parallel_min_texts: int = 512):
+        self.model_name = model_name
+        # "torch", "onnx" or "onnx-int8"; shared across every EmbeddingModel in the process, loaded on first use
+        self.backend = make_backend(backend, model_name, threads)
+        self.model = self.backend.model
+        self.dimensions = self.backend.dimensions
+        self.cache = cache
+        # Backends and normalization change the vectors slightly, so each gets its own cache namespace
+        self.normalize = normalize
+        namespace = model_name if backend == "torch" else f"{model_name}|{backend}"
+        self._cache_namespace = f"{namespace}|normalized" if normalize else namespace
+        # Opt-in: coalesce concurrent single-text calls into shared encode batches
+        self.batcher = EmbeddingBatcher(self._encode, max_batch_size, max_wait_ms) if batching else None
+        # Opt-in: bulk encodes of at least parallel_min_texts go to a pool of worker processes
+        self.parallel = ParallelEmbedder(model_name, backend, workers=workers, normalize=normalize,
+                                         dimensions=self.dimensions) if workers > 0 else None
+        self.parallel_min_texts = parallel_min_texts
+
+    def _run_model(self, texts: List[str]) -> np.ndarray:
+        """Run the encoder, returning a contiguous float32 matrix"""
+        if self.parallel is not None and len(texts) >= self.parallel_min_texts:
+            return self.parallel.encode(texts)
+        embeddings = self.backend.encode(texts, normalize=self.normalize)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def close(self):
+        """Shut down the worker pool, if any"""
+        if self.parallel is not None:
+            self.parallel.close()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts, only running the model on cache misses"""
+        if not texts:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        if self.cache is None:
+            return self._run_model(texts)
+
+        keys = [self.cache.make_key(self._cache_namespace, t) for t in texts]
+        found = self.cache.get_many(keys)
+        result = np.empty((len(texts), self.dimensions), dtype=np.float32)
+
+        # Encode each distinct missing text once, even if it repeats in the batch
+        missing = {}
+        for i, key in enumerate(keys):
+            if key in found:
+                result[i] = found[key]
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            miss_texts = [texts[rows[0]] for rows in missing.values()]
+            encoded = self._run_model(miss_texts)
+            fresh = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(fresh)
+            for key, rows in missing.items():
+                result[rows] = fresh[key]
+        return result
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        """Encode a single text, through the batcher when enabled"""
+        if self.batcher is not None:
+            return self.batcher.embed(text)
+        return self._encode([text])[0]
+
+    async def aget_embedding(self, text: str) -> List[float]:
+        """Get a single embedding from an asyncio task"""
+        if self.batcher is not None:
+            return (await self.batcher.aembed(text)).tolist()
+        # The forward pass would otherwise block every other task on the event loop
+        return (await asyncio.to_thread(self._encode, [text]))[0].tolist()
+
+    def get_embedding_array(self, text: Union[str, List[str]], dtype=np.float32) -> np.ndarray:
+        """Get embeddings as an ndarray: shape (dim,) for a string, (n, dim) for a list"""
+        if isinstance(text, str):
+            return self._encode_one(text).astype(dtype, copy=False)
+        return self._encode(list(text)).astype(dtype, copy=False)
+
+    def get_embedding_batch(self, texts: List[str], dtype=np.float32) -> EmbeddingBatch:
+        """Get a batch of embeddings as a compact EmbeddingBatch (float32 or float16)"""
+        texts = list(texts)
+        token_counts = np.fromiter((len(t.split()) for t in texts), dtype=np.int32, count=len(texts))
+        return EmbeddingBatch(self._encode(texts).astype(dtype, copy=False), token_counts)
+
     def get_embedding_and_usage(self, text: Union[str, List[str]]) -> Tuple[Union[List[List[float]], List[float]], dict]:
         """Get embedding with usage information"""
         if isinstance(text, str):
-            embedding = self.model.encode(text)
-            embedding_list = embedding.tolist()
+            embedding_list = self._encode_one(text).tolist()
             usage = {"prompt_tokens": len(text.split()), "total_tokens": len(text.split())}
             return embedding_list, usage
         else:
-            embeddings = self.model.encode(text)
-            embedding_list = embeddings.tolist()
-            total_tokens = sum(len(t.split()) for t in text)
-            usage = {"prompt_tokens": total_tokens, "total_tokens": total_tokens}
-            return embedding_list, usage
-    
+            batch = self.get_embedding_batch(text)
+            return batch.tolist(), batch.usage()
+
     def get_embedding(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
         """Get embedding without usage information"""
         if isinstance(text, str):
-            return self.model.encode(text).tolist()
-        return self.model.encode(text).tolist()
\ No newline at end of file
+            return self._encode_one(text).tolist()
+        return self._encode(list(text)).tolist()
@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional, Set
+
+from utils.ingestion import chunk_id
+
+_DONE = object()
+
+
+class IngestPipeline:
+    """Streams a downloaded PDF through parse -> chunk -> embed -> write stages
+
+    Stages run in their own threads connected by bounded queues, so a slow stage applies
+    backpressure upstream and peak memory depends on queue_size and embed_batch_size rather
+    than on the size of the PDF. Rows are written batch by batch, so the document becomes
+    searchable while later pages are still being processed.
+    """
+
+    def __init__(self, vector_db, embedder, source: str, reader=None, skip_ids: Optional[Set[str]] = None,
+                 upsert: bool = False, meta_data: Optional[dict] = None, queue_size: int = 8,
+                 embed_batch_size: int = 64,
+                 on_write: Optional[Callable[[list], None]] = None,
+                 on_complete: Optional[Callable[[dict, Set[str]], None]] = None):
+        """
+        Args:
+            vector_db: agno vector db the chunks are written to
+            embedder: EmbeddingModel used for batched embedding
+            source (str): Source URL, used for chunk ids and metadata
+            reader: agno Reader whose chunking strategy is applied to each page
+            skip_ids (set): Chunk ids already stored, which are not embedded or written again
+            upsert (bool): Upsert instead of insert
+            meta_data (dict): Extra metadata added to every chunk (e.g. doc_id, issuer, fiscal_year)
+            queue_size (int): Capacity of each inter-stage queue
+            embed_batch_size (int): Chunks per encode call and per write
+            on_write: Called with each batch of documents after it has been written
+            on_complete: Called with (stats, chunk ids seen) once every stage has finished
+        """
+        if reader is None:
+            from agno.document.reader.pdf_reader import PDFReader
+            reader = PDFReader()
+        self.vector_db = vector_db
+        self.embedder = embedder
+        self.source = source
+        self.reader = reader
+        self.skip_ids = skip_ids or set()
+        self.upsert = upsert
+        self.meta_data = meta_data or {}
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.on_write = on_write
+        self.on_complete = on_complete
+
+        self.seen_ids: Set[str] = set()
+        self.stats = {"pages": 0, "chunks": 0, "added": 0, "skipped": 0, "removed": 0, "stage_seconds": {}}
+        self.error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._done = threading.Event()
+
+    def start(self, pdf_path: str, delete_file: bool = True) -> "IngestPipeline":
+        """Start all stages in background threads"""
+        pages = queue.Queue(self.queue_size)
+        chunks = queue.Queue(self.queue_size)
+        batches = queue.Queue(self.queue_size)
+        stages = [
+            ("parse", self._parse, (pdf_path, pages)),
+            ("chunk", self._chunk, (pages, chunks)),
+            ("embed", self._embed, (chunks, batches)),
+            ("write", self._write, (batches,)),
+        ]
+        self._started = time.perf_counter()
+        for name, target, args in stages:
+            thread = threading.Thread(target=self._guard, args=(name, target, args), name=f"ingest-{name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+        threading.Thread(target=self._finish, args=(pdf_path, delete_file), daemon=True).start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> dict:
+        """Block until the pipeline finishes, re-raising the first stage error"""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.stats
+
+    def run(self, pdf_path: str, delete_file: bool = True) -> dict:
+        return self.start(pdf_path, delete_file).wait()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def _guard(self, name, target, args):
+        busy = [0.0]
+        try:
+            target(*args, busy=busy)
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+            self._stop.set()
+        finally:
+            # Time spent working rather than waiting on queues; the largest one bounds throughput
+            self.stats["stage_seconds"][name] = round(busy[0], 3)
+
+    def _finish(self, pdf_path, delete_file):
+        for thread in self._threads:
+            thread.join()
+        if delete_file:
+            try:
+                os.remove(pdf_path)
+            except OSError:
+                pass
+        self.stats["total_seconds"] = round(time.perf_counter() - self._started, 3)
+        if self.error is None and self.on_complete is not None:
+            try:
+                self.on_complete(self.stats, self.seen_ids)
+            except BaseException as e:
+                self.error = e
+        self._done.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up when another stage has failed"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _parse(self, pdf_path, out: queue.Queue, busy):
+        from agno.document import Document
+        from pypdf import PdfReader
+
+        pdf = PdfReader(pdf_path)
+        doc_name = self.source.split("/")[-1].split(".")[0] or "document"
+        try:
+            for number, page in enumerate(pdf.pages, start=1):
+                started = time.perf_counter()
+                # Pages are parsed lazily, one at a time, as the queue drains
+                text = page.extract_text() or ""
+                busy[0] += time.perf_counter() - started
+                self.stats["pages"] += 1
+                if text.strip():
+                    doc = Document(name=doc_name, id=f"{doc_name}_{number}", meta_data={"page": number}, content=text)
+                    if not self._put(out, doc):
+                        return
+        finally:
+            self._put(out, _DONE)
+
+    def _chunk(self, pages: queue.Queue, out: queue.Queue, busy):
+        try:
+            while True:
+                page = self._get(pages)
+                if page is _DONE:
+                    return
+                started = time.perf_counter()
+                chunks = self.reader.chunk_document(page) if self.reader.chunk else [page]
+                ready = []
+                for doc in chunks:
+                    doc.id = chunk_id(self.source, doc.content)
+                    if doc.id in self.seen_ids:
+                        continue  # duplicate chunk within this document
+                    self.seen_ids.add(doc.id)
+                    self.stats["chunks"] += 1
+                    if doc.id in self.skip_ids:
+                        self.stats["skipped"] += 1
+                        continue
+                    doc.meta_data = dict(doc.meta_data or {}, **self.meta_data, source_url=self.source)
+                    ready.append(doc)
+                busy[0] += time.perf_counter() - started
+                for doc in ready:
+                    if not self._put(out, doc):
+                        return
+        finally:
+            self._put(out, _DONE)
+
+    def _embed(self, chunks: queue.Queue, out: queue.Queue, busy):
+        batch = []
+        try:
+            while True:
+                doc = self._get(chunks)
+                if doc is not _DONE:
+                    batch.append(doc)
+                if batch and (doc is _DONE or len(batch) >= self.embed_batch_size):
+                    started = time.perf_counter()
+                    # One batched encode; it also warms the embedder cache, so the per-document
+                    # embed done inside the vector db's insert is a cache hit
+                    embedded = self.embedder.get_embedding_batch([d.content for d in batch])
+                    for d, vector, tokens in zip(batch, embedded.vectors, embedded.token_counts):
+                        d.embedding = vector.tolist()
+                        d.usage = {"prompt_tokens": int(tokens), "total_tokens": int(tokens)}
+                    busy[0] += time.perf_counter() - started
+                    if not self._put(out, batch):
+                        return
+                    batch = []
+                if doc is _DONE:
+                    return
+        finally:
+            self._put(out, _DONE)
+
+    def _write(self, batches: queue.Queue, busy):
+        while True:
+            batch = self._get(batches)
+            if batch is _DONE:
+                return
+            started = time.perf_counter()
+            if self.upsert:
+                self.vector_db.upsert(batch)
+            else:
+                self.vector_db.insert(batch)
+            if self.on_write is not None:
+                self.on_write(batch)
+            busy[0] += time.perf_counter() - started
+            self.stats["added"] += len(batch)
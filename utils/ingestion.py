@@ -0,0 +1,149 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Set
+
+
+def chunk_id(source: str, content: str) -> str:
+    """Stable id for a chunk: identical text from the same source always maps to the same row"""
+    return hashlib.md5(f"{source}\x00{content}".encode("utf-8")).hexdigest()
+
+
+def read_pdf_documents(data: bytes, source: str, reader=None, meta_data: Optional[dict] = None) -> list:
+    """Parse and chunk PDF bytes into agno Documents with stable, source-scoped ids
+
+    meta_data (e.g. doc_id, issuer, fiscal_year) is added to every chunk alongside source_url.
+    """
+    if reader is None:
+        from agno.document.reader.pdf_reader import PDFReader
+        reader = PDFReader()
+
+    buffer = io.BytesIO(data)
+    buffer.name = source.split("/")[-1] or "document.pdf"  # PDFReader derives the doc name from it
+    documents = reader.read(buffer)
+
+    # Drop exact duplicate chunks (repeated boilerplate pages) before they are embedded
+    unique = {}
+    for doc in documents:
+        doc.id = chunk_id(source, doc.content)
+        doc.meta_data = dict(doc.meta_data or {}, **(meta_data or {}), source_url=source)
+        unique.setdefault(doc.id, doc)
+    return list(unique.values())
+
+
+def delete_chunks(vector_db, chunk_ids: List[str]):
+    """Delete chunk rows by id from a PgVector table or a LocalVectorDb"""
+    if not chunk_ids:
+        return
+    if hasattr(vector_db, "delete_ids"):
+        vector_db.delete_ids(chunk_ids)
+        return
+    from sqlalchemy import delete
+
+    with vector_db.Session() as session, session.begin():
+        for start in range(0, len(chunk_ids), 1000):
+            batch = chunk_ids[start:start + 1000]
+            session.execute(delete(vector_db.table).where(vector_db.table.c.id.in_(batch)))
+
+
+class IngestManifest:
+    """SQLite record of which source documents and chunks have been written to each table"""
+
+    def __init__(self, path: str = ".cache/ingest_manifest.sqlite"):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    table_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (table_name, source)
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    table_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    PRIMARY KEY (table_name, source, chunk_id)
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    table_name TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    meta_data TEXT NOT NULL,
+                    PRIMARY KEY (table_name, doc_id)
+                );
+            """)
+            self._conn.commit()
+
+    def get_fingerprint(self, table_name: str, source: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM sources WHERE table_name = ? AND source = ?", (table_name, source)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_chunk_ids(self, table_name: str, source: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE table_name = ? AND source = ?", (table_name, source)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def save(self, table_name: str, source: str, fingerprint: str, chunk_ids: Set[str]):
+        """Replace the recorded state of a source"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE table_name = ? AND source = ?", (table_name, source))
+            self._conn.executemany(
+                "INSERT INTO chunks (table_name, source, chunk_id) VALUES (?, ?, ?)",
+                [(table_name, source, cid) for cid in chunk_ids],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (table_name, source, fingerprint, updated_at) VALUES (?, ?, ?, ?)",
+                (table_name, source, fingerprint, time.time()),
+            )
+            self._conn.commit()
+
+    def save_document(self, table_name: str, doc_id: str, source: str, meta_data: dict):
+        """Register a library document and the metadata its chunks are tagged with"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (table_name, doc_id, source, meta_data) VALUES (?, ?, ?, ?)",
+                (table_name, doc_id, source, json.dumps(meta_data)),
+            )
+            self._conn.commit()
+
+    def get_document(self, table_name: str, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, meta_data FROM documents WHERE table_name = ? AND doc_id = ?", (table_name, doc_id)
+            ).fetchone()
+        return None if row is None else dict(json.loads(row[1]), doc_id=doc_id, source_url=row[0])
+
+    def list_documents(self, table_name: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, source, meta_data FROM documents WHERE table_name = ? ORDER BY doc_id", (table_name,)
+            ).fetchall()
+        return [dict(json.loads(meta), doc_id=doc_id, source_url=source) for doc_id, source, meta in rows]
+
+    def remove(self, table_name: str, source: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE table_name = ? AND source = ?", (table_name, source))
+            self._conn.execute("DELETE FROM sources WHERE table_name = ? AND source = ?", (table_name, source))
+            self._conn.execute("DELETE FROM documents WHERE table_name = ? AND source = ?", (table_name, source))
+            self._conn.commit()
+
+    def clear_table(self, table_name: str):
+        """Forget every source of a table, e.g. after it has been dropped and recreated"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE table_name = ?", (table_name,))
+            self._conn.execute("DELETE FROM sources WHERE table_name = ?", (table_name,))
+            self._conn.execute("DELETE FROM documents WHERE table_name = ?", (table_name,))
+            self._conn.commit()
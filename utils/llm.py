@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from agno.exceptions import ModelProviderError
+from agno.models.groq import Groq
+from groq.types.chat import ChatCompletion, ChatCompletionChunk
+
+from utils.llm_cache import CacheMissError, LLMResponseCache
+from utils.rate_limit import get_limiter
+
+# "off", "read_write" (serve hits, record misses), "record" (always call, overwrite) or
+# "replay" (never call Groq, fail on a miss); set with configure_llm_cache() or LLM_CACHE_MODE
+CACHE_MODES = ("off", "read_write", "record", "replay")
+_cache_settings = {
+    "mode": os.getenv("LLM_CACHE_MODE", "off"),
+    "path": os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite"),
+    "ttl_seconds": float(os.getenv("LLM_CACHE_TTL", 86400)),
+}
+_caches = {}
+_cache_lock = threading.Lock()
+
+# Agents put the current time in their system prompt; masked in the key so that repeated
+# runs still match (the TTL bounds how stale a time-dependent answer can get)
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Llama token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def estimate_request_tokens(messages: List[Any], tools: Optional[List[dict]] = None,
+                            completion_tokens: int = 512) -> int:
+    """Rough prompt size plus the expected completion"""
+    text = "".join(str(message.content or "") for message in messages)
+    if tools:
+        text += json.dumps(tools, default=str)
+    return estimate_tokens(text) + completion_tokens
+
+
+def _usage_tokens(usage) -> Optional[int]:
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+@dataclass
+class RateLimitedGroq(Groq):
+    """Groq model whose every API call goes through the process-wide limiter for its id
+
+    Agents make several calls per run when they use tools, so limiting at this level
+    (rather than per agent run) keeps all agents sharing a model id inside its
+    requests/min, tokens/min and concurrency quota. A 429 pauses every caller of that
+    model until the buckets refill instead of letting each one retry on its own.
+    """
+
+    # Completion tokens reserved per call until the response reports its real usage
+    expected_completion_tokens: int = 512
+
+    def _estimate(self, messages, tools) -> int:
+        return estimate_request_tokens(messages, tools, self.max_tokens or self.expected_completion_tokens)
+
+    def invoke(self, messages, response_format=None, tools=None, tool_choice=None):
+        limiter = get_limiter(self.id)
+        estimate = self._estimate(messages, tools)
+        limiter.acquire(estimate)
+        usage, rate_limited = None, False
+        try:
+            response = super().invoke(messages, response_format=response_format, tools=tools, tool_choice=tool_choice)
+            usage = _usage_tokens(response.usage)
+            return response
+        except ModelProviderError as e:
+            rate_limited = e.status_code == 429
+            raise
+        finally:
+            limiter.release(estimate, usage, rate_limited)
+
+    async def ainvoke(self, messages, response_format=None, tools=None, tool_choice=None):
+        limiter = get_limiter(self.id)
+        estimate = self._estimate(messages, tools)
+        await limiter.aacquire(estimate)
+        usage, rate_limited = None, False
+        try:
+            response = await super().ainvoke(messages, response_format=response_format, tools=tools,
+                                             tool_choice=tool_choice)
+            usage = _usage_tokens(response.usage)
+            return response
+        except ModelProviderError as e:
+            rate_limited = e.status_code == 429
+            raise
+        finally:
+            limiter.release(estimate, usage, rate_limited)
+
+    def invoke_stream(self, messages, response_format=None, tools=None, tool_choice=None):
+        limiter = get_limiter(self.id)
+        estimate = self._estimate(messages, tools)
+        limiter.acquire(estimate)
+        usage, rate_limited = None, False
+        try:
+            for chunk in super().invoke_stream(messages, response_format=response_format, tools=tools,
+                                               tool_choice=tool_choice):
+                # Groq reports usage on the final chunk
+                usage = _usage_tokens(getattr(getattr(chunk, "x_groq", None), "usage", None)) or usage
+                yield chunk
+        except ModelProviderError as e:
+            rate_limited = e.status_code == 429
+            raise
+        finally:
+            limiter.release(estimate, usage, rate_limited)
+
+    async def ainvoke_stream(self, messages, response_format=None, tools=None, tool_choice=None):
+        limiter = get_limiter(self.id)
+        estimate = self._estimate(messages, tools)
+        await limiter.aacquire(estimate)
+        usage, rate_limited = None, False
+        try:
+            async for chunk in super().ainvoke_stream(messages, response_format=response_format, tools=tools,
+                                                      tool_choice=tool_choice):
+                usage = _usage_tokens(getattr(getattr(chunk, "x_groq", None), "usage", None)) or usage
+                yield chunk
+        except ModelProviderError as e:
+            rate_limited = e.status_code == 429
+            raise
+        finally:
+            limiter.release(estimate, usage, rate_limited)
+
+
+def configure_llm_cache(mode: str = None, path: str = None, ttl_seconds: float = None):
+    """Change the LLM response cache settings for every CachedGroq in the process"""
+    if mode is not None and mode not in CACHE_MODES:
+        raise ValueError(f"Unknown LLM cache mode: {mode}")
+    for key, value in (("mode", mode), ("path", path), ("ttl_seconds", ttl_seconds)):
+        if value is not None:
+            _cache_settings[key] = value
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide response cache for the configured path"""
+    with _cache_lock:
+        path = _cache_settings["path"]
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = LLMResponseCache(path, _cache_settings["ttl_seconds"])
+        cache.ttl_seconds = _cache_settings["ttl_seconds"]
+        return cache
+
+
+@dataclass
+class CachedGroq(RateLimitedGroq):
+    """RateLimitedGroq with a deterministic on-disk response cache in front of it
+
+    The key hashes the model id, the full formatted message list (tool calls and tool
+    results included) and every request parameter: tool schemas, tool choice, response
+    format and sampling settings. A hit returns the recorded response without touching
+    the rate limiter or the network. In replay mode a miss raises CacheMissError, so
+    pipelines can be benchmarked offline against a previous recording.
+    """
+
+    def _cache_key(self, messages, response_format, tools, tool_choice) -> str:
+        request = {
+            "model": self.id,
+            "messages": [self.format_message(m) for m in messages],
+            "params": self.get_request_params(response_format=response_format, tools=tools, tool_choice=tool_choice),
+        }
+        serialized = _TIMESTAMP.sub("<timestamp>", json.dumps(request, sort_keys=True, default=str))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str, kind: str):
+        """Recorded payload, None to call the model, or CacheMissError in replay mode"""
+        mode = _cache_settings["mode"]
+        if mode in ("off", "record"):
+            return None
+        payload = get_llm_cache().get(key, kind, ignore_ttl=mode == "replay")
+        if payload is None and mode == "replay":
+            raise CacheMissError(f"No recorded {self.id} response for request {key[:12]} (replay mode)")
+        return payload
+
+    def _record(self, key: str, kind: str, payload):
+        if _cache_settings["mode"] in ("read_write", "record"):
+            get_llm_cache().put(key, self.id, kind, payload)
+
+    def invoke(self, messages, response_format=None, tools=None, tool_choice=None):
+        key = self._cache_key(messages, response_format, tools, tool_choice)
+        payload = self._lookup(key, "completion")
+        if payload is not None:
+            return ChatCompletion.model_validate(payload)
+        response = super().invoke(messages, response_format=response_format, tools=tools, tool_choice=tool_choice)
+        self._record(key, "completion", response.model_dump(mode="json"))
+        return response
+
+    async def ainvoke(self, messages, response_format=None, tools=None, tool_choice=None):
+        key = self._cache_key(messages, response_format, tools, tool_choice)
+        payload = self._lookup(key, "completion")
+        if payload is not None:
+            return ChatCompletion.model_validate(payload)
+        response = await super().ainvoke(messages, response_format=response_format, tools=tools,
+                                         tool_choice=tool_choice)
+        self._record(key, "completion", response.model_dump(mode="json"))
+        return response
+
+    def invoke_stream(self, messages, response_format=None, tools=None, tool_choice=None):
+        key = self._cache_key(messages, response_format, tools, tool_choice)
+        payload = self._lookup(key, "stream")
+        if payload is not None:
+            for chunk in payload:
+                yield ChatCompletionChunk.model_validate(chunk)
+            return
+        chunks = []
+        for chunk in super().invoke_stream(messages, response_format=response_format, tools=tools,
+                                           tool_choice=tool_choice):
+            chunks.append(chunk.model_dump(mode="json"))
+            yield chunk
+        # Only complete streams are recorded
+        self._record(key, "stream", chunks)
+
+    async def ainvoke_stream(self, messages, response_format=None, tools=None, tool_choice=None):
+        key = self._cache_key(messages, response_format, tools, tool_choice)
+        payload = self._lookup(key, "stream")
+        if payload is not None:
+            for chunk in payload:
+                yield ChatCompletionChunk.model_validate(chunk)
+            return
+        chunks = []
+        async for chunk in super().ainvoke_stream(messages, response_format=response_format, tools=tools,
+                                                  tool_choice=tool_choice):
+            chunks.append(chunk.model_dump(mode="json"))
+            yield chunk
+        self._record(key, "stream", chunks)
+
+
+def make_groq(id: str, **kwargs) -> CachedGroq:
+    """Groq model for the agents: rate limited, and cached according to configure_llm_cache()"""
+    return CachedGroq(id=id, **kwargs)
+
+
+def llm_cache_stats() -> dict:
+    """Cache mode and hit/miss counters"""
+    stats = {"mode": _cache_settings["mode"]}
+    if _cache_settings["mode"] != "off":
+        stats.update(get_llm_cache().stats())
+    return stats
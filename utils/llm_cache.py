@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response"""
+
+
+class LLMResponseCache:
+    """SQLite store of raw model responses keyed by a hash of the full request
+
+    Each entry holds the provider's response as JSON: one completion, or the list of
+    chunks of a streamed response. Entries older than ttl_seconds count as misses, except
+    when replaying, where a recording is used however old it is.
+    """
+
+    def __init__(self, path: str = ".cache/llm_responses.sqlite", ttl_seconds: Optional[float] = 86400):
+        """
+        Args:
+            path (str): SQLite file for the responses
+            ttl_seconds (float): Age after which an entry is refreshed (None never expires)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model_id TEXT NOT NULL, kind TEXT NOT NULL, "
+            "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+
+    def get(self, key: str, kind: str, ignore_ttl: bool = False):
+        """Recorded payload for key, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ? AND kind = ?", (key, kind)
+            ).fetchone()
+            if row is not None and not ignore_ttl and self.ttl_seconds is not None \
+                    and time.time() - row[1] > self.ttl_seconds:
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model_id: str, kind: str, payload):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_id, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model_id, kind, json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+            self.writes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "writes": self.writes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def clear(self, model_id: Optional[str] = None):
+        """Drop every recorded response, or only those of one model"""
+        with self._lock:
+            if model_id is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE model_id = ?", (model_id,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,514 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from hashlib import md5
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from agno.document import Document
+from agno.vectordb.base import VectorDb
+
+from utils.quantization import (load_quantizer, make_quantizer, normalize_rows, recall_report, save_quantizer,
+                                top_k)
+
+
+class LocalVectorDb(VectorDb):
+    """In-process vector store persisted to a local directory
+
+    Vectors are L2-normalized and kept in a memory-mapped float32 matrix, so cosine
+    similarity is a single matrix-vector product and top-k uses np.argpartition. Chunk
+    text and metadata live in SQLite next to the matrix. Deleted rows are tombstoned
+    until optimize() compacts the matrix. For large corpora build_index() trains an
+    IVF (inverted file) index that only scans the closest clusters for each query, and
+    quantize() adds int8 or binary codes that are scanned first, so only the best
+    candidates are read back at full precision.
+    """
+
+    def __init__(self, path: str, embedder, ann_threshold: int = 50000, n_probe: int = 8,
+                 indexed_fields: Sequence[str] = (), rescore_factor: int = 4, rebuild_drift: float = 0.2):
+        """
+        Args:
+            path (str): Directory holding the matrix, metadata and index files
+            embedder: EmbeddingModel used for documents and queries
+            ann_threshold (int): Use the IVF index, once built, above this many live rows
+            n_probe (int): Number of IVF clusters scanned per query
+            indexed_fields (list): Metadata keys that get a SQLite index for filtered search
+            rescore_factor (int): With quantization, candidates per result re-ranked with float vectors
+            rebuild_drift (float): ensure_index() retrains once live rows moved by this fraction
+        """
+        self.path = path
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self.ann_threshold = ann_threshold
+        self.n_probe = n_probe
+        self.indexed_fields = [_field(name) for name in indexed_fields]
+        self.rescore_factor = rescore_factor
+        self.rebuild_drift = rebuild_drift
+        self._lock = threading.RLock()
+        self._conn = None
+        self._vectors = None
+        self._capacity = 0
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._centroids = None
+        self._assign = None
+        self._built_rows = None
+        self._quantizer = None
+        self._codes = None
+
+    # Storage
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.path, "vectors.f32")
+
+    def _open(self):
+        """Open (or reopen) the on-disk store if it exists"""
+        if self._conn is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.path, "meta.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, name TEXT, content TEXT NOT NULL, "
+            "meta_data TEXT, content_hash TEXT, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (content_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_name ON chunks (name)")
+        for name in self.indexed_fields:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS chunks_meta_{name} ON chunks (json_extract(meta_data, '$.{name}'))"
+            )
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT MAX(row) FROM chunks").fetchone()
+        self._size = 0 if row[0] is None else row[0] + 1
+        if os.path.exists(self._vectors_path):
+            self._capacity = os.path.getsize(self._vectors_path) // (4 * self.dimensions)
+        self._ensure_capacity(max(self._size, 1))
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        for (r,) in self._conn.execute("SELECT row FROM chunks WHERE deleted = 0"):
+            self._alive[r] = True
+        self._load_index()
+        self._load_quantizer()
+
+    def _ensure_capacity(self, n: int):
+        if n <= self._capacity and self._vectors is not None:
+            return
+        new_capacity = self._capacity
+        if n > new_capacity:
+            new_capacity = max(n, new_capacity * 2, 1024)  # grow geometrically
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "a+b") as f:
+            f.truncate(new_capacity * self.dimensions * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dimensions))
+        if new_capacity > self._capacity:
+            self._alive = np.concatenate([self._alive, np.zeros(new_capacity - len(self._alive), dtype=bool)])
+            if self._assign is not None:
+                self._assign = np.concatenate([self._assign, np.full(new_capacity - len(self._assign), -1, dtype=np.int32)])
+        self._capacity = new_capacity
+        if self._quantizer is not None:
+            self._open_codes()
+
+    def _embed(self, documents: List[Document]) -> np.ndarray:
+        """Normalized float32 vectors for documents, reusing embeddings already attached"""
+        vectors = np.empty((len(documents), self.dimensions), dtype=np.float32)
+        pending = [i for i, doc in enumerate(documents) if doc.embedding is None]
+        for i, doc in enumerate(documents):
+            if doc.embedding is not None:
+                vectors[i] = doc.embedding
+        if pending:
+            vectors[pending] = self.embedder.get_embedding_array([documents[i].content for i in pending])
+        return normalize_rows(vectors)
+
+    # VectorDb interface
+
+    def create(self) -> None:
+        with self._lock:
+            self._open()
+
+    async def async_create(self) -> None:
+        self.create()
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "meta.sqlite"))
+
+    async def async_exists(self) -> bool:
+        return self.exists()
+
+    def doc_exists(self, document: Document) -> bool:
+        content_hash = md5(document.content.encode("utf-8")).hexdigest()
+        return self._exists_where("content_hash = ?", content_hash)
+
+    async def async_doc_exists(self, document: Document) -> bool:
+        return self.doc_exists(document)
+
+    def name_exists(self, name: str) -> bool:
+        return self._exists_where("name = ?", name)
+
+    async def async_name_exists(self, name: str) -> bool:
+        return self.name_exists(name)
+
+    def id_exists(self, id: str) -> bool:
+        return self._exists_where("id = ?", id)
+
+    def _exists_where(self, clause: str, value) -> bool:
+        if not self.exists():
+            return False
+        with self._lock:
+            self._open()
+            row = self._conn.execute(f"SELECT 1 FROM chunks WHERE deleted = 0 AND {clause} LIMIT 1", (value,)).fetchone()
+        return row is not None
+
+    def insert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        self.upsert(documents, filters)
+
+    async def async_insert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        self.insert(documents, filters)
+
+    def upsert_available(self) -> bool:
+        return True
+
+    def upsert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        """Add documents, replacing the vector and metadata of ids that already exist"""
+        if not documents:
+            return
+        vectors = self._embed(documents)
+        with self._lock:
+            self._open()
+            rows = []
+            for doc, vector in zip(documents, vectors):
+                content_hash = md5(doc.content.encode("utf-8")).hexdigest()
+                doc_id = doc.id or content_hash
+                existing = self._conn.execute("SELECT row FROM chunks WHERE id = ?", (doc_id,)).fetchone()
+                if existing is not None:
+                    row = existing[0]
+                else:
+                    row = self._size
+                    self._size += 1
+                    self._ensure_capacity(self._size)
+                meta = dict(doc.meta_data or {}, **(filters or {}))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunks (row, id, name, content, meta_data, content_hash, deleted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (row, doc_id, doc.name, doc.content, json.dumps(meta), content_hash),
+                )
+                self._vectors[row] = vector
+                self._alive[row] = True
+                rows.append(row)
+            rows = np.asarray(rows)
+            if self._quantizer is not None:
+                self._codes[rows] = self._quantizer.encode(vectors)
+                self._codes.flush()
+            if self._centroids is not None:
+                self._assign[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+            self._conn.commit()
+            self._vectors.flush()
+
+    async def async_upsert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        self.upsert(documents, filters)
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        query_vector = normalize_rows(self.embedder.get_embedding_array(query)[None, :])[0]
+        return self.search_vector(query_vector, limit, filters)
+
+    async def async_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return self.search(query, limit, filters)
+
+    def search_vector(self, query_vector: np.ndarray, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Top-k cosine search for a normalized query vector
+
+        With filters, matching rows are selected from SQLite first and only those are ranked,
+        so a filter on one document costs the same however large the library grows.
+        """
+        if not self.exists():
+            return []
+        with self._lock:
+            self._open()
+            if filters:
+                candidates = self._filter_rows(filters)
+            else:
+                candidates = self._candidate_rows(query_vector)
+            if len(candidates) == 0:
+                return []
+            if self._quantizer is not None and len(candidates) > limit * self.rescore_factor:
+                # First pass over the compact codes, then rescore the shortlist at full precision
+                approximate = self._quantizer.score(self._codes[candidates], query_vector)
+                candidates = candidates[top_k(approximate, limit * self.rescore_factor)]
+            scores = self._vectors[candidates] @ query_vector
+            k = min(limit, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return self._load_documents(candidates[top], scores[top])
+
+    def _candidate_rows(self, query_vector: np.ndarray) -> np.ndarray:
+        alive = np.flatnonzero(self._alive[:self._size])
+        if self._centroids is None or len(alive) < self.ann_threshold:
+            return alive
+        n_probe = min(self.n_probe, len(self._centroids))
+        lists = np.argpartition(-(self._centroids @ query_vector), n_probe - 1)[:n_probe]
+        return alive[np.isin(self._assign[alive], lists)]
+
+    def _filter_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Live rows whose metadata matches every filter value"""
+        # Literal paths so SQLite can use the json_extract expression indexes
+        clauses = " AND ".join(f"json_extract(meta_data, '$.{_field(key)}') = ?" for key in filters)
+        rows = self._conn.execute(f"SELECT row FROM chunks WHERE deleted = 0 AND {clauses}", list(filters.values()))
+        rows = np.fromiter((r for (r,) in rows), dtype=np.int64)
+        return rows[self._alive[rows]]
+
+    def _load_documents(self, rows: np.ndarray, scores: np.ndarray) -> List[Document]:
+        placeholders = ",".join("?" * len(rows))
+        records = {
+            r[0]: r for r in self._conn.execute(
+                f"SELECT row, id, name, content, meta_data FROM chunks WHERE row IN ({placeholders})",
+                [int(r) for r in rows],
+            )
+        }
+        documents = []
+        for row, score in zip(rows, scores):
+            _, doc_id, name, content, meta_data = records[int(row)]
+            meta = json.loads(meta_data) if meta_data else {}
+            meta["similarity"] = float(score)
+            documents.append(Document(
+                id=doc_id, name=name, content=content, meta_data=meta,
+                embedder=self.embedder, embedding=self._vectors[row].tolist(),
+            ))
+        return documents
+
+    def delete_ids(self, ids: List[str]) -> None:
+        """Tombstone chunks by id; optimize() reclaims their space"""
+        if not ids or not self.exists():
+            return
+        with self._lock:
+            self._open()
+            for start in range(0, len(ids), 500):
+                batch = list(ids[start:start + 500])
+                placeholders = ",".join("?" * len(batch))
+                for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE id IN ({placeholders})", batch):
+                    self._alive[row] = False
+                self._conn.execute(f"UPDATE chunks SET deleted = 1 WHERE id IN ({placeholders})", batch)
+            self._conn.commit()
+
+    def drop(self) -> None:
+        with self._lock:
+            self._close()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._capacity = 0
+            self._size = 0
+            self._alive = np.zeros(0, dtype=bool)
+            self._centroids = None
+            self._assign = None
+            self._built_rows = None
+            self._quantizer = None
+            self._codes = None
+
+    async def async_drop(self) -> None:
+        self.drop()
+
+    def delete(self) -> bool:
+        self.drop()
+        return True
+
+    def optimize(self) -> None:
+        """Compact tombstoned rows out of the matrix and metadata"""
+        if not self.exists():
+            return
+        with self._lock:
+            self._open()
+            live = np.flatnonzero(self._alive[:self._size])
+            compact = np.array(self._vectors[live])
+            mapping = [(int(new), int(old)) for new, old in enumerate(live)]
+            self._conn.execute("DELETE FROM chunks WHERE deleted = 1")
+            # Shift rows down in two passes so the primary key never collides
+            self._conn.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(-1 - new, old) for new, old in mapping])
+            self._conn.execute("UPDATE chunks SET row = -1 - row WHERE row < 0")
+            self._conn.commit()
+            self._vectors[:len(live)] = compact
+            self._vectors.flush()
+            if self._quantizer is not None:
+                self._codes[:len(live)] = np.array(self._codes[live])
+                self._codes.flush()
+            self._alive[:] = False
+            self._alive[:len(live)] = True
+            if self._assign is not None:
+                assign = self._assign[live]
+                self._assign[:] = -1
+                self._assign[:len(live)] = assign
+            self._size = len(live)
+            if self._centroids is not None:
+                # Clusters were trained on rows that are now gone; retrain on what is left
+                self.build_index()
+
+    def _close(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        if self._codes is not None:
+            self._codes.flush()
+            self._codes = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Approximate index
+
+    def ensure_index(self) -> Optional[dict]:
+        """Build the IVF index once the store reaches ann_threshold live rows, or rebuild it on drift
+
+        Returns:
+            dict: Build stats if the index was (re)built, otherwise None
+        """
+        with self._lock:
+            self._open()
+            rows = int(self._alive[:self._size].sum())
+            if self._centroids is None:
+                return self.build_index() if rows >= self.ann_threshold else None
+            drift = abs(rows - self._built_rows) / max(self._built_rows, 1)
+            if drift > self.rebuild_drift:
+                print(f"Row count drifted {drift:.0%} since the IVF index was built, rebuilding it")
+                return self.build_index()
+            return None
+
+    def build_index(self, n_lists: Optional[int] = None, n_iter: int = 10, sample_size: int = 20000,
+                    seed: int = 0) -> Optional[dict]:
+        """Train an IVF index with spherical k-means over the live vectors"""
+        with self._lock:
+            self._open()
+            live = np.flatnonzero(self._alive[:self._size])
+            if len(live) == 0:
+                return None
+            started = time.perf_counter()
+            n_lists = n_lists or max(1, int(np.sqrt(len(live))))
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[np.sort(rng.choice(live, min(sample_size, len(live)), replace=False))]
+            centroids = sample[rng.choice(len(sample), min(n_lists, len(sample)), replace=False)].copy()
+            for _ in range(n_iter):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = normalize_rows(centroids)
+
+            self._centroids = centroids.astype(np.float32)
+            self._assign = np.full(self._capacity, -1, dtype=np.int32)
+            for start in range(0, len(live), 65536):
+                rows = live[start:start + 65536]
+                self._assign[rows] = np.argmax(self._vectors[rows] @ self._centroids.T, axis=1)
+            self._built_rows = len(live)
+            self._save_index()
+            stats = {"rows": len(live), "lists": len(self._centroids),
+                     "seconds": round(time.perf_counter() - started, 3)}
+            print(f"✅ Built IVF index with {stats['lists']} lists on {stats['rows']} rows in {stats['seconds']}s")
+            return stats
+
+    def _save_index(self):
+        np.save(os.path.join(self.path, "ivf_centroids.npy"), self._centroids)
+        np.save(os.path.join(self.path, "ivf_assign.npy"), self._assign[:self._size])
+        with open(os.path.join(self.path, "ivf_meta.json"), "w") as f:
+            json.dump({"built_rows": self._built_rows}, f)
+
+    def _load_index(self):
+        centroids_path = os.path.join(self.path, "ivf_centroids.npy")
+        if not os.path.exists(centroids_path):
+            return
+        self._centroids = np.load(centroids_path)
+        assign = np.load(os.path.join(self.path, "ivf_assign.npy"))
+        self._assign = np.full(self._capacity, -1, dtype=np.int32)
+        self._assign[:len(assign)] = assign
+        meta_path = os.path.join(self.path, "ivf_meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self._built_rows = json.load(f)["built_rows"]
+        else:
+            self._built_rows = int(self._alive[:self._size].sum())
+        # Rows added after the index was saved get assigned now
+        stale = np.flatnonzero(self._alive[:self._size] & (self._assign[:self._size] < 0))
+        if len(stale):
+            self._assign[stale] = np.argmax(self._vectors[stale] @ self._centroids.T, axis=1)
+
+
+    # Quantized codes
+
+    @property
+    def quantization(self) -> Optional[str]:
+        """Kind of the codes in use, or None for full-precision search only"""
+        if self.exists():
+            with self._lock:
+                self._open()
+        return None if self._quantizer is None else self._quantizer.kind
+
+    def quantize(self, kind: str = "int8", sample_size: int = 20000, seed: int = 0):
+        """Calibrate a quantizer on the live vectors and encode every row
+
+        Args:
+            kind (str): "int8" (4x smaller) or "binary" (32x smaller)
+            sample_size (int): Vectors used for calibration
+        """
+        with self._lock:
+            self._open()
+            live = np.flatnonzero(self._alive[:self._size])
+            if len(live) == 0:
+                return
+            if self._quantizer is not None:
+                self._codes = None
+                os.remove(self._codes_path)  # replaced by the new codes below
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[np.sort(rng.choice(live, min(sample_size, len(live)), replace=False))]
+            self._quantizer = make_quantizer(kind).fit(np.asarray(sample))
+            self._open_codes()
+            for start in range(0, self._size, 65536):
+                end = min(start + 65536, self._size)
+                self._codes[start:end] = self._quantizer.encode(self._vectors[start:end])
+            self._codes.flush()
+            save_quantizer(self._quantizer, os.path.join(self.path, "quantizer.npz"))
+
+    @property
+    def _codes_path(self):
+        return os.path.join(self.path, f"codes.{self._quantizer.kind}")
+
+    def _open_codes(self):
+        """Map the code matrix, sized to the current capacity"""
+        width = self._quantizer.bytes_per_vector(self.dimensions)
+        dtype = np.int8 if self._quantizer.kind == "int8" else np.uint8
+        if self._codes is not None:
+            self._codes.flush()
+            self._codes = None
+        with open(self._codes_path, "a+b") as f:
+            f.truncate(self._capacity * width)
+        self._codes = np.memmap(self._codes_path, dtype=dtype, mode="r+", shape=(self._capacity, width))
+
+    def _load_quantizer(self):
+        quantizer_path = os.path.join(self.path, "quantizer.npz")
+        if os.path.exists(quantizer_path):
+            self._quantizer = load_quantizer(quantizer_path)
+            self._open_codes()
+
+    def quantization_report(self, n_queries: int = 100, k: int = 10, seed: int = 0) -> list:
+        """Recall and memory of int8 and binary codes against exact search on this store
+
+        Queries are stored vectors with a little noise added, so no query set is needed.
+        """
+        with self._lock:
+            self._open()
+            vectors = np.asarray(self._vectors[np.flatnonzero(self._alive[:self._size])])
+        if len(vectors) == 0:
+            return []
+        rng = np.random.default_rng(seed)
+        queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)]
+        queries = normalize_rows(queries + rng.normal(0, 0.05, queries.shape).astype(np.float32))
+        return recall_report(vectors, queries, k=k, rescore_factor=self.rescore_factor)
+
+
+def _field(name: str) -> str:
+    """Validate a metadata key before it is inlined into a JSON path"""
+    if not re.fullmatch(r"[A-Za-z0-9_]+", name):
+        raise ValueError(f"Invalid metadata field: {name}")
+    return name
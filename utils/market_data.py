@@ -0,0 +1,404 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from agno.tools import Toolkit
+
+from utils.metrics import Histogram
+
+# Seconds each endpoint's data stays fresh: quotes move constantly, company profiles and
+# fundamentals change at most daily
+DEFAULT_TTLS = {
+    "price": 15,
+    "info": 6 * 3600,
+    "history": 300,
+    "recommendations": 6 * 3600,
+    "news": 900,
+}
+
+
+class YFinanceSource:
+    """Market data from Yahoo Finance, returned as plain JSON-friendly values"""
+
+    def __init__(self):
+        # Imported here so that the cache and its stub source work without yfinance installed
+        import yfinance
+        self._yf = yfinance
+
+    def info(self, symbol: str) -> dict:
+        return self._yf.Ticker(symbol).info or {}
+
+    def history(self, symbol: str, period: str, interval: str) -> str:
+        return self._yf.Ticker(symbol).history(period=period, interval=interval).to_json(orient="index")
+
+    def recommendations(self, symbol: str) -> str:
+        return self._yf.Ticker(symbol).recommendations.to_json(orient="index")
+
+    def news(self, symbol: str) -> list:
+        return self._yf.Ticker(symbol).news or []
+
+
+class StaticMarketData:
+    """In-memory source with canned data, for offline runs and for exercising the cache
+
+    data maps symbol -> {"info": {...}, "history": "...", "recommendations": "...",
+    "news": [...]}. Every call is counted in calls, and latency (seconds) simulates a slow
+    upstream so that coalescing can be observed.
+    """
+
+    def __init__(self, data: Dict[str, dict], latency: float = 0.0):
+        self.data = data
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint: str, symbol: str):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        if symbol not in self.data:
+            raise KeyError(f"No data for {symbol}")
+        return self.data[symbol].get(endpoint)
+
+    def info(self, symbol: str) -> dict:
+        return self._get("info", symbol) or {}
+
+    def history(self, symbol: str, period: str, interval: str) -> str:
+        return self._get("history", symbol) or "{}"
+
+    def recommendations(self, symbol: str) -> str:
+        return self._get("recommendations", symbol) or "{}"
+
+    def news(self, symbol: str) -> list:
+        return self._get("news", symbol) or []
+
+
+class MarketDataCache:
+    """Shared TTL cache in front of a market data source, with request coalescing
+
+    Entries are keyed by endpoint and arguments and expire after the endpoint's TTL.
+    Quotes are read from the company info entry while it is younger than the quote TTL,
+    so a price and a profile lookup share one fetch. Concurrent misses for the same key
+    wait for a single upstream fetch instead of each calling the source (single flight).
+    Failed fetches are not cached, so the next caller retries. Past max_entries the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, source=None, ttls: Optional[Dict[str, float]] = None, max_entries: int = 10000):
+        """
+        Args:
+            source: Object with info/history/recommendations/news methods (YFinanceSource if None)
+            ttls (dict): Per-endpoint TTL overrides in seconds, merged over DEFAULT_TTLS
+            max_entries (int): Entries kept before the least recently used one is evicted
+        """
+        self.source = source if source is not None else YFinanceSource()
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        # cache key -> (fetched at, value), least recently used first
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._inflight: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.upstream_ms = Histogram([10, 50, 100, 250, 500, 1000, 2500, 5000, 10000])
+        self.stats = {endpoint: {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0} for endpoint in self.ttls}
+
+    def get(self, endpoint: str, key: tuple, fetch: Callable[[], Any], max_age: Optional[float] = None,
+            counter: Optional[str] = None) -> Any:
+        """
+        Cached value of endpoint for key, calling fetch at most once across concurrent misses
+
+        Args:
+            max_age (float): Oldest entry accepted, in seconds (the endpoint's TTL if None)
+            counter (str): Endpoint the lookup is counted under in stats (endpoint if None)
+        """
+        cache_key = (endpoint,) + key
+        max_age = self.ttls[endpoint] if max_age is None else max_age
+        counts = self.stats[counter or endpoint]
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and time.monotonic() - entry[0] < max_age:
+                self._entries.move_to_end(cache_key)
+                counts["hits"] += 1
+                return entry[1]
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = self._inflight[cache_key] = Future()
+                counts["misses"] += 1
+            else:
+                counts["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        started = time.perf_counter()
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[cache_key]
+                counts["errors"] += 1
+            future.set_exception(e)
+            raise
+        self.upstream_ms.observe((time.perf_counter() - started) * 1000.0)
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic(), value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            del self._inflight[cache_key]
+        future.set_result(value)
+        return value
+
+    def info(self, symbol: str, endpoint: str = "info") -> dict:
+        """Company info; endpoint="price" reads the same entry, accepting it only under the quote TTL"""
+        symbol = symbol.upper()
+        return self.get("info", (symbol,), lambda: self.source.info(symbol), max_age=self.ttls[endpoint],
+                        counter=endpoint)
+
+    def history(self, symbol: str, period: str = "1mo", interval: str = "1d") -> str:
+        symbol = symbol.upper()
+        return self.get("history", (symbol, period, interval), lambda: self.source.history(symbol, period, interval))
+
+    def recommendations(self, symbol: str) -> str:
+        symbol = symbol.upper()
+        return self.get("recommendations", (symbol,), lambda: self.source.recommendations(symbol))
+
+    def news(self, symbol: str) -> list:
+        symbol = symbol.upper()
+        return self.get("news", (symbol,), lambda: self.source.news(symbol))
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Forget everything, or everything about one symbol"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[1] == symbol.upper()]:
+                    del self._entries[key]
+
+    def metrics(self) -> dict:
+        """Per-endpoint hits, misses, coalesced waits and errors, with hit rates"""
+        with self._lock:
+            endpoints = {name: dict(counts) for name, counts in self.stats.items()}
+            entries = len(self._entries)
+        for counts in endpoints.values():
+            lookups = counts["hits"] + counts["misses"] + counts["coalesced"]
+            # A coalesced wait is served without its own upstream call, so it counts as a hit
+            counts["hit_rate"] = (counts["hits"] + counts["coalesced"]) / lookups if lookups else 0.0
+        upstream = sum(c["misses"] for c in endpoints.values())
+        served = sum(c["hits"] + c["misses"] + c["coalesced"] for c in endpoints.values())
+        return {
+            "endpoints": endpoints,
+            "entries": entries,
+            "upstream_calls": upstream,
+            "hit_rate": (served - upstream) / served if served else 0.0,
+            "upstream_ms": self.upstream_ms.snapshot(),
+        }
+
+
+class CachedYFinanceTools(Toolkit):
+    """YFinanceTools' stock tools served through a MarketDataCache
+
+    Tool names, docstrings and output formats match agno's YFinanceTools, so the agent sees
+    the same tools; only where the data comes from changes. Company info and fundamentals
+    share one cached info entry, while the price tool reads it under the short quote TTL.
+    """
+
+    def __init__(self, cache: Optional[MarketDataCache] = None, stock_price: bool = True,
+                 company_info: bool = False, stock_fundamentals: bool = False,
+                 analyst_recommendations: bool = False, company_news: bool = False,
+                 historical_prices: bool = False, **kwargs):
+        """
+        Args:
+            cache (MarketDataCache): Cache to read through (the process-wide one if None)
+        """
+        self.cache = cache if cache is not None else get_market_data_cache()
+        tools = []
+        if stock_price:
+            tools.append(self.get_current_stock_price)
+        if company_info:
+            tools.append(self.get_company_info)
+        if stock_fundamentals:
+            tools.append(self.get_stock_fundamentals)
+        if analyst_recommendations:
+            tools.append(self.get_analyst_recommendations)
+        if company_news:
+            tools.append(self.get_company_news)
+        if historical_prices:
+            tools.append(self.get_historical_stock_prices)
+        super().__init__(name="yfinance_tools", tools=tools, **kwargs)
+
+    def get_current_stock_price(self, symbol: str) -> str:
+        """
+        Use this function to get the current stock price for a given symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: The current stock price or error message.
+        """
+        try:
+            info = self.cache.info(symbol, endpoint="price")
+            # Use "regularMarketPrice" for regular market hours, or "currentPrice" for pre/post market
+            current_price = info.get("regularMarketPrice", info.get("currentPrice"))
+            return f"{current_price:.4f}" if current_price else f"Could not fetch current price for {symbol}"
+        except Exception as e:
+            return f"Error fetching current price for {symbol}: {e}"
+
+    def get_company_info(self, symbol: str) -> str:
+        """Use this function to get company information and overview for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing company profile and overview.
+        """
+        try:
+            info = self.cache.info(symbol)
+            if not info:
+                return f"Could not fetch company info for {symbol}"
+            currency = info.get("currency", "USD")
+            company_info = {
+                "Name": info.get("shortName"),
+                "Symbol": info.get("symbol"),
+                "Current Stock Price": f"{info.get('regularMarketPrice', info.get('currentPrice'))} {currency}",
+                "Market Cap": f"{info.get('marketCap', info.get('enterpriseValue'))} {currency}",
+                "Sector": info.get("sector"),
+                "Industry": info.get("industry"),
+                "Address": info.get("address1"),
+                "City": info.get("city"),
+                "State": info.get("state"),
+                "Zip": info.get("zip"),
+                "Country": info.get("country"),
+                "EPS": info.get("trailingEps"),
+                "P/E Ratio": info.get("trailingPE"),
+                "52 Week Low": info.get("fiftyTwoWeekLow"),
+                "52 Week High": info.get("fiftyTwoWeekHigh"),
+                "50 Day Average": info.get("fiftyDayAverage"),
+                "200 Day Average": info.get("twoHundredDayAverage"),
+                "Website": info.get("website"),
+                "Summary": info.get("longBusinessSummary"),
+                "Analyst Recommendation": info.get("recommendationKey"),
+                "Number Of Analyst Opinions": info.get("numberOfAnalystOpinions"),
+                "Employees": info.get("fullTimeEmployees"),
+                "Total Cash": info.get("totalCash"),
+                "Free Cash flow": info.get("freeCashflow"),
+                "Operating Cash flow": info.get("operatingCashflow"),
+                "EBITDA": info.get("ebitda"),
+                "Revenue Growth": info.get("revenueGrowth"),
+                "Gross Margins": info.get("grossMargins"),
+                "Ebitda Margins": info.get("ebitdaMargins"),
+            }
+            return json.dumps(company_info, indent=2)
+        except Exception as e:
+            return f"Error fetching company profile for {symbol}: {e}"
+
+    def get_stock_fundamentals(self, symbol: str) -> str:
+        """Use this function to get fundamental data for a given stock symbol yfinance API.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: A JSON string containing fundamental data or an error message.
+                Keys:
+                    - 'symbol': The stock symbol.
+                    - 'company_name': The long name of the company.
+                    - 'sector': The sector to which the company belongs.
+                    - 'industry': The industry to which the company belongs.
+                    - 'market_cap': The market capitalization of the company.
+                    - 'pe_ratio': The forward price-to-earnings ratio.
+                    - 'pb_ratio': The price-to-book ratio.
+                    - 'dividend_yield': The dividend yield.
+                    - 'eps': The trailing earnings per share.
+                    - 'beta': The beta value of the stock.
+                    - '52_week_high': The 52-week high price of the stock.
+                    - '52_week_low': The 52-week low price of the stock.
+        """
+        try:
+            info = self.cache.info(symbol)
+            fundamentals = {
+                "symbol": symbol,
+                "company_name": info.get("longName", ""),
+                "sector": info.get("sector", ""),
+                "industry": info.get("industry", ""),
+                "market_cap": info.get("marketCap", "N/A"),
+                "pe_ratio": info.get("forwardPE", "N/A"),
+                "pb_ratio": info.get("priceToBook", "N/A"),
+                "dividend_yield": info.get("dividendYield", "N/A"),
+                "eps": info.get("trailingEps", "N/A"),
+                "beta": info.get("beta", "N/A"),
+                "52_week_high": info.get("fiftyTwoWeekHigh", "N/A"),
+                "52_week_low": info.get("fiftyTwoWeekLow", "N/A"),
+            }
+            return json.dumps(fundamentals, indent=2)
+        except Exception as e:
+            return f"Error getting fundamentals for {symbol}: {e}"
+
+    def get_analyst_recommendations(self, symbol: str) -> str:
+        """Use this function to get analyst recommendations for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+
+        Returns:
+            str: JSON containing analyst recommendations.
+        """
+        try:
+            return self.cache.recommendations(symbol)
+        except Exception as e:
+            return f"Error fetching analyst recommendations for {symbol}: {e}"
+
+    def get_company_news(self, symbol: str, num_stories: int = 3) -> str:
+        """Use this function to get company news and press releases for a given stock symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+            num_stories (int): The number of news stories to return. Defaults to 3.
+
+        Returns:
+            str: JSON containing company news and press releases.
+        """
+        try:
+            # The whole feed is cached once per symbol; requests for more or fewer stories reuse it
+            return json.dumps(self.cache.news(symbol)[:num_stories], indent=2)
+        except Exception as e:
+            return f"Error fetching company news for {symbol}: {e}"
+
+    def get_historical_stock_prices(self, symbol: str, period: str = "1mo", interval: str = "1d") -> str:
+        """
+        Use this function to get the historical stock price for a given symbol.
+
+        Args:
+            symbol (str): The stock symbol.
+            period (str): The period for which to retrieve historical prices. Defaults to "1mo".
+                        Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
+            interval (str): The interval between data points. Defaults to "1d".
+                        Valid intervals: 1d,5d,1wk,1mo,3mo
+
+        Returns:
+          str: The current stock price or error message.
+        """
+        try:
+            return self.cache.history(symbol, period, interval)
+        except Exception as e:
+            return f"Error fetching historical prices for {symbol}: {e}"
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_market_data_cache() -> MarketDataCache:
+    """Process-wide cache over Yahoo Finance, shared by every StockAnalysisAgent"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MarketDataCache()
+        return _shared_cache
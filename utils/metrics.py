@@ -0,0 +1,30 @@
+import bisect
+import threading
+from typing import Sequence
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is the overflow bucket
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> dict:
+        """Bucket counts keyed by upper bound, plus count and mean"""
+        with self._lock:
+            labels = [f"<={b:g}" for b in self.buckets] + [f">{self.buckets[-1]:g}"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+            }
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Callable, Dict
+
+_models: Dict[str, object] = {}
+_load_times: Dict[str, float] = {}
+_registry_lock = threading.Lock()
+_model_locks: Dict[str, threading.Lock] = {}
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _registry_lock:
+        return _model_locks.setdefault(key, threading.Lock())
+
+
+def get_model(key: str, loader: Callable[[], object]):
+    """Return the process-wide model registered under key, calling loader at most once"""
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    # Per-model lock: concurrent callers wait for one load instead of each loading a copy,
+    # while loads of different models do not block each other
+    with _lock_for(key):
+        model = _models.get(key)
+        if model is None:
+            started = time.perf_counter()
+            model = loader()
+            _load_times[key] = time.perf_counter() - started
+            _models[key] = model
+    return model
+
+
+def get_sentence_transformer(model_name: str):
+    """Return the process-wide SentenceTransformer for model_name, loading it at most once"""
+    def load():
+        # Imported here so that code paths which never embed do not pay for torch
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    return get_model(model_name, load)
+
+
+def loaded_models() -> Dict[str, float]:
+    """Names of loaded models mapped to their load time in seconds"""
+    with _registry_lock:
+        return dict(_load_times)
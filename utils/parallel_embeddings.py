@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Set in each worker process by _init_worker
+_worker_backend = None
+
+
+def _init_worker(backend: str, model_name: str, threads: Optional[int]):
+    """Load the model once per worker; every shard the worker handles reuses it"""
+    global _worker_backend
+    from utils.embedding_backends import make_backend
+    _worker_backend = make_backend(backend, model_name, threads)
+
+
+def _worker_dimensions() -> int:
+    return _worker_backend.dimensions
+
+
+def _embed_shard(shm_name: str, shape: tuple, start: int, texts: List[str], normalize: bool) -> int:
+    """Encode one shard and write it into rows [start, start + len(texts)) of the shared output"""
+    vectors = _worker_backend.encode(texts, normalize=normalize)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = vectors
+        del out  # release the buffer export before closing
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class ParallelEmbedder:
+    """Embeds large batches on a pool of worker processes, one model per worker
+
+    Texts are split into shards of shard_size and handed out to the workers, which run
+    tokenization and inference outside the parent's GIL. Each worker writes its vectors
+    straight into a shared-memory matrix at the shard's row offset, so only the input
+    texts are pickled and the output comes back in the original order without copying
+    lists between processes.
+    """
+
+    def __init__(self, model_name: str = 'sentence-transformers/paraphrase-MiniLM-L6-v2', backend: str = "torch",
+                 workers: Optional[int] = None, shard_size: int = 256, threads_per_worker: Optional[int] = None,
+                 normalize: bool = False, dimensions: Optional[int] = None):
+        """
+        Args:
+            model_name (str): Hugging Face model id
+            backend (str): "torch", "onnx" or "onnx-int8", loaded in every worker
+            workers (int): Worker processes (default: one per CPU core)
+            shard_size (int): Texts per task sent to a worker
+            threads_per_worker (int): Inference threads in each worker (default: cores / workers,
+                so the pool does not oversubscribe the CPU)
+            normalize (bool): L2-normalize the embeddings
+            dimensions (int): Embedding size; asked from a worker if not given
+        """
+        cores = os.cpu_count() or 1
+        self.model_name = model_name
+        self.backend = backend
+        self.workers = workers or cores
+        self.shard_size = shard_size
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.normalize = normalize
+        self.dimensions = dimensions
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.stats = {"calls": 0, "texts": 0, "shards": 0, "seconds": 0.0}
+
+    def _ensure_pool(self):
+        pool = self._pool
+        if pool is not None:
+            return pool
+        # Concurrent first calls wait for one pool instead of each spawning a set of workers
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: forked copies of an initialized torch runtime can deadlock,
+                # and spawned workers share the parent's shared-memory resource tracker
+                context = multiprocessing.get_context("spawn")
+                pool = context.Pool(self.workers, initializer=_init_worker,
+                                    initargs=(self.backend, self.model_name, self.threads_per_worker))
+                if self.dimensions is None:
+                    self.dimensions = pool.apply(_worker_dimensions)
+                self._pool = pool  # published only once dimensions is known
+            return self._pool
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts across the pool, returning a float32 matrix in input order"""
+        texts = list(texts)
+        if not texts:
+            # Nothing to embed: do not spawn the workers (and load a model in each) for it.
+            # Without a known size this is (0, 0); EmbeddingModel always passes dimensions
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        pool = self._ensure_pool()
+
+        started = time.perf_counter()
+        shape = (len(texts), self.dimensions)
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dimensions * 4)
+        try:
+            shards = [(shm.name, shape, start, texts[start:start + self.shard_size], self.normalize)
+                      for start in range(0, len(texts), self.shard_size)]
+            # Shards are written in place, so completion order does not matter
+            pool.starmap(_embed_shard, shards, chunksize=1)
+            result = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        with self._pool_lock:
+            self.stats["calls"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["shards"] += len(shards)
+            self.stats["seconds"] += time.perf_counter() - started
+        return result
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def measure_throughput(texts: Sequence[str], worker_counts: Sequence[int],
+                       model_name: str = 'sentence-transformers/paraphrase-MiniLM-L6-v2', backend: str = "torch",
+                       shard_size: int = 256) -> List[dict]:
+    """
+    Texts per second for each worker count, against a single in-process model
+
+    Returns:
+        list: One row per setting with workers, threads per worker, texts/s and speedup
+    """
+    from utils.embedding_backends import make_backend
+
+    texts = list(texts)
+    single = make_backend(backend, model_name)
+    single.encode(texts[:shard_size])  # warm up
+    started = time.perf_counter()
+    reference = np.concatenate([single.encode(texts[start:start + shard_size])
+                                for start in range(0, len(texts), shard_size)])
+    baseline = len(texts) / (time.perf_counter() - started)
+    report = [{"workers": 0, "threads_per_worker": os.cpu_count(), "texts_per_second": round(baseline, 1),
+               "speedup": 1.0, "max_abs_diff": 0.0}]
+
+    for workers in worker_counts:
+        with ParallelEmbedder(model_name, backend, workers=workers, shard_size=shard_size,
+                              dimensions=single.dimensions) as embedder:
+            embedder.encode(texts[:shard_size * workers])  # start the pool and warm up every worker
+            started = time.perf_counter()
+            vectors = embedder.encode(texts)
+            rate = len(texts) / (time.perf_counter() - started)
+            report.append({
+                "workers": workers,
+                "threads_per_worker": embedder.threads_per_worker,
+                "texts_per_second": round(rate, 1),
+                "speedup": round(rate / baseline, 2),
+                "max_abs_diff": float(np.abs(vectors - reference).max()),
+            })
+    return report
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+
+class FetchResult:
+    """A PDF available in the local blob cache"""
+
+    def __init__(self, url: str, path: str, sha256: str, size: int, status: str):
+        self.url = url
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        # "downloaded", "not_modified" (revalidated with a 304) or "fresh" (no request made)
+        self.status = status
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class PDFFetcher:
+    """Parallel PDF downloader backed by a content-addressed local cache
+
+    Raw bytes are stored once per SHA-256 under cache_dir/blobs, and a SQLite index maps
+    each URL to its current blob with the ETag and Last-Modified validators the server
+    sent. A cached URL is revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged document costs one 304 response instead of a full download. URLs checked
+    within max_age seconds are served from the cache without any request.
+    """
+
+    def __init__(self, cache_dir: str = ".cache/pdfs", max_workers: int = 4, max_age: float = 60.0,
+                 timeout: float = 60.0, block_size: int = 1 << 16):
+        """
+        Args:
+            cache_dir (str): Directory for the blobs and the URL index
+            max_workers (int): Maximum concurrent downloads in fetch_many
+            max_age (float): Seconds after a check during which a URL is not revalidated
+            timeout (float): Socket timeout per request
+            block_size (int): Bytes read per chunk while streaming a download to disk
+        """
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.timeout = timeout
+        self.block_size = block_size
+        self._blob_dir = os.path.join(cache_dir, "blobs")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, checked_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"downloaded": 0, "not_modified": 0, "fresh": 0, "errors": 0, "bytes_downloaded": 0}
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self._blob_dir, sha256[:2], f"{sha256}.pdf")
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def _lookup(self, url: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT sha256, size, etag, last_modified, checked_at FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _record(self, url: str, sha256: str, size: int, etag: Optional[str], last_modified: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (url, sha256, size, etag, last_modified, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sha256, size, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def fetch(self, url: str, force: bool = False) -> FetchResult:
+        """
+        Return a local copy of url, downloading only if it is new or changed
+
+        Args:
+            url (str): PDF URL
+            force (bool): Revalidate even if the URL was checked within max_age
+        """
+        # Concurrent fetches of the same URL wait for one request instead of racing
+        with self._url_lock(url):
+            cached = self._lookup(url)
+            if cached is not None and not os.path.exists(self._blob_path(cached[0])):
+                cached = None  # blob removed from disk, fetch it again
+
+            if cached is not None:
+                sha256, size, etag, last_modified, checked_at = cached
+                if not force and time.time() - checked_at < self.max_age:
+                    self._count("fresh")
+                    return FetchResult(url, self._blob_path(sha256), sha256, size, "fresh")
+
+            headers = {"User-Agent": "financial-ai-agents"}
+            if cached is not None:
+                if cached[2]:
+                    headers["If-None-Match"] = cached[2]
+                if cached[3]:
+                    headers["If-Modified-Since"] = cached[3]
+
+            request = urllib.request.Request(url, headers=headers)
+            try:
+                response = urllib.request.urlopen(request, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                if e.code == 304 and cached is not None:
+                    sha256, size, etag, last_modified, _ = cached
+                    self._record(url, sha256, size, e.headers.get("ETag") or etag,
+                                 e.headers.get("Last-Modified") or last_modified)
+                    self._count("not_modified")
+                    return FetchResult(url, self._blob_path(sha256), sha256, size, "not_modified")
+                raise
+
+            with response:
+                sha256, size = self._store(response)
+                self._record(url, sha256, size, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            self._count("downloaded")
+            self._count("bytes_downloaded", size)
+            return FetchResult(url, self._blob_path(sha256), sha256, size, "downloaded")
+
+    def _store(self, response) -> tuple:
+        """Stream a response body into the blob store, returning (sha256, size)"""
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self._blob_dir, suffix=".part", delete=False) as out:
+            try:
+                while True:
+                    block = response.read(self.block_size)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+            except BaseException:
+                out.close()
+                os.remove(out.name)
+                raise
+        sha256 = digest.hexdigest()
+        path = self._blob_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(out.name, path)  # atomic, and identical content lands on the same blob
+        return sha256, size
+
+    def fetch_many(self, urls: Iterable[str], force: bool = False) -> Dict[str, object]:
+        """
+        Fetch many URLs with at most max_workers downloads in flight
+
+        Returns:
+            dict: url -> FetchResult, or the exception raised for that URL
+        """
+        urls = list(dict.fromkeys(urls))
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls)))) as pool:
+            futures = {url: pool.submit(self.fetch, url, force) for url in urls}
+            for url, future in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    self._count("errors")
+                    results[url] = e
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
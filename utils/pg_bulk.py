@@ -0,0 +1,166 @@
+import time
+from hashlib import md5
+from typing import Any, Dict, List, Optional
+
+from psycopg import sql
+from psycopg.types.json import Jsonb
+from pgvector.psycopg import register_vector
+
+try:
+    from agno.utils.string import safe_content_hash
+except ImportError:  # older agno releases hash the raw content with md5
+    def safe_content_hash(content: str) -> str:
+        return md5(content.encode("utf-8")).hexdigest()
+
+# Column layout of agno's PgVector schema v1 (created_at/updated_at use server defaults)
+COLUMNS = ["id", "name", "meta_data", "filters", "content", "embedding", "usage", "content_hash"]
+COPY_TYPES = ["text", "text", "jsonb", "jsonb", "text", "vector", "jsonb", "text"]
+
+
+class PgVectorBulkLoader:
+    """Bulk-loads documents into a PgVector table with binary COPY
+
+    Rows are streamed in batches with COPY ... (FORMAT BINARY), so embeddings travel as
+    packed float32 instead of per-row INSERT parameters. Upserts COPY into a temp
+    staging table (temp tables are not WAL-logged) and merge with INSERT ... ON CONFLICT.
+    With defer_index, HNSW/IVFFlat indexes are dropped before the load and rebuilt once
+    afterwards instead of being maintained row by row.
+    """
+
+    def __init__(self, vector_db, batch_size: int = 5000, defer_index: bool = True,
+                 maintenance_work_mem: Optional[str] = "1GB"):
+        """
+        Args:
+            vector_db (PgVector): Target table and embedder
+            batch_size (int): Rows per COPY and per transaction
+            defer_index (bool): Drop vector indexes during the load and rebuild them after
+            maintenance_work_mem (str): Memory for the index rebuild, or None to keep the server default
+        """
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+        self.defer_index = defer_index
+        self.maintenance_work_mem = maintenance_work_mem
+
+    @property
+    def _target(self):
+        return sql.Identifier(self.vector_db.schema, self.vector_db.table_name)
+
+    def load(self, documents: List[Any], upsert: bool = True, filters: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Write documents, embedding any that have no embedding yet
+
+        Returns:
+            dict: rows, batches, seconds, index_rebuild_seconds and rebuilt index names
+        """
+        self.vector_db.create()
+        started = time.perf_counter()
+        stats = {"rows": 0, "batches": 0, "index_rebuild_seconds": 0.0, "rebuilt_indexes": []}
+
+        raw = self.vector_db.db_engine.raw_connection()
+        conn = raw.driver_connection
+        autocommit = conn.autocommit
+        try:
+            conn.autocommit = True
+            register_vector(conn)
+            deferred = self._drop_vector_indexes(conn) if self.defer_index else []
+            try:
+                for start in range(0, len(documents), self.batch_size):
+                    batch = documents[start:start + self.batch_size]
+                    rows = self._rows(batch, filters)
+                    with conn.transaction():
+                        if upsert:
+                            self._copy_and_merge(conn, rows)
+                        else:
+                            self._copy(conn, self._target, rows)
+                    stats["rows"] += len(rows)
+                    stats["batches"] += 1
+            finally:
+                rebuild_started = time.perf_counter()
+                self._create_indexes(conn, deferred)
+                stats["index_rebuild_seconds"] = round(time.perf_counter() - rebuild_started, 3)
+                stats["rebuilt_indexes"] = [name for name, _ in deferred]
+        finally:
+            conn.autocommit = autocommit
+            raw.close()
+
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    def _rows(self, documents: List[Any], filters: Optional[Dict[str, Any]]) -> list:
+        """COPY rows for a batch, embedding documents that still need it in one call"""
+        pending = [doc for doc in documents if doc.embedding is None]
+        if pending:
+            embedder = self.vector_db.embedder
+            if hasattr(embedder, "get_embedding_batch"):
+                batch = embedder.get_embedding_batch([doc.content for doc in pending])
+                for doc, vector, tokens in zip(pending, batch.vectors, batch.token_counts):
+                    doc.embedding = vector
+                    doc.usage = {"prompt_tokens": int(tokens), "total_tokens": int(tokens)}
+            else:
+                for doc in pending:
+                    doc.embed(embedder=embedder)
+
+        rows = []
+        for doc in documents:
+            content_hash = safe_content_hash(doc.content)
+            meta_data = dict(doc.meta_data or {}, **(filters or {}))
+            rows.append((
+                doc.id or content_hash,
+                doc.name,
+                Jsonb(meta_data),
+                Jsonb(filters) if filters is not None else None,
+                doc.content.replace("\x00", "\ufffd"),
+                doc.embedding,
+                Jsonb(doc.usage) if doc.usage is not None else None,
+                content_hash,
+            ))
+        return rows
+
+    def _copy(self, conn, table, rows: list):
+        statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(
+            table, sql.SQL(", ").join(map(sql.Identifier, COLUMNS))
+        )
+        with conn.cursor() as cur, cur.copy(statement) as copy:
+            copy.set_types(COPY_TYPES)
+            for row in rows:
+                copy.write_row(row)
+
+    def _copy_and_merge(self, conn, rows: list):
+        stage = sql.Identifier(f"_stage_{self.vector_db.table_name}")
+        columns = sql.SQL(", ").join(map(sql.Identifier, COLUMNS))
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS)").format(stage, self._target))
+            cur.execute(sql.SQL("TRUNCATE {}").format(stage))
+        self._copy(conn, stage, rows)
+
+        updates = sql.SQL(", ").join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in COLUMNS if c != "id"
+        )
+        with conn.cursor() as cur:
+            # DISTINCT ON keeps ON CONFLICT from touching the same id twice in one statement
+            cur.execute(sql.SQL(
+                "INSERT INTO {target} ({columns}) SELECT DISTINCT ON (id) {columns} FROM {stage} "
+                "ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = now()"
+            ).format(target=self._target, columns=columns, stage=stage, updates=updates))
+
+    def _drop_vector_indexes(self, conn) -> list:
+        """Drop HNSW/IVFFlat indexes on the table, returning their definitions"""
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = %s AND tablename = %s "
+                "AND (indexdef ILIKE %s OR indexdef ILIKE %s)",
+                (self.vector_db.schema, self.vector_db.table_name, "% USING hnsw %", "% USING ivfflat %"),
+            )
+            indexes = cur.fetchall()
+            for name, _ in indexes:
+                cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(self.vector_db.schema, name)))
+        return indexes
+
+    def _create_indexes(self, conn, indexes: list):
+        if not indexes:
+            return
+        with conn.transaction(), conn.cursor() as cur:
+            if self.maintenance_work_mem:
+                cur.execute("SELECT set_config('maintenance_work_mem', %s, true)", (self.maintenance_work_mem,))
+            for _, definition in indexes:
+                cur.execute(definition)
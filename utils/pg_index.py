@@ -0,0 +1,294 @@
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from agno.document import Document
+from agno.vectordb.distance import Distance
+from agno.vectordb.pgvector.index import HNSW, Ivfflat
+from pgvector.sqlalchemy import BIT, HALFVEC, VECTOR
+from sqlalchemy import cast, func, select, text
+
+OPERATOR_CLASSES = {
+    Distance.cosine: "vector_cosine_ops",
+    Distance.l2: "vector_l2_ops",
+    Distance.max_inner_product: "vector_ip_ops",
+}
+
+# Distance operator per metric, shared by vector and halfvec
+OPERATORS = {Distance.cosine: "<=>", Distance.l2: "<->", Distance.max_inner_product: "<#>"}
+
+
+class VectorIndexManager:
+    """Builds, tracks and queries the ANN index of a PgVector table
+
+    The row count at build time is stored as a JSON comment on the index, so any process
+    can tell when the table has drifted far enough from it to rebuild. IVFFlat centroids
+    are trained on the rows present at build time, which makes rebuilding on drift
+    essential there; HNSW stays correct as rows are added but rebuilding restores its
+    graph quality after large deletes.
+
+    With quantization the index is built over a compact expression of the embedding
+    (halfvec: 2 bytes per dimension, binary: 1 bit per dimension) instead of the float
+    column, and searches take rescore_factor * limit candidates from it before re-ranking
+    them by the full-precision distance.
+    """
+
+    def __init__(self, vector_db, kind: str = "hnsw", m: int = 16, ef_construction: int = 64,
+                 lists: Optional[int] = None, ef_search: int = 40, probes: Optional[int] = None,
+                 min_rows: int = 1000, rebuild_drift: float = 0.2, maintenance_work_mem: Optional[str] = "1GB",
+                 quantization: Optional[str] = None, rescore_factor: int = 4):
+        """
+        Args:
+            vector_db (PgVector): Table to manage
+            kind (str): "hnsw" or "ivfflat"
+            m (int): HNSW links per node
+            ef_construction (int): HNSW candidate list size while building
+            lists (int): IVFFlat list count; None picks rows/1000 (sqrt(rows) above 1M rows)
+            ef_search (int): Default HNSW candidate list size per query
+            probes (int): Default IVFFlat lists scanned per query; None uses sqrt(lists)
+            min_rows (int): Below this many rows a sequential scan is exact and fast enough
+            rebuild_drift (float): Rebuild once the row count moved by this fraction since the build
+            maintenance_work_mem (str): Memory for index builds, or None to keep the server default
+            quantization (str): None, "halfvec" or "binary" (needs pgvector 0.7+)
+            rescore_factor (int): With quantization, candidates per result re-ranked at full precision
+        """
+        if kind not in ("hnsw", "ivfflat"):
+            raise ValueError(f"Unknown index kind: {kind}")
+        if quantization not in (None, "halfvec", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.vector_db = vector_db
+        self.kind = kind
+        self.m = m
+        self.ef_construction = ef_construction
+        self.lists = lists
+        self.ef_search = ef_search
+        self.probes = probes
+        self.min_rows = min_rows
+        self.rebuild_drift = rebuild_drift
+        self.maintenance_work_mem = maintenance_work_mem
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        suffix = f"_{quantization}" if quantization else ""
+        self.index_name = f"{vector_db.table_name}_{kind}{suffix}_index"
+        # Keep agno's own search path on the same index type and query-time settings
+        if kind == "hnsw":
+            vector_db.vector_index = HNSW(name=self.index_name, m=m, ef_construction=ef_construction,
+                                          ef_search=ef_search)
+        else:
+            vector_db.vector_index = Ivfflat(name=self.index_name, lists=lists or 100,
+                                             probes=probes or 10, dynamic_lists=lists is None)
+
+    @property
+    def _table(self) -> str:
+        return f'"{self.vector_db.schema}"."{self.vector_db.table_name}"'
+
+    def row_count(self) -> int:
+        with self.vector_db.Session() as sess:
+            return sess.execute(text(f"SELECT count(*) FROM {self._table}")).scalar()
+
+    def status(self) -> dict:
+        """Index state: whether it exists, rows at build time, current rows and size"""
+        with self.vector_db.Session() as sess:
+            row = sess.execute(
+                text("SELECT obj_description(to_regclass(:name), 'pg_class'), "
+                     "pg_relation_size(to_regclass(:name))"),
+                {"name": f'"{self.vector_db.schema}"."{self.index_name}"'},
+            ).fetchone()
+        exists = row is not None and row[1] is not None
+        built = json.loads(row[0]) if exists and row[0] else {}
+        return {
+            "index": self.index_name,
+            "exists": exists,
+            "built_rows": built.get("rows"),
+            "params": built.get("params"),
+            "rows": self.row_count(),
+            "size_bytes": row[1] if exists else 0,
+        }
+
+    def ensure(self) -> Optional[dict]:
+        """Build the index if it is missing and the table is large enough, or rebuild it on drift
+
+        Returns:
+            dict: Build stats if the index was (re)built, otherwise None
+        """
+        self.ensure_metadata_index()
+        status = self.status()
+        rows = status["rows"]
+        if not status["exists"]:
+            return self.build() if rows >= self.min_rows else None
+        if self.kind == "ivfflat" and status["params"]:
+            self.vector_db.vector_index.lists = status["params"]["lists"]
+        if status["built_rows"] is None:
+            # Recreated from its definition (e.g. after a bulk load), so it reflects the current rows
+            self._stamp(rows)
+            return None
+        drift = abs(rows - status["built_rows"]) / max(status["built_rows"], 1)
+        if drift > self.rebuild_drift:
+            print(f"Row count drifted {drift:.0%} since the index was built, rebuilding {self.index_name}")
+            return self.build()
+        return None
+
+    def ensure_metadata_index(self):
+        """GIN index on meta_data so filtered searches (meta_data @> filters) fetch only matching rows"""
+        with self.vector_db.Session() as sess, sess.begin():
+            sess.execute(text(f'CREATE INDEX IF NOT EXISTS "{self.vector_db.table_name}_meta_data_gin" '
+                              f"ON {self._table} USING gin (meta_data jsonb_path_ops)"))
+
+    def build(self) -> dict:
+        """Drop and recreate the index with the configured parameters"""
+        started = time.perf_counter()
+        rows = self.row_count()
+        opclass = OPERATOR_CLASSES.get(self.vector_db.distance, "vector_cosine_ops")
+        dimensions = int(self.vector_db.dimensions)
+        column = "embedding"
+        if self.quantization == "halfvec":
+            column, opclass = f"(embedding::halfvec({dimensions}))", opclass.replace("vector_", "halfvec_")
+        elif self.quantization == "binary":
+            column, opclass = f"(binary_quantize(embedding)::bit({dimensions}))", "bit_hamming_ops"
+        if self.kind == "hnsw":
+            params = {"m": self.m, "ef_construction": self.ef_construction}
+        else:
+            params = {"lists": self.lists or _default_lists(rows)}
+        with_clause = ", ".join(f"{key} = {int(value)}" for key, value in params.items())
+
+        with self.vector_db.Session() as sess, sess.begin():
+            if self.maintenance_work_mem:
+                sess.execute(text("SELECT set_config('maintenance_work_mem', :mem, true)"),
+                             {"mem": self.maintenance_work_mem})
+            sess.execute(text(f'DROP INDEX IF EXISTS "{self.vector_db.schema}"."{self.index_name}"'))
+            sess.execute(text(f'CREATE INDEX "{self.index_name}" ON {self._table} '
+                              f"USING {self.kind} ({column} {opclass}) WITH ({with_clause})"))
+            self._stamp(rows, params, sess)
+
+        if self.kind == "ivfflat":
+            self.vector_db.vector_index.lists = params["lists"]
+        stats = {"index": self.index_name, "rows": rows, "params": params,
+                 "seconds": round(time.perf_counter() - started, 3)}
+        print(f"✅ Built {self.kind} index {self.index_name} on {rows} rows in {stats['seconds']}s")
+        return stats
+
+    def _stamp(self, rows: int, params: Optional[dict] = None, sess=None):
+        """Record the row count (and build parameters) in the index comment"""
+        comment = json.dumps({"rows": rows, "params": params})
+        statement = text(f'COMMENT ON INDEX "{self.vector_db.schema}"."{self.index_name}" IS '
+                         f"'{comment}'")
+        if sess is not None:
+            sess.execute(statement)
+            return
+        with self.vector_db.Session() as sess, sess.begin():
+            sess.execute(statement)
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+               ef_search: Optional[int] = None, probes: Optional[int] = None) -> List[Document]:
+        """Vector search with per-query recall/latency settings"""
+        query_vector = self.vector_db.embedder.get_embedding(query)
+        return self.search_vector(query_vector, limit, filters, ef_search=ef_search, probes=probes)
+
+    def search_vector(self, query_vector, limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+                      ef_search: Optional[int] = None, probes: Optional[int] = None,
+                      exact: bool = False) -> List[Document]:
+        """
+        Top-k search for an embedding
+
+        Args:
+            ef_search (int): HNSW candidate list size for this query, raised to limit if lower
+            probes (int): IVFFlat lists scanned for this query
+            exact (bool): Disable index scans and rank every row, the ground truth for recall
+
+        With filters the ANN index is bypassed: the GIN metadata index selects the matching
+        rows and only those are ranked exactly. A post-filtered HNSW/IVFFlat scan would
+        rank the whole table and could return fewer than limit rows for a selective filter.
+        """
+        table = self.vector_db.table
+        query_vector = list(map(float, query_vector))
+        operator = OPERATORS[self.vector_db.distance]
+        stmt = select(table.c.id, table.c.name, table.c.meta_data, table.c.content,
+                      table.c.embedding, table.c.usage)
+        if filters is not None:
+            stmt = stmt.where(table.c.meta_data.contains(filters))
+
+        if self.quantization is None or exact or filters:
+            stmt = stmt.order_by(table.c.embedding.op(operator)(query_vector)).limit(limit)
+        else:
+            # Shortlist by the quantized expression the index is built on, then re-rank exactly
+            dimensions = int(self.vector_db.dimensions)
+            query = cast(query_vector, VECTOR(dimensions))
+            if self.quantization == "halfvec":
+                approximate = cast(table.c.embedding, HALFVEC(dimensions)).op(operator)(cast(query, HALFVEC(dimensions)))
+            else:
+                approximate = cast(func.binary_quantize(table.c.embedding), BIT(dimensions)).op("<~>")(
+                    cast(func.binary_quantize(query), BIT(dimensions)))
+            shortlist = stmt.order_by(approximate).limit(limit * self.rescore_factor).subquery()
+            stmt = select(shortlist).order_by(shortlist.c.embedding.op(operator)(query_vector)).limit(limit)
+
+        with self.vector_db.Session() as sess, sess.begin():
+            if exact or filters:
+                sess.execute(text("SET LOCAL enable_indexscan = off"))
+            elif self.kind == "hnsw":
+                candidates = limit * self.rescore_factor if self.quantization else limit
+                sess.execute(text(f"SET LOCAL hnsw.ef_search = {int(max(ef_search or self.ef_search, candidates))}"))
+            else:
+                sess.execute(text(f"SET LOCAL ivfflat.probes = {int(max(probes or self._default_probes(), 1))}"))
+            results = sess.execute(stmt).fetchall()
+
+        return [
+            Document(id=row.id, name=row.name, meta_data=row.meta_data, content=row.content,
+                     embedder=self.vector_db.embedder, embedding=row.embedding, usage=row.usage)
+            for row in results
+        ]
+
+    def _default_probes(self) -> int:
+        if self.probes:
+            return self.probes
+        return max(1, int(math.sqrt(self.vector_db.vector_index.lists)))
+
+    def measure_recall(self, queries: Sequence[str], limit: int = 10,
+                       settings: Optional[Sequence[int]] = None) -> List[dict]:
+        """
+        Recall@limit and latency of the index against exact search
+
+        Args:
+            queries (list): Query texts, embedded once up front
+            limit (int): Results per query
+            settings (list): ef_search (HNSW) or probes (IVFFlat) values to sweep
+
+        Returns:
+            list: One row per setting (plus the exact baseline) with recall, p50_ms and p95_ms
+        """
+        if settings is None:
+            settings = [10, 20, 40, 80, 160] if self.kind == "hnsw" else [1, 2, 4, 8, 16, 32]
+        knob = "ef_search" if self.kind == "hnsw" else "probes"
+        vectors = [self.vector_db.embedder.get_embedding(q) for q in queries]
+
+        def run(**kwargs):
+            ids, latencies = [], []
+            for vector in vectors:
+                started = time.perf_counter()
+                docs = self.search_vector(vector, limit, **kwargs)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+                ids.append({doc.id for doc in docs})
+            return ids, latencies
+
+        truth, exact_latencies = run(exact=True)
+        report = [{knob: "exact", "recall": 1.0, **_percentiles(exact_latencies)}]
+        for value in settings:
+            found, latencies = run(**{knob: value})
+            recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+            report.append({knob: value, "recall": round(float(recall), 4), **_percentiles(latencies)})
+        return report
+
+
+def _default_lists(rows: int) -> int:
+    """pgvector's guidance: rows/1000 lists up to 1M rows, sqrt(rows) beyond"""
+    if rows < 1000000:
+        return max(rows // 1000, 1)
+    return max(int(math.sqrt(rows)), 1)
+
+
+def _percentiles(latencies: List[float]) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2) if latencies else None,
+    }
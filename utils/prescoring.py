@@ -0,0 +1,174 @@
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.bm25 import tokenize
+from utils.quantization import normalize_rows
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were will with "
+    "which what who how also than then there these those into about over under such can may not".split()
+)
+
+
+def split_sentences(text: str, min_characters: int = 12) -> List[str]:
+    sentences = [s.strip(" -*#\t") for s in _SENTENCE_RE.split(text or "")]
+    return [s for s in sentences if len(s) >= min_characters]
+
+
+def _content_terms(text: str) -> set:
+    return {t for t in tokenize(text) if len(t) > 2 and t not in _STOPWORDS}
+
+
+def _band_score(value: float, band: Tuple[float, float]) -> float:
+    """Map a signal onto 1-5 so that the band's low edge is 2 and its high edge is 4"""
+    low, high = band
+    return round(float(np.clip(2.0 + 2.0 * (value - low) / (high - low), 1.0, 5.0)), 1)
+
+
+class PreScorer:
+    """Local first stage of the evaluation cascade: embedding and lexical overlap proxies
+
+    Two signals stand in for the judge's faithfulness and context relevance scores:
+    - context relevance: mean cosine of the query to its top passages
+    - faithfulness: how well each response sentence is supported by its closest passage
+      (cosine), blended with the share of the response's content words found in the context
+    Each signal has an ambiguity band. A case whose signals are all above their band is a
+    clear "pass", one with any signal below its band a clear "fail"; everything else, and
+    any response quoting figures that do not appear in the context, is "ambiguous" and goes
+    to the LLM judge.
+    """
+
+    def __init__(self, embedder, relevance_band: Tuple[float, float] = (0.3, 0.55),
+                 faithfulness_band: Tuple[float, float] = (0.45, 0.75), top_passages: int = 3,
+                 lexical_weight: float = 0.3):
+        """
+        Args:
+            embedder (EmbeddingModel): Encoder for queries, sentences and passages
+            relevance_band (tuple): (low, high) query-passage similarity that is ambiguous
+            faithfulness_band (tuple): (low, high) support signal that is ambiguous
+            top_passages (int): Passages averaged for the relevance signal
+            lexical_weight (float): Weight of lexical coverage in the faithfulness signal
+        """
+        self.embedder = embedder
+        self.relevance_band = relevance_band
+        self.faithfulness_band = faithfulness_band
+        self.top_passages = top_passages
+        self.lexical_weight = lexical_weight
+
+    def score(self, query: str, response: str, context: Sequence[str]) -> dict:
+        """
+        Overlap signals, proxy 1-5 scores and the cascade verdict for one case
+
+        Returns:
+            dict: relevance, sentence_support, lexical_coverage, faithfulness, numbers_found,
+                numbers_total, the proxy "scores" and a verdict of "pass", "fail" or "ambiguous"
+        """
+        passages = [p for p in context if p and p.strip()]
+        sentences = split_sentences(response) or ([response] if response and response.strip() else [])
+        if not passages or not sentences:
+            # Nothing to compare; leave the decision to the judge
+            return {"verdict": "ambiguous", "scores": {}, "reason": "empty context or response"}
+
+        vectors = normalize_rows(self.embedder.get_embedding_array([query] + sentences + passages))
+        query_vector = vectors[0]
+        sentence_vectors = vectors[1:1 + len(sentences)]
+        passage_vectors = vectors[1 + len(sentences):]
+
+        query_similarity = np.sort(passage_vectors @ query_vector)[::-1]
+        relevance = float(query_similarity[:self.top_passages].mean())
+        sentence_support = float((sentence_vectors @ passage_vectors.T).max(axis=1).mean())
+
+        context_text = " ".join(passages)
+        response_terms = _content_terms(response)
+        lexical_coverage = (len(response_terms & _content_terms(context_text)) / len(response_terms)
+                            if response_terms else 1.0)
+        faithfulness = (1.0 - self.lexical_weight) * sentence_support + self.lexical_weight * lexical_coverage
+
+        # Figures are where financial answers hallucinate; any unsupported one needs the judge
+        context_numbers = set(_NUMBER_RE.findall(context_text))
+        response_numbers = set(_NUMBER_RE.findall(response))
+        numbers_found = len(response_numbers & context_numbers)
+
+        signals = ((relevance, self.relevance_band), (faithfulness, self.faithfulness_band))
+        if any(value <= band[0] for value, band in signals):
+            verdict = "fail"
+        elif all(value >= band[1] for value, band in signals) and numbers_found == len(response_numbers):
+            verdict = "pass"
+        else:
+            verdict = "ambiguous"
+
+        return {
+            "relevance": round(relevance, 4),
+            "sentence_support": round(sentence_support, 4),
+            "lexical_coverage": round(lexical_coverage, 4),
+            "faithfulness": round(faithfulness, 4),
+            "numbers_found": numbers_found,
+            "numbers_total": len(response_numbers),
+            "scores": {
+                "faithfulness": _band_score(faithfulness, self.faithfulness_band),
+                "context_relevance": _band_score(relevance, self.relevance_band),
+            },
+            "verdict": verdict,
+        }
+
+
+def format_report(query: str, prescore: dict) -> str:
+    """Evaluation report for a case decided locally, in the judge's heading format"""
+    scores = prescore["scores"]
+    return f"""# RAG Evaluation Report (local pre-score)
+
+## Overview
+Query: {query}
+Verdict: {prescore['verdict']} (not escalated to the LLM judge)
+
+## Metric Scores
+
+### Faithfulness: {scores['faithfulness']}/5
+- Sentence support: {prescore['sentence_support']:.2f}, lexical coverage: {prescore['lexical_coverage']:.2f}
+- Figures found in the context: {prescore['numbers_found']}/{prescore['numbers_total']}
+
+### Context Relevance: {scores['context_relevance']}/5
+- Query-passage similarity: {prescore['relevance']:.2f}
+
+Answer completeness, source attribution and response coherence are only scored by the LLM judge.
+"""
+
+
+def judge_verdict(scores: Dict[str, Optional[float]], threshold: float = 3.0) -> Optional[str]:
+    """The judge's faithfulness and context relevance scores as a pass/fail verdict"""
+    values = [scores.get("faithfulness"), scores.get("context_relevance")]
+    if any(v is None for v in values):
+        return None
+    return "pass" if all(v >= threshold for v in values) else "fail"
+
+
+def agreement_report(records: Iterable[dict]) -> dict:
+    """
+    How often the local stage agrees with the judge, over cases where both ran
+
+    Those are audited confident cases (verdict pass/fail, judged anyway) for verdict
+    agreement, plus escalated cases for the gap between proxy and judge scores.
+    """
+    audited = agreed = 0
+    gaps = {"faithfulness": [], "context_relevance": []}
+    for record in records:
+        prescore = record.get("prescore") or {}
+        judged = record.get("stage") == "judge" and record.get("scores")
+        if not prescore.get("scores") or not judged:
+            continue
+        for metric in gaps:
+            if record["scores"].get(metric) is not None:
+                gaps[metric].append(abs(prescore["scores"][metric] - record["scores"][metric]))
+        verdict = judge_verdict(record["scores"])
+        if prescore["verdict"] in ("pass", "fail") and verdict is not None:
+            audited += 1
+            agreed += prescore["verdict"] == verdict
+    return {
+        "audited": audited,
+        "verdict_agreement": round(agreed / audited, 4) if audited else None,
+        "mean_abs_score_gap": {m: round(float(np.mean(v)), 3) if v else None for m, v in gaps.items()},
+    }
@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class StartupProfiler:
+    """Records wall-clock time spent in named startup sections"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def section(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((name, time.perf_counter() - started))
+
+    def record(self, name: str, seconds: float):
+        self.sections.append((name, seconds))
+
+    def report(self) -> str:
+        """Format the recorded sections as a table, slowest first"""
+        total = time.perf_counter() - self.started
+        width = max([len(name) for name, _ in self.sections] + [len("total")])
+        lines = ["Startup profile", "-" * (width + 12)]
+        for name, seconds in sorted(self.sections, key=lambda s: s[1], reverse=True):
+            lines.append(f"{name:<{width}}  {seconds * 1000:8.1f} ms")
+        lines.append("-" * (width + 12))
+        lines.append(f"{'total':<{width}}  {total * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+# Process-wide profiler, started as soon as this module is imported
+profiler = StartupProfiler()
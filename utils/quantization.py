@@ -0,0 +1,179 @@
+import time
+from typing import List, Sequence
+
+import numpy as np
+
+# Popcount of every byte value, for Hamming distances over packed bit codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class ScalarQuantizer:
+    """int8 codes with a per-dimension scale calibrated on the collection
+
+    Each dimension is scaled so its calibration percentile maps to 127, which clips
+    rare outliers instead of wasting resolution on them. Queries stay in float32 and are
+    scored against the codes directly (asymmetric distance), so only the stored side
+    loses precision.
+    """
+
+    kind = "int8"
+
+    def __init__(self, scale: np.ndarray = None):
+        self.scale = scale
+
+    def fit(self, vectors: np.ndarray, percentile: float = 99.9) -> "ScalarQuantizer":
+        scale = np.percentile(np.abs(vectors), percentile, axis=0).astype(np.float32)
+        scale[scale == 0] = 1.0
+        self.scale = scale
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale * 127.0), -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * (self.scale / 127.0)
+
+    def score(self, codes: np.ndarray, query: np.ndarray, block: int = 65536) -> np.ndarray:
+        """Approximate dot products of a float query with every code"""
+        weights = (query * (self.scale / 127.0)).astype(np.float32)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            scores[start:start + block] = codes[start:start + block].astype(np.float32) @ weights
+        return scores
+
+    def bytes_per_vector(self, dimensions: int) -> int:
+        return dimensions
+
+    def state(self) -> dict:
+        return {"scale": self.scale}
+
+
+class BinaryQuantizer:
+    """Sign-bit codes, one bit per dimension, packed eight to a byte
+
+    Bits are taken relative to the collection's per-dimension mean rather than zero, so
+    dimensions that are mostly positive (or negative) still split the data. Codes are
+    ranked by Hamming distance, a popcount over XORed bytes.
+    """
+
+    kind = "binary"
+
+    def __init__(self, center: np.ndarray = None):
+        self.center = center
+
+    def fit(self, vectors: np.ndarray) -> "BinaryQuantizer":
+        self.center = vectors.mean(axis=0).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > self.center, axis=-1)
+
+    def score(self, codes: np.ndarray, query: np.ndarray, block: int = 65536) -> np.ndarray:
+        """Negated Hamming distances, so that higher is more similar like the other scores"""
+        query_code = self.encode(query[None, :])[0]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block):
+            xor = np.bitwise_xor(codes[start:start + block], query_code)
+            scores[start:start + block] = -_POPCOUNT[xor].sum(axis=1, dtype=np.int32)
+        return scores
+
+    def bytes_per_vector(self, dimensions: int) -> int:
+        return (dimensions + 7) // 8
+
+    def state(self) -> dict:
+        return {"center": self.center}
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "binary": BinaryQuantizer}
+
+
+def make_quantizer(kind: str):
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization: {kind}")
+    return QUANTIZERS[kind]()
+
+
+def save_quantizer(quantizer, path: str):
+    np.savez(path, kind=quantizer.kind, **quantizer.state())
+
+
+def load_quantizer(path: str):
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files if key != "kind"}
+        return QUANTIZERS[str(data["kind"])](**state)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (all-zero rows are left as they are)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def rescore(vectors, candidates: np.ndarray, query: np.ndarray, k: int) -> tuple:
+    """Re-rank candidate rows with full-precision vectors, returning (rows, scores)"""
+    scores = np.asarray(vectors[candidates]) @ query
+    best = top_k(scores, k)
+    return candidates[best], scores[best]
+
+
+def recall_report(vectors: np.ndarray, queries: np.ndarray, k: int = 10, rescore_factor: int = 4,
+                  kinds: Sequence[str] = ("int8", "binary")) -> List[dict]:
+    """
+    Recall@k of quantized search against exact float search, with and without rescoring
+
+    Args:
+        vectors (ndarray): Normalized collection vectors
+        queries (ndarray): Normalized query vectors
+        k (int): Results per query
+        rescore_factor (int): Candidates taken from the codes per result before rescoring
+        kinds (list): Quantizers to evaluate
+
+    Returns:
+        list: One row per method with recall, rescored recall, bytes per vector,
+            compression ratio, memory saved and mean query latency
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    dimensions = vectors.shape[1]
+    truth = [set(top_k(vectors @ q, k)) for q in queries]
+    started = time.perf_counter()
+    for q in queries:
+        top_k(vectors @ q, k)
+    float_ms = (time.perf_counter() - started) * 1000.0 / max(len(queries), 1)
+    float_bytes = vectors.nbytes
+    report = [{"method": "float32", "recall": 1.0, "rescored_recall": 1.0, "bytes_per_vector": dimensions * 4,
+               "compression": 1.0, "memory_saved_bytes": 0, "query_ms": round(float_ms, 3)}]
+
+    for kind in kinds:
+        quantizer = make_quantizer(kind).fit(vectors)
+        codes = quantizer.encode(vectors)
+        first_pass, rescored = [], []
+        elapsed = 0.0
+        for q, expected in zip(queries, truth):
+            started = time.perf_counter()
+            scores = quantizer.score(codes, q)
+            rows, _ = rescore(vectors, top_k(scores, k * rescore_factor), q, k)
+            elapsed += time.perf_counter() - started
+            first_pass.append(len(set(top_k(scores, k)) & expected) / k)
+            rescored.append(len(set(rows) & expected) / k)
+        query_ms = elapsed * 1000.0 / max(len(queries), 1)
+        report.append({
+            "method": kind,
+            "recall": round(float(np.mean(first_pass)), 4),
+            "rescored_recall": round(float(np.mean(rescored)), 4),
+            "bytes_per_vector": quantizer.bytes_per_vector(dimensions),
+            "compression": round(dimensions * 4 / quantizer.bytes_per_vector(dimensions), 1),
+            "memory_saved_bytes": int(float_bytes - codes.nbytes),
+            "query_ms": round(query_ms, 3),
+        })
+    return report
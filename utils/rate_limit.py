@@ -0,0 +1,298 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from utils.metrics import Histogram
+
+# Groq quotas per model id: (requests per minute, tokens per minute, concurrent requests).
+# Override with configure_limits() or GROQ_RPM / GROQ_TPM / GROQ_MAX_CONCURRENCY.
+DEFAULT_LIMITS = {
+    "llama3-70b-8192": (30, 6000, 4),
+    "llama3-8b-8192": (30, 30000, 4),
+    "llama-3.1-8b-instant": (30, 20000, 4),
+}
+FALLBACK_LIMITS = (30, 6000, 4)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute
+
+    reserve() takes the amount immediately, letting the level go negative, and returns how
+    long the caller must wait before using it. Callers are therefore served in arrival
+    order without spinning, and sync and async callers can share one bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount (at most the capacity) and return the seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount: float):
+        """Give back (positive) or take more (negative) once the real cost is known"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server answered 429"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.level, 0.0)
+
+
+class _Waiter:
+    """A caller queued for a slot: a thread (event) or an asyncio task (loop and future)"""
+
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+class ConcurrencySlots:
+    """Concurrency slots handed out in arrival order to threads and asyncio tasks alike
+
+    A freed slot goes straight to the longest-waiting caller, so new arrivals cannot
+    overtake the queue. Threads block on an event and tasks await a future, so nobody polls,
+    and the limit holds across threads and event loops.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = size
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free and nobody is queued for it"""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        try:
+            waiter.event.wait()
+        except BaseException:
+            # e.g. KeyboardInterrupt while queued
+            self._abandon(waiter)
+            raise
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def release(self):
+        with self._lock:
+            self._hand_over()
+
+    def _hand_over(self):
+        """Give a freed slot to the first waiter still able to take it (caller holds the lock)"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            if waiter.event is not None:
+                waiter.event.set()
+                return
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                return
+            except RuntimeError:
+                continue  # its event loop has been closed
+        if self._free >= self.size:
+            raise ValueError("Slot released too many times")
+        self._free += 1
+
+    def _abandon(self, waiter: _Waiter):
+        """A waiter gave up: leave the queue, or pass on the slot it was just handed"""
+        with self._lock:
+            if waiter.granted:
+                self._hand_over()
+            else:
+                self._waiters.remove(waiter)
+
+    def waiting(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """Requests/min, tokens/min and concurrency limits for one model id
+
+    Call acquire() (or await aacquire()) with the estimated tokens of a request before
+    sending it and release() with the actual usage afterwards. The estimate is reserved
+    from the token bucket up front and corrected on release, so a burst of concurrent
+    callers cannot overshoot the quota between sending and hearing back.
+    """
+
+    def __init__(self, model_id: str, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int):
+        self.model_id = model_id
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._slots = ConcurrencySlots(max_concurrency)
+        self._lock = threading.Lock()
+        self.queue_wait_ms = Histogram([1, 10, 50, 100, 500, 1000, 5000, 15000, 60000])
+        self.stats = {"requests": 0, "tokens": 0, "throttled": 0, "rate_limited": 0, "in_flight": 0, "waiting": 0}
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _admitted(self, started: float, delay: float):
+        waited = time.monotonic() - started
+        self.queue_wait_ms.observe(waited * 1000.0)
+        with self._lock:
+            self.stats["waiting"] -= 1
+            self.stats["in_flight"] += 1
+            self.stats["requests"] += 1
+            if delay > 0 or waited > 0.001:
+                self.stats["throttled"] += 1
+
+    def acquire(self, estimated_tokens: int):
+        """Block until the request may be sent"""
+        started = time.monotonic()
+        self._count("waiting")
+        try:
+            self._slots.acquire()
+        except BaseException:
+            self._count("waiting", -1)
+            raise
+        delay = self._reserve(estimated_tokens)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            except BaseException:
+                # e.g. KeyboardInterrupt: give the slot back so the process can keep using the model
+                self._count("waiting", -1)
+                self._slots.release()
+                raise
+        self._admitted(started, delay)
+
+    async def aacquire(self, estimated_tokens: int):
+        """Wait without blocking the event loop until the request may be sent"""
+        started = time.monotonic()
+        self._count("waiting")
+        try:
+            await self._slots.aacquire()
+        except asyncio.CancelledError:
+            self._count("waiting", -1)
+            raise
+        delay = self._reserve(estimated_tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._count("waiting", -1)
+                self._slots.release()
+                raise
+        self._admitted(started, delay)
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None, rate_limited: bool = False):
+        """
+        Free the concurrency slot and settle the token reservation
+
+        Args:
+            estimated_tokens (int): What acquire() reserved
+            actual_tokens (int): Tokens the response reported (None keeps the estimate)
+            rate_limited (bool): The server answered 429; pause everyone until the buckets refill
+        """
+        if actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+        if rate_limited:
+            self.requests.drain()
+            self.tokens.drain()
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            self.stats["tokens"] += actual_tokens if actual_tokens is not None else estimated_tokens
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+        self._slots.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queue_wait_ms"] = self.queue_wait_ms.snapshot()
+        return stats
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limits: Dict[str, tuple] = {}
+_registry_lock = threading.Lock()
+
+
+def configure_limits(model_id: str, requests_per_minute: float = None, tokens_per_minute: float = None,
+                     max_concurrency: int = None):
+    """Set the quota of a model id; applies to limiters created after the call"""
+    rpm, tpm, concurrency = _limits.get(model_id) or DEFAULT_LIMITS.get(model_id, FALLBACK_LIMITS)
+    with _registry_lock:
+        _limits[model_id] = (requests_per_minute or rpm, tokens_per_minute or tpm, max_concurrency or concurrency)
+        _limiters.pop(model_id, None)
+
+
+def get_limiter(model_id: str) -> RateLimiter:
+    """Process-wide limiter for a model id, shared by every agent using that model"""
+    with _registry_lock:
+        limiter = _limiters.get(model_id)
+        if limiter is None:
+            if model_id in _limits:
+                rpm, tpm, concurrency = _limits[model_id]
+            else:
+                rpm, tpm, concurrency = DEFAULT_LIMITS.get(model_id, FALLBACK_LIMITS)
+                rpm = float(os.getenv("GROQ_RPM", rpm))
+                tpm = float(os.getenv("GROQ_TPM", tpm))
+                concurrency = int(os.getenv("GROQ_MAX_CONCURRENCY", concurrency))
+            limiter = _limiters[model_id] = RateLimiter(model_id, rpm, tpm, concurrency)
+        return limiter
+
+
+def limiter_metrics() -> Dict[str, dict]:
+    """Metrics of every limiter created so far, keyed by model id"""
+    with _registry_lock:
+        limiters = dict(_limiters)
+    return {model_id: limiter.metrics() for model_id, limiter in limiters.items()}
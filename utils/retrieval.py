@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agno.document import Document
+
+from utils.bm25 import BM25Index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[str]], weights: Optional[Sequence[float]] = None,
+                           k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum(weight / (k + rank))"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """Dense vector search and BM25 merged by reciprocal-rank fusion"""
+
+    def __init__(self, vector_db, lexical_index: BM25Index, dense_weight: float = 1.0,
+                 lexical_weight: float = 1.0, candidates: int = 20, rrf_k: int = 60):
+        """
+        Args:
+            vector_db: agno vector db for the dense side
+            lexical_index (BM25Index): Inverted index built alongside the vectors
+            dense_weight (float): RRF weight of the dense ranking
+            lexical_weight (float): RRF weight of the BM25 ranking
+            candidates (int): Results pulled from each side before fusion
+            rrf_k (int): RRF rank offset; larger values flatten the rank curve
+        """
+        self.vector_db = vector_db
+        self.lexical_index = lexical_index
+        self.dense_weight = dense_weight
+        self.lexical_weight = lexical_weight
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None,
+               **search_params) -> List[Document]:
+        """Fused top-k; search_params (e.g. ef_search, probes) are passed to the dense search"""
+        dense = self.vector_db.search(query, limit=max(limit, self.candidates), filters=filters, **search_params)
+        lexical = self.lexical_index.search(query, limit=max(limit, self.candidates), filters=filters)
+        if not lexical:
+            return dense[:limit]
+
+        by_id = {doc.id: doc for doc in dense}
+        fused = reciprocal_rank_fusion(
+            [[doc.id for doc in dense], [doc_id for doc_id, _ in lexical]],
+            [self.dense_weight, self.lexical_weight],
+            self.rrf_k,
+        )
+
+        results = []
+        for doc_id, score in fused[:limit]:
+            doc = by_id.get(doc_id)
+            if doc is None:
+                # Lexical-only hit: rebuild the document from the index
+                stored = self.lexical_index.get(doc_id)
+                if stored is None:
+                    continue
+                doc = Document(id=doc_id, name=stored["name"], content=stored["content"],
+                               meta_data=dict(stored["meta_data"]))
+            doc.meta_data = dict(doc.meta_data or {}, rrf_score=score)
+            results.append(doc)
+        return results
@@ -0,0 +1,102 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.quantization import normalize_rows
+
+# Years, quarters, amounts: questions that differ only in these ask for different facts
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed on question embeddings, scoped per loaded document
+
+    A question is served from the cache when its cosine similarity to a cached question
+    in the same scope reaches the threshold and both questions mention the same numbers
+    ("revenue in 2022" never answers "revenue in 2023"). Entries expire after ttl_seconds
+    and each scope keeps at most max_entries, evicting the least recently used.
+    """
+
+    def __init__(self, threshold: float = 0.97, ttl_seconds: float = 3600, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._scopes: Dict[str, "OrderedDict[int, dict]"] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, scope: str, question: str, question_vector: np.ndarray) -> Optional[dict]:
+        """Best cached entry above the threshold with the same numbers as the question, or None"""
+        query = normalize_rows(np.reshape(question_vector, (1, -1)))[0]
+        numbers = _numbers(question)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                now = time.time()
+                for key in [k for k, e in entries.items() if now - e["created_at"] > self.ttl_seconds]:
+                    del entries[key]
+            if not entries:
+                self.misses += 1
+                return None
+
+            keys = list(entries.keys())
+            similarities = np.stack([entries[k]["vector"] for k in keys]) @ query
+            similarities[[entries[k]["numbers"] != numbers for k in keys]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entries.move_to_end(keys[best])
+            self.hits += 1
+            entry = entries[keys[best]]
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "chunk_ids": list(entry["chunk_ids"]),
+                "similarity": float(similarities[best]),
+            }
+
+    def store(self, scope: str, question: str, question_vector: np.ndarray, answer: str, chunk_ids: List[str]):
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            entries[self._next_key] = {
+                "question": question,
+                "vector": normalize_rows(np.reshape(question_vector, (1, -1)))[0],
+                "numbers": _numbers(question),
+                "answer": answer,
+                "chunk_ids": list(chunk_ids),
+                "created_at": time.time(),
+            }
+            self._next_key += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, scope: Optional[str] = None):
+        """Drop every entry of a scope and its sub-scopes ("scope|..."), or of all scopes"""
+        with self._lock:
+            if scope is None:
+                self._scopes.clear()
+                return
+            for key in [k for k in self._scopes if k == scope or k.startswith(scope + "|")]:
+                del self._scopes[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(e) for e in self._scopes.values()),
+            }
+
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(_NUMBER_RE.findall(text))
@@ -0,0 +1,75 @@
+import time
+from typing import Iterator, Optional
+
+from agno.run.response import RunEvent
+
+
+class StreamEvent:
+    """One incremental piece of an agent's output"""
+
+    def __init__(self, kind: str, content: str = "", tool_name: Optional[str] = None, stats: Optional[dict] = None):
+        # "token" (a piece of the answer), "tool_started", "tool_completed", "error", or "done"
+        # (the last event of a completed stream, carrying that stream's stats)
+        self.kind = kind
+        self.content = content
+        self.tool_name = tool_name
+        self.stats = stats
+
+    def __repr__(self):
+        return f"StreamEvent({self.kind!r}, {self.content!r}, {self.tool_name!r})"
+
+
+def new_stream_stats() -> dict:
+    return {"ttft_ms": None, "total_ms": None, "chunks": 0, "tool_calls": 0, "characters": 0}
+
+
+def stream_run(agent, prompt: str, started: Optional[float] = None) -> Iterator[StreamEvent]:
+    """
+    Run an agno agent with streaming and translate its events into StreamEvents
+
+    The final "done" event carries this stream's own stats: time to first token, total
+    time, content chunk and tool-call counts. Each call gets a fresh dict, so concurrent
+    streams on one agent never mix their numbers.
+
+    Args:
+        agent (Agent): The agent to run
+        prompt (str): Message for the agent
+        started (float): perf_counter() the timings count from, when work (retrieval,
+            prompt packing) happened before the agent was started
+    """
+    started = started if started is not None else time.perf_counter()
+    stats = new_stream_stats()
+    for event in agent.run(prompt, stream=True, stream_intermediate_steps=True):
+        name = getattr(event, "event", None)
+        if name == RunEvent.run_response_content.value:
+            if not isinstance(event.content, str) or not event.content:
+                continue
+            if stats["ttft_ms"] is None:
+                stats["ttft_ms"] = (time.perf_counter() - started) * 1000.0
+            stats["chunks"] += 1
+            stats["characters"] += len(event.content)
+            yield StreamEvent("token", event.content)
+        elif name == RunEvent.tool_call_started.value:
+            stats["tool_calls"] += 1
+            yield StreamEvent("tool_started", tool_name=_tool_name(event))
+        elif name == RunEvent.tool_call_completed.value:
+            yield StreamEvent("tool_completed", tool_name=_tool_name(event))
+        elif name == RunEvent.run_error.value:
+            yield StreamEvent("error", str(event.content))
+    stats["total_ms"] = (time.perf_counter() - started) * 1000.0
+    yield StreamEvent("done", stats=stats)
+
+
+def answer_events(content: str, started: float) -> Iterator[StreamEvent]:
+    """A complete answer (e.g. from a cache) delivered as a single token, then "done" """
+    stats = new_stream_stats()
+    stats["ttft_ms"] = stats["total_ms"] = (time.perf_counter() - started) * 1000.0
+    stats["chunks"] = 1
+    stats["characters"] = len(content or "")
+    yield StreamEvent("token", content or "")
+    yield StreamEvent("done", stats=stats)
+
+
+def _tool_name(event) -> Optional[str]:
+    tool = getattr(event, "tool", None)
+    return getattr(tool, "tool_name", None) if tool is not None else None